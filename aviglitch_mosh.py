@@ -184,10 +184,14 @@ def build_bloom_sequence(frames: Sequence, pivot_frame, repeat_count):
 
     safe_pivot = _clamp_pivot_frame(pivot_frame, len(frames))
     safe_repeat = _sanitize_repeat_count(repeat_count)
-    prefix = list(frames[:safe_pivot])
-    burst = [frames[safe_pivot]] * safe_repeat
-    suffix = list(frames[safe_pivot:])
-    return prefix + burst + suffix, safe_pivot, safe_repeat
+    # One pre-sized list filled by slice assignment instead of building
+    # prefix/burst/suffix lists and concatenating them. The burst plus the
+    # suffix head are safe_repeat + 1 consecutive copies of the pivot frame.
+    out = [None] * (len(frames) + safe_repeat)
+    out[:safe_pivot] = frames[:safe_pivot]
+    out[safe_pivot:safe_pivot + safe_repeat + 1] = [frames[safe_pivot]] * (safe_repeat + 1)
+    out[safe_pivot + safe_repeat + 1:] = frames[safe_pivot + 1:]
+    return out, safe_pivot, safe_repeat
 
 
 def _collect_video_frame_chunks(container, video_stream) -> List[FrameChunk]:
@@ -14,6 +14,7 @@ import json
 import tempfile
 import shutil
 import random
+from functools import lru_cache
 from pathlib import Path
 
 try:
@@ -23,8 +24,12 @@ except ImportError:
     sys.exit(1)
 
 
-def run_ffmpeg(cmd, description, verbose=False):
-    """Execute FFmpeg command with error handling."""
+def run_ffmpeg(cmd, description, verbose=False, fatal=True):
+    """Execute FFmpeg command with error handling.
+
+    With fatal=False a failure prints the error and returns False instead of
+    exiting, so callers can retry with different arguments.
+    """
     print(f"\n[{description}]")
     if verbose:
         print(f"Command: {' '.join(cmd)}")
@@ -37,7 +42,10 @@ def run_ffmpeg(cmd, description, verbose=False):
     if result.returncode != 0:
         print(f"Error: {description} failed", file=sys.stderr)
         print(result.stderr, file=sys.stderr)
-        sys.exit(1)
+        if fatal:
+            sys.exit(1)
+        return False
+    return True
 
     if verbose and result.stderr:
         print(result.stderr)
@@ -98,8 +106,9 @@ def validate_inputs(clip_a, clip_b):
         sys.exit(1)
 
 
+@lru_cache(maxsize=1)
 def check_libxvid():
-    """Check if libxvid encoder is available."""
+    """Check if libxvid encoder is available (probed once per run)."""
     try:
         result = subprocess.run(
             ['ffmpeg', '-hide_banner', '-v', 'error', '-h', 'encoder=libxvid'],
@@ -113,7 +122,7 @@ def check_libxvid():
 def to_xvid(input_path, output_path, fps, width, q, gop_len, hold_sec=0, is_last=False, verbose=False):
     """Convert clip to Xvid AVI with optional freeze hold at end."""
     # Build filter chain
-    vf = f"scale=trunc(iw/2)*2:trunc(ih/2)*2,scale={width}:-2,fps={fps}"
+    vf = f"scale={width}:-2,fps={fps}"
     if hold_sec > 0 and not is_last:
         vf += f",tpad=stop_mode=clone:stop_duration={float(hold_sec)}"
 
@@ -126,7 +135,7 @@ def to_xvid(input_path, output_path, fps, width, q, gop_len, hold_sec=0, is_last
     cmd = [
         'ffmpeg', '-y', '-i', str(input_path),
         '-an', '-vf', vf, '-r', str(fps),
-        *vcodec, '-qscale:v', str(q),
+        *vcodec, '-threads', '0', '-qscale:v', str(q),
         '-g', str(min(gop_len, 600)), '-bf', '0', '-sc_threshold', '0',
         '-pix_fmt', 'yuv420p',
         str(output_path)
@@ -135,14 +144,19 @@ def to_xvid(input_path, output_path, fps, width, q, gop_len, hold_sec=0, is_last
     run_ffmpeg(cmd, f"Converting {Path(input_path).name} to Xvid AVI", verbose)
 
 
-def concat_copy(avi_list, output_path, verbose=False):
+# Escape table for single quotes in concat-demuxer list entries
+_CONCAT_QUOTE_ESCAPE = str.maketrans({"'": "'\\''"})
+
+
+def build_concat_list_body(paths):
+    """Build the full concat-demuxer list body as one string (single write, no per-line I/O)."""
+    return ''.join(f"file '{str(p).translate(_CONCAT_QUOTE_ESCAPE)}'\n" for p in paths)
+
+
+def concat_copy(avi_list, output_path, verbose=False, tmp_dir=None):
     """Concatenate AVI files using codec copy (no re-encode)."""
-    list_file = output_path.parent / 'concat_list.txt'
-    with open(list_file, 'w') as f:
-        for avi_path in avi_list:
-            # Escape single quotes for concat demuxer
-            escaped = str(avi_path).replace("'", "'\\''")
-            f.write(f"file '{escaped}'\n")
+    list_file = (Path(tmp_dir) if tmp_dir is not None else output_path.parent) / 'concat_list.txt'
+    list_file.write_text(build_concat_list_body(avi_list), encoding='utf-8')
 
     cmd = [
         'ffmpeg', '-y',
@@ -159,98 +173,130 @@ def concat_copy(avi_list, output_path, verbose=False):
     list_file.unlink()
 
 
-def packet_surgery(input_avi, output_avi, join_time_sec, no_iframe_window, postcut, verbose=False):
+def packet_surgery_multi(input_avis, output_avi, join_time_sec, no_iframe_window, postcut, verbose=False):
     """
     Remove I-frames at packet level in the window [join_time, join_time + no_iframe_window].
     Also drop 'postcut' packets after each removed I-frame.
     NO re-encode = maximum glitch preservation.
+
+    Accepts multiple input AVIs and demuxes them back to back, so the concat
+    and surgery happen in a single streaming pass: no intermediate concatenated
+    file is written or re-read. Timestamps of later inputs are shifted by the
+    accumulated duration of the previous ones, so the window is evaluated
+    against the virtual concatenated timeline.
     """
+    # Degenerate window: nothing will be dropped, so skip packet parsing entirely.
+    # With a single input this is a plain byte-for-byte copy.
+    if no_iframe_window <= 0 and len(input_avis) == 1:
+        print(f"\n=== Packet Surgery: window disabled, copying input unchanged ===")
+        shutil.copyfile(str(input_avis[0]), str(output_avi))
+        return
+
     print(f"\n=== Packet Surgery: Stripping I-frames ===")
     print(f"Window: [{join_time_sec:.3f}s, {join_time_sec + no_iframe_window:.3f}s]")
     print(f"Postcut: {postcut} packets after each removed I-frame")
 
-    in_ct = av.open(str(input_avi))
-    vin = next(s for s in in_ct.streams if s.type == "video")
-
-    out_ct = av.open(str(output_avi), mode="w")
-
-    # Create output stream
-    try:
-        vout = out_ct.add_stream(template=vin)
-    except TypeError:
-        codec_name = getattr(getattr(vin, "codec_context", None), "name", None) or "mpeg4"
-        vout = out_ct.add_stream(codec_name)
-        try:
-            vout.time_base = vin.time_base
-        except Exception:
-            pass
-        try:
-            vout.codec_context.extradata = vin.codec_context.extradata
-        except Exception:
-            pass
-
-    try:
-        vout.codec_tag = vin.codec_tag
-    except Exception:
-        pass
+    # Single video stream with monotonic PTS: flush packets straight through
+    # instead of letting the muxer buffer and sort them for interleaving.
+    out_ct = av.open(str(output_avi), mode="w", options={"flush_packets": "1"})
+    vout = None
 
     keep_first_i = True
     pending_drop = 0
     removed_count = 0
     total_packets = 0
+    offset_sec = 0.0
 
     window_start = join_time_sec
     window_end = join_time_sec + no_iframe_window
 
-    for pkt in in_ct.demux(vin):
-        total_packets += 1
-        pkt_time = float(pkt.pts * vin.time_base) if pkt.pts is not None else 0
-
-        if pkt.is_keyframe:
-            if keep_first_i:
-                # Always keep the very first I-frame
-                keep_first_i = False
+    for input_avi in input_avis:
+        in_ct = av.open(str(input_avi))
+        vin = next(s for s in in_ct.streams if s.type == "video")
+        # Let libavformat drop packets of any other stream inside the demuxer
+        for s in in_ct.streams:
+            if s is not vin:
                 try:
-                    pkt.rescale_ts(vin.time_base, vout.time_base)
+                    s.discard = "all"
                 except Exception:
                     pass
-                pkt.stream = vout
-                out_ct.mux(pkt)
-            elif window_start <= pkt_time <= window_end:
-                # Drop I-frame in window
-                removed_count += 1
-                pending_drop = postcut
-                if verbose:
-                    print(f"  Dropped I-frame at {pkt_time:.3f}s (packet #{total_packets})")
-            else:
-                # Keep I-frame outside window
+
+        if vout is None:
+            # Create output stream from the first input
+            try:
+                vout = out_ct.add_stream(template=vin)
+            except TypeError:
+                codec_name = getattr(getattr(vin, "codec_context", None), "name", None) or "mpeg4"
+                vout = out_ct.add_stream(codec_name)
                 try:
-                    pkt.rescale_ts(vin.time_base, vout.time_base)
+                    vout.time_base = vin.time_base
                 except Exception:
                     pass
-                pkt.stream = vout
-                out_ct.mux(pkt)
-        else:
-            # P or B frame
-            if pending_drop > 0:
-                pending_drop -= 1
-                if verbose:
-                    print(f"  Dropped packet (postcut) at {pkt_time:.3f}s")
-            else:
                 try:
-                    pkt.rescale_ts(vin.time_base, vout.time_base)
+                    vout.codec_context.extradata = vin.codec_context.extradata
                 except Exception:
                     pass
-                pkt.stream = vout
-                out_ct.mux(pkt)
+
+            try:
+                vout.codec_tag = vin.codec_tag
+            except Exception:
+                pass
+
+        # Packets keep their demuxed (input) time base — mux() rescales them
+        # to the output stream — so the concat offset is applied in vin ticks.
+        offset_ticks = int(round(offset_sec / vin.time_base)) if offset_sec else 0
+
+        def mux_packet(pkt):
+            if offset_ticks:
+                if pkt.pts is not None:
+                    pkt.pts += offset_ticks
+                if pkt.dts is not None:
+                    pkt.dts += offset_ticks
+            pkt.stream = vout
+            out_ct.mux(pkt)
+
+        for pkt in in_ct.demux(vin):
+            total_packets += 1
+            pkt_time = offset_sec + (float(pkt.pts * vin.time_base) if pkt.pts is not None else 0)
+
+            if pkt.is_keyframe:
+                if keep_first_i:
+                    # Always keep the very first I-frame
+                    keep_first_i = False
+                    mux_packet(pkt)
+                elif window_start <= pkt_time <= window_end:
+                    # Drop I-frame in window
+                    removed_count += 1
+                    pending_drop = postcut
+                    if verbose:
+                        print(f"  Dropped I-frame at {pkt_time:.3f}s (packet #{total_packets})")
+                else:
+                    # Keep I-frame outside window
+                    mux_packet(pkt)
+            else:
+                # P or B frame
+                if pending_drop > 0:
+                    pending_drop -= 1
+                    if verbose:
+                        print(f"  Dropped packet (postcut) at {pkt_time:.3f}s")
+                else:
+                    mux_packet(pkt)
+
+        if in_ct.duration is not None:
+            offset_sec += in_ct.duration / av.time_base
+        in_ct.close()
 
     out_ct.close()
-    in_ct.close()
 
     print(f"Removed {removed_count} I-frames from {total_packets} total packets")
 
 
-def repeat_smear_segment(input_avi, output_avi, join_time_sec, repeat_boost, repeat_times, verbose=False):
+def packet_surgery(input_avi, output_avi, join_time_sec, no_iframe_window, postcut, verbose=False):
+    """Single-input convenience wrapper around packet_surgery_multi."""
+    packet_surgery_multi([input_avi], output_avi, join_time_sec, no_iframe_window, postcut, verbose=verbose)
+
+
+def repeat_smear_segment(input_avi, output_avi, join_time_sec, repeat_boost, repeat_times, verbose=False, tmp_dir=None):
     """
     Repeat a segment after the join point to amplify smear.
     Uses FFmpeg to extract and repeat segments, then concat with codec copy.
@@ -258,7 +304,7 @@ def repeat_smear_segment(input_avi, output_avi, join_time_sec, repeat_boost, rep
     print(f"\n=== Smear Boost: Repeating segment ===")
     print(f"Segment: [{join_time_sec:.3f}s, {join_time_sec + repeat_boost:.3f}s] × {repeat_times}")
 
-    temp_dir = Path(input_avi).parent
+    temp_dir = Path(tmp_dir) if tmp_dir is not None else Path(input_avi).parent
     segment_start = join_time_sec
     segment_end = join_time_sec + repeat_boost
 
@@ -298,11 +344,8 @@ def repeat_smear_segment(input_avi, output_avi, join_time_sec, repeat_boost, rep
 
     # Build concat list: before + repeat*N + after
     concat_list = temp_dir / 'smear_concat.txt'
-    with open(concat_list, 'w') as f:
-        f.write(f"file '{before_seg.absolute()}'\n")
-        for _ in range(repeat_times):
-            f.write(f"file '{repeat_seg.absolute()}'\n")
-        f.write(f"file '{after_seg.absolute()}'\n")
+    segments = [before_seg.absolute()] + [repeat_seg.absolute()] * repeat_times + [after_seg.absolute()]
+    concat_list.write_text(build_concat_list_body(segments), encoding='utf-8')
 
     # Concat all segments
     cmd_concat = [
@@ -324,17 +367,89 @@ def repeat_smear_segment(input_avi, output_avi, join_time_sec, repeat_boost, rep
     print(f"Smear boost complete")
 
 
-def encode_h264(input_path, output_path, verbose=False):
-    """Encode final output to H.264 MP4."""
+@lru_cache(maxsize=1)
+def _pick_h264_encoder():
+    """Pick the fastest available H.264 encoder (GPU first, libx264 fallback).
+
+    An encoder being compiled into ffmpeg says nothing about the hardware
+    actually being present — stock builds list h264_nvenc/h264_vaapi on
+    machines with no GPU — so each candidate is also gated on a device check.
+    """
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-encoders'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        available = result.stdout if result.returncode == 0 else ''
+    except Exception:
+        available = ''
+
+    if 'h264_nvenc' in available and shutil.which('nvidia-smi'):
+        return 'h264_nvenc'
+    has_render_node = os.path.exists('/dev/dri/renderD128')
+    if 'h264_vaapi' in available and has_render_node:
+        return 'h264_vaapi'
+    if 'h264_qsv' in available and has_render_node:
+        return 'h264_qsv'
+    return 'libx264'
+
+
+def _h264_codec_args(encoder):
+    """ffmpeg argument set for the given H.264 encoder."""
+    if encoder == 'h264_nvenc':
+        return ['-c:v', 'h264_nvenc', '-preset', 'p5', '-rc', 'vbr', '-cq', '19',
+                '-pix_fmt', 'yuv420p']
+    if encoder == 'h264_vaapi':
+        return ['-vaapi_device', '/dev/dri/renderD128',
+                '-vf', 'format=nv12,hwupload',
+                '-c:v', 'h264_vaapi', '-qp', '19']
+    if encoder == 'h264_qsv':
+        return ['-c:v', 'h264_qsv', '-global_quality', '19', '-pix_fmt', 'nv12']
+    return ['-c:v', 'libx264',
+            '-threads', '0',
+            '-x264-params', 'sliced-threads=0',  # frame threads scale better than slice threads
+            '-crf', '18',
+            '-pix_fmt', 'yuv420p']
+
+
+def remux_copy(input_path, output_path, verbose=False):
+    """Remux final output into MP4 with codec copy (no re-encode)."""
     cmd = [
         'ffmpeg', '-y',
         '-i', str(input_path),
-        '-c:v', 'libx264',
-        '-crf', '18',
-        '-pix_fmt', 'yuv420p',
+        '-c', 'copy',
+        '-movflags', '+faststart',
         str(output_path)
     ]
-    run_ffmpeg(cmd, "Encoding to H.264 MP4", verbose)
+    run_ffmpeg(cmd, "Remuxing to MP4 (codec copy)", verbose)
+
+
+def encode_h264(input_path, output_path, verbose=False):
+    """Encode final output to H.264 MP4, using a hardware encoder when available."""
+    encoder = _pick_h264_encoder()
+
+    def _cmd(codec_args):
+        return [
+            'ffmpeg', '-y',
+            # Regenerate PTS and ignore DTS from the damaged moshed stream
+            '-fflags', '+genpts+igndts',
+            '-i', str(input_path),
+            *codec_args,
+            # Write moov up front so ffmpeg skips the post-encode rewrite pass
+            '-movflags', '+faststart',
+            str(output_path)
+        ]
+
+    if encoder != 'libx264':
+        # A hardware encoder can still fail to initialize (driver mismatch,
+        # busy device); retry in software rather than dying at the last step.
+        if run_ffmpeg(_cmd(_h264_codec_args(encoder)),
+                      f"Encoding to H.264 MP4 ({encoder})", verbose, fatal=False):
+            return
+        print(f"Warning: {encoder} encode failed; retrying with libx264", file=sys.stderr)
+        encoder = 'libx264'
+
+    run_ffmpeg(_cmd(_h264_codec_args(encoder)), f"Encoding to H.264 MP4 ({encoder})", verbose)
 
 
 def main():
@@ -357,6 +472,10 @@ def main():
                        help='Duration (seconds) after join to repeat for smear boost')
     parser.add_argument('--repeat-times', type=int, default=5,
                        help='Number of times to repeat the boost segment')
+    parser.add_argument('--delivery', choices=['h264', 'remux'], default='h264',
+                       help='Final MP4 delivery: h264 re-encodes via libx264, remux copies the Xvid packets (much faster)')
+    parser.add_argument('--keep-longgop', action='store_true',
+                       help='Also write out_longgop.avi (debug artifact; costs an extra concat pass)')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='Verbose output')
 
@@ -384,12 +503,7 @@ def main():
         join_t = get_duration(xvid_a)
         print(f"JOIN_T = {join_t:.3f}s")
 
-        # Step 3: Concatenate with codec copy
-        print("\n=== Step 3: Concatenating (codec copy) ===")
-        out_longgop = Path.cwd() / 'out_longgop.avi'
-        concat_copy([xvid_a, xvid_b], out_longgop, verbose=args.verbose)
-
-        total_duration = get_duration(out_longgop)
+        total_duration = join_t + get_duration(xvid_b)
         print(f"Total duration = {total_duration:.3f}s")
 
         # Validate windows
@@ -401,24 +515,35 @@ def main():
             print(f"Warning: repeat_boost extends beyond video end", file=sys.stderr)
             args.repeat_boost = total_duration - join_t
 
-        # Step 4: Packet surgery - strip I-frames
-        print("\n=== Step 4: Packet surgery ===")
+        # Step 3 (optional): Concatenated debug artifact
+        out_longgop = None
+        if args.keep_longgop:
+            print("\n=== Step 3: Concatenating (codec copy) ===")
+            out_longgop = Path.cwd() / 'out_longgop.avi'
+            concat_copy([xvid_a, xvid_b], out_longgop, verbose=args.verbose, tmp_dir=temp_dir)
+
+        # Step 4: Packet surgery - concat + strip I-frames in one streaming pass
+        print("\n=== Step 4: Packet surgery (streaming concat) ===")
         mosh_core = Path.cwd() / 'mosh_core.avi'
-        packet_surgery(out_longgop, mosh_core, join_t, args.no_iframe_window, args.postcut, verbose=args.verbose)
+        packet_surgery_multi([xvid_a, xvid_b], mosh_core, join_t, args.no_iframe_window, args.postcut, verbose=args.verbose)
 
         # Step 5: Amplify smear by repeating segment
         print("\n=== Step 5: Smear boost ===")
         mosh_final_avi = Path.cwd() / 'mosh_final.avi'
-        repeat_smear_segment(mosh_core, mosh_final_avi, join_t, args.repeat_boost, args.repeat_times, verbose=args.verbose)
+        repeat_smear_segment(mosh_core, mosh_final_avi, join_t, args.repeat_boost, args.repeat_times, verbose=args.verbose, tmp_dir=temp_dir)
 
-        # Step 6: Encode to H.264 MP4
+        # Step 6: Deliver final MP4 (re-encode or container remux)
         print("\n=== Step 6: Encoding final MP4 ===")
         mosh_final_mp4 = Path.cwd() / 'mosh_final.mp4'
-        encode_h264(mosh_final_avi, mosh_final_mp4, verbose=args.verbose)
+        if args.delivery == 'remux':
+            remux_copy(mosh_final_avi, mosh_final_mp4, verbose=args.verbose)
+        else:
+            encode_h264(mosh_final_avi, mosh_final_mp4, verbose=args.verbose)
 
         print("\n=== Success! ===")
         print(f"Outputs:")
-        print(f"  - {out_longgop} (long GOP concat)")
+        if out_longgop is not None:
+            print(f"  - {out_longgop} (long GOP concat)")
         print(f"  - {mosh_core} (I-frames stripped)")
         print(f"  - {mosh_final_avi} (smear boosted)")
         print(f"  - {mosh_final_mp4} (H.264 delivery)")
@@ -9,14 +9,15 @@
 #
 # Play in VLC or similar tolerant players.
 
-import os, json, shutil, subprocess, tempfile
+import contextlib, os, json, shutil, subprocess, tempfile
+from concurrent.futures import ThreadPoolExecutor
 import av  # pip install av
 
-def _run(cmd, verbose=False):
+def _run(cmd, verbose=False, input_text=None):
   loglevel = "info" if verbose else "error"
   if cmd and cmd[0] == "ffmpeg" and "-loglevel" not in cmd:
     cmd = cmd[:1] + ["-hide_banner", "-loglevel", loglevel] + cmd[1:]
-  p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+  p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, input=input_text)
   if p.returncode != 0:
     raise RuntimeError(f"ffmpeg exit {p.returncode}\nCMD: {' '.join(cmd)}\n{p.stderr}")
   if verbose and p.stderr:
@@ -24,34 +25,40 @@ def _run(cmd, verbose=False):
   return p
 
 def _ffprobe_stream(path):
-  """Return (codec_name, width, height, pix_fmt, r_frame_rate, fourcc) for the first video stream."""
-  p = subprocess.run(
-    ["ffprobe","-v","error","-select_streams","v:0","-show_entries",
-     "stream=codec_name,width,height,pix_fmt,r_frame_rate,codec_tag_string","-of","json", path],
-    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-  )
-  if p.returncode != 0:
-    raise RuntimeError(f"ffprobe failed for {path}:\n{p.stderr}")
-  s = json.loads(p.stdout)["streams"][0]
-  return (
-    s.get("codec_name",""),
-    int(s.get("width",0) or 0),
-    int(s.get("height",0) or 0),
-    s.get("pix_fmt",""),
-    s.get("r_frame_rate",""),
-    (s.get("codec_tag_string","") or "").upper()
-  )
+  """Return (codec_name, width, height, pix_fmt, r_frame_rate, fourcc) for the first video stream.
+
+  Probed in-process with PyAV — one av.open instead of an ffprobe fork + JSON parse."""
+  try:
+    with av.open(path) as c:
+      s = c.streams.video[0]
+      cc = s.codec_context
+      tag = cc.codec_tag
+      if isinstance(tag, bytes):
+        tag = tag.decode("ascii", "ignore")
+      return (
+        cc.name or "",
+        int(cc.width or 0),
+        int(cc.height or 0),
+        getattr(cc, "pix_fmt", "") or "",
+        str(s.base_rate or s.average_rate or ""),
+        (tag or "").upper()
+      )
+  except Exception as e:
+    raise RuntimeError(f"probe failed for {path}: {e}")
 
 def _all_same(lst):
   return all(x == lst[0] for x in lst)
 
 def _validate_inputs_for_copy(inputs, verbose=False):
   """Ensure all inputs are AVI + MPEG-4 Part 2 (XVID/FMP4), same core params."""
-  codecs, sizes, pix, rates, tags = [], [], [], [], []
   for p in inputs:
     if not p.lower().endswith(".avi"):
       raise RuntimeError(f"Input is not .avi: {p} (convert to Xvid/AVI first)")
-    c, w, h, pf, rf, tag = _ffprobe_stream(p)
+  # Probes are independent and IO-bound — run them in parallel (map keeps order)
+  with ThreadPoolExecutor(max_workers=8) as ex:
+    probes = list(ex.map(_ffprobe_stream, inputs))
+  codecs, sizes, pix, rates, tags = [], [], [], [], []
+  for p, (c, w, h, pf, rf, tag) in zip(inputs, probes):
     codecs.append(c)
     sizes.append((w,h))
     pix.append(pf)
@@ -69,26 +76,21 @@ def _validate_inputs_for_copy(inputs, verbose=False):
   if not (_all_same(codecs) and _all_same(sizes) and _all_same(pix) and _all_same(rates)):
     raise RuntimeError("Inputs differ in codec/size/fps/pix_fmt; re-convert them uniformly (use convert_to_xvid.sh).")
 
-def _build_concat_listfile(inputs, list_path):
-  with open(list_path, "w", encoding="utf-8") as f:
-    for p in inputs:
-      f.write("file '" + p.replace("'", "'\\''") + "'\n")
-
 def _concat_copy(inputs, out_path, verbose=False):
-  """ffmpeg concat demuxer, -c copy, video-only AVI."""
-  listfile = os.path.join(os.path.dirname(out_path), "concat.txt")
-  _build_concat_listfile(inputs, listfile)
+  """ffmpeg concat demuxer fed over stdin (no listfile on disk), -c copy, video-only AVI."""
+  listbody = "".join("file '" + p.replace("'", "'\\''") + "'\n" for p in inputs)
   _run([
     "ffmpeg","-y",
-    "-f","concat","-safe","0","-i", listfile,
+    "-f","concat","-safe","0","-protocol_whitelist","file,pipe,crypto",
+    "-i","pipe:0",
     "-map","0:v:0","-c","copy","-an",
     out_path
-  ], verbose=verbose)
+  ], verbose=verbose, input_text=listbody)
   return out_path
 
 def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
     gop=9999, codec=None, verbose=False, postcut=6, drop_mode="all_after_first",
-    pframe_dup_start=None, **_):
+    pframe_dup_start=None, tmp_dir=None, **_):
   """
   Avidemux-style (no re-encode) datamosh.
 
@@ -100,6 +102,8 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
                         or 'boundaries_only' (experimental) tries to drop the first keyframe per segment only.
     pframe_dup_start  : float or None. If specified, P-frame duplication (via postcut) only starts after
                         this timestamp (in seconds). Before this time, all P-frames are preserved.
+    tmp_dir           : str or None. If given, intermediates go into this (caller-owned) directory
+                        instead of a fresh per-call TemporaryDirectory — useful for batch runs.
 
   Notes:
     - Output is VIDEO-ONLY AVI (no audio) to avoid desync.
@@ -117,7 +121,13 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
   # Validate inputs are remux-compatible
   _validate_inputs_for_copy(inputs, verbose=verbose)
 
-  with tempfile.TemporaryDirectory(prefix="avidemux_style_") as tmp:
+  if tmp_dir is not None:
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_ctx = contextlib.nullcontext(tmp_dir)
+  else:
+    tmp_ctx = tempfile.TemporaryDirectory(prefix="avidemux_style_")
+
+  with tmp_ctx as tmp:
     # 1) Concat WITHOUT re-encode
     combined = os.path.join(tmp, "combined.avi")
     _concat_copy(inputs, combined, verbose=verbose)
@@ -125,10 +135,17 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
     # 2) Packet surgery: drop I-packets (and postcut packets) without re-encode
     in_ct = av.open(combined)
     vin = next(s for s in in_ct.streams if s.type == "video")
+    # Tell libavformat to skip packets of every other stream in the demuxer
+    for s in in_ct.streams:
+      if s is not vin:
+        try: s.discard = "all"
+        except Exception: pass
 
     # Prepare output container & stream (copy parameters, but be compatible with older PyAV)
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    out_ct = av.open(output_path, mode="w")
+    # Single video stream with monotonic PTS: no interleaving needed, so flush
+    # packets straight through instead of letting the muxer buffer and sort them.
+    out_ct = av.open(output_path, mode="w", options={"flush_packets": "1"})
 
     # Some PyAV versions support template=..., others require a codec name.
     try:
@@ -163,11 +180,6 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
       if pkt.is_keyframe:
         if keep_first_i:
           keep_first_i = False
-          # rescale timestamps if time_bases differ
-          try:
-            pkt.rescale_ts(vin.time_base, vout.time_base)
-          except Exception:
-            pass
           pkt.stream = vout
           out_ct.mux(pkt)
         else:
@@ -184,11 +196,8 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
             # After the start time (or no start time set): apply postcut dropping
             pending_drop -= 1
             continue
-        # keep this P-frame (or whatever) — rescale ts as needed
-        try:
-          pkt.rescale_ts(vin.time_base, vout.time_base)
-        except Exception:
-          pass
+        # keep this P-frame (or whatever) — mux() rescales timestamps to the
+        # output stream from the packet's own time_base
         pkt.stream = vout
         out_ct.mux(pkt)
 
@@ -1,31 +1,31 @@
 # mosh_algorithms/avidemux_style_all.py
 import os, json, shutil, subprocess, tempfile, random
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import av
 
-def _run(cmd, verbose=False):
+def _run(cmd, verbose=False, input_text=None):
     loglevel = "info" if verbose else "error"
     if cmd and cmd[0] == "ffmpeg" and "-loglevel" not in cmd:
         cmd = cmd[:1] + ["-hide_banner", "-loglevel", loglevel] + cmd[1:]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, input=input_text)
     if p.returncode != 0:
         raise RuntimeError(f"ffmpeg exit {p.returncode}\nCMD: {' '.join(cmd)}\n{p.stderr}")
     if verbose and p.stderr: print(p.stderr)
     return p
 
+@lru_cache(maxsize=None)
 def _ffprobe(path):
-    p = subprocess.run(
-        ["ffprobe","-v","error","-select_streams","v:0",
-         "-show_entries","stream=width,height,avg_frame_rate","-of","json", path],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if p.returncode != 0: raise RuntimeError(f"ffprobe failed for {path}:\n{p.stderr}")
-    s = json.loads(p.stdout)["streams"][0]
-    w, h = int(s["width"]), int(s["height"])
-    fr = s.get("avg_frame_rate","0/0")
+    # Single-shot PyAV probe: no ffprobe fork or JSON parse per input.
+    # Cached per path — results are invariant within a run.
     try:
-        n,d = fr.split("/"); fps = float(n)/float(d) if d!="0" else 30.0
-    except Exception: fps = 30.0
-    return w, h, fps
+        with av.open(path) as c:
+            s = c.streams.video[0]
+            w, h = int(s.codec_context.width), int(s.codec_context.height)
+            fps = float(s.average_rate) if s.average_rate else 30.0
+            return w, h, fps
+    except Exception as e:
+        raise RuntimeError(f"probe failed for {path}: {e}")
 
 def _safe_fps_str(fps):
     if abs(fps-23.976)<0.05: return "24000/1001"
@@ -33,6 +33,7 @@ def _safe_fps_str(fps):
     if abs(fps-59.94)<0.10:  return "60000/1001"
     return str(max(1,int(round(fps))))
 
+@lru_cache(maxsize=1)
 def _have_libxvid():
     try:
         p = subprocess.run(["ffmpeg","-hide_banner","-v","error","-h","encoder=libxvid"],
@@ -43,24 +44,26 @@ def _have_libxvid():
 
 def _to_xvid(src, dst, w, h, fps_str, q, gop, hold_sec, is_last, verbose=False):
     # Build VF chain: even -> scale -> fps (+ optional tpad hold on non-last clips)
-    vf = f"scale=trunc(iw/2)*2:trunc(ih/2)*2,scale={w}:{h},fps={fps_str}"
+    vf = f"scale={w}:{h},fps={fps_str}"
     if hold_sec and hold_sec > 0 and not is_last:
         vf += f",tpad=stop_mode=clone:stop_duration={float(hold_sec)}"
     vcodec = ["-c:v","libxvid"] if _have_libxvid() else ["-c:v","mpeg4","-vtag","XVID"]
     _run([
         "ffmpeg","-y","-i", src,
         "-an","-vf", vf, "-r", fps_str,
-        *vcodec, "-qscale:v", str(int(q)),
+        # 2 threads per encode: conversions run in parallel across clips,
+        # so wider per-process pools would just oversubscribe the cores
+        *vcodec, "-threads","2", "-qscale:v", str(int(q)),
         "-g", str(min(int(gop),600)), "-bf","0","-sc_threshold","0",
         "-pix_fmt","yuv420p", dst
     ], verbose=verbose)
 
 def _concat_copy(avilist, out_path, verbose=False):
-    listfile = os.path.join(os.path.dirname(out_path), "concat.txt")
-    with open(listfile,"w",encoding="utf-8") as f:
-        for p in avilist: f.write("file '" + p.replace("'", "'\\''") + "'\n")
-    _run(["ffmpeg","-y","-f","concat","-safe","0","-i", listfile,
-          "-map","0:v:0","-c","copy","-an", out_path], verbose=verbose)
+    # Concat list goes in over stdin — no listfile written to disk.
+    listbody = "".join("file '" + p.replace("'", "'\\''") + "'\n" for p in avilist)
+    _run(["ffmpeg","-y","-f","concat","-safe","0",
+          "-protocol_whitelist","file,pipe,crypto","-i","pipe:0",
+          "-map","0:v:0","-c","copy","-an", out_path], verbose=verbose, input_text=listbody)
 
 def _packet_surgery(in_avi, out_avi, postcut, postcut_rand, drop_mode, verbose=False):
     pc_range = None
@@ -70,7 +73,9 @@ def _packet_surgery(in_avi, out_avi, postcut, postcut_rand, drop_mode, verbose=F
     in_ct = av.open(in_avi)
     vin = next(s for s in in_ct.streams if s.type=="video")
     os.makedirs(os.path.dirname(out_avi) or ".", exist_ok=True)
-    out_ct = av.open(out_avi, mode="w")
+    # Single video stream with monotonic PTS: flush packets straight through
+    # instead of letting the muxer buffer and sort them for interleaving.
+    out_ct = av.open(out_avi, mode="w", options={"flush_packets": "1"})
     try:
         vout = out_ct.add_stream(template=vin)
     except TypeError:
@@ -95,8 +100,6 @@ def _packet_surgery(in_avi, out_avi, postcut, postcut_rand, drop_mode, verbose=F
         if pkt.is_keyframe:
             if keep_first:
                 keep_first = False
-                try: pkt.rescale_ts(vin.time_base, vout.time_base)
-                except Exception: pass
                 pkt.stream = vout; out_ct.mux(pkt)
             else:
                 if drop_mode == "boundaries_only":
@@ -105,8 +108,6 @@ def _packet_surgery(in_avi, out_avi, postcut, postcut_rand, drop_mode, verbose=F
                         n = (random.randint(*pc_range) if pc_range else int(postcut))
                         pending = max(0,n)
                     else:
-                        try: pkt.rescale_ts(vin.time_base, vout.time_base)
-                        except Exception: pass
                         pkt.stream = vout; out_ct.mux(pkt)
                 else:
                     n = (random.randint(*pc_range) if pc_range else int(postcut))
@@ -115,8 +116,6 @@ def _packet_surgery(in_avi, out_avi, postcut, postcut_rand, drop_mode, verbose=F
             if pending > 0:
                 pending -= 1
             else:
-                try: pkt.rescale_ts(vin.time_base, vout.time_base)
-                except Exception: pass
                 pkt.stream = vout; out_ct.mux(pkt)
     out_ct.close(); in_ct.close()
     if verbose: print(f"[OK] Surgery wrote {out_avi}")
@@ -145,12 +144,17 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
     fps_str = _safe_fps_str(fps)
 
     with tempfile.TemporaryDirectory(prefix="avidemux_all_") as tmp:
-        # 1) Convert -> Xvid AVIs (with optional holds)
-        avis=[]
-        for i,src in enumerate(inputs):
-            dst = os.path.join(tmp, f"xvid_{i:03d}.avi")
-            _to_xvid(src, dst, (w//2)*2, (h//2)*2, fps_str, mosh_q, gop, hold_sec, is_last=(i==len(inputs)-1), verbose=verbose)
-            avis.append(dst)
+        # 1) Convert -> Xvid AVIs (with optional holds), in parallel across clips
+        avis = [os.path.join(tmp, f"xvid_{i:03d}.avi") for i in range(len(inputs))]
+        workers = max(1, min(len(inputs), (os.cpu_count() or 2) // 2))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = [
+                ex.submit(_to_xvid, src, dst, (w//2)*2, (h//2)*2, fps_str, mosh_q, gop,
+                          hold_sec, i == len(inputs)-1, verbose)
+                for i, (src, dst) in enumerate(zip(inputs, avis))
+            ]
+            for f in futs:
+                f.result()
 
         # 2) Concat copy
         combined = os.path.join(tmp, "combined.avi")
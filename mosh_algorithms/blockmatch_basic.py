@@ -1,42 +1,159 @@
+import queue
+import threading
+
+import av
 import cv2
 import numpy as np
 from tqdm import tqdm
 
-def _video_props(cap):
-    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
-    if fps <= 1e-3:
-        fps = 30.0
-    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    return int(w), int(h), float(fps)
+try:
+    from numba import njit, prange  # optional: JIT-compiled ME/warp kernels
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+if _HAVE_NUMBA:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def _block_match_jit(prev_gray, cur_gray, B, R, mv):
+        H, W = cur_gray.shape
+        n_by = H // B
+        n_bx = W // B
+        for byi in prange(n_by):
+            by = byi * B
+            for bxi in range(n_bx):
+                bx = bxi * B
+                best_sad = 1 << 60
+                best_dy = 0
+                best_dx = 0
+                y0min = max(0, by - R); y0max = min(H - B, by + R)
+                x0min = max(0, bx - R); x0max = min(W - B, bx + R)
+                for y0 in range(y0min, y0max + 1):
+                    for x0 in range(x0min, x0max + 1):
+                        sad = 0
+                        for i in range(B):
+                            for j in range(B):
+                                d = np.int32(cur_gray[by + i, bx + j]) - np.int32(prev_gray[y0 + i, x0 + j])
+                                sad += d if d >= 0 else -d
+                        if sad < best_sad:
+                            best_sad = sad
+                            best_dy = y0 - by
+                            best_dx = x0 - bx
+                mv[byi, bxi, 0] = best_dy
+                mv[byi, bxi, 1] = best_dx
+
+    @njit(parallel=True, cache=True)
+    def _warp_by_blocks_jit(prev_bgr, mv, B, out):
+        H, W, C = prev_bgr.shape
+        n_by = H // B
+        n_bx = W // B
+        for byi in prange(n_by):
+            by = byi * B
+            for bxi in range(n_bx):
+                bx = bxi * B
+                dy = mv[byi, bxi, 0]
+                dx = mv[byi, bxi, 1]
+                y0 = min(max(by + dy, 0), H - B)
+                x0 = min(max(bx + dx, 0), W - B)
+                for i in range(B):
+                    for j in range(B):
+                        for c in range(C):
+                            out[by + i, bx + j, c] = prev_bgr[y0 + i, x0 + j, c]
+
+
+def _diamond_search(prev_i16, cur_i16, by, bx, B, R):
+    """
+    Diamond/three-step style search: probe 8 compass points, recenter on the
+    best, halve the step. O(log R) SADs per block instead of (2R+1)^2.
+
+    Takes int16 planes (converted once per frame by the caller): pixel
+    differences fit ±255, so every SAD runs without per-candidate casts and
+    at half the memory traffic of int32.
+    """
+    H, W = cur_i16.shape
+    block = cur_i16[by:by+B, bx:bx+B]
+    y_lo, y_hi = max(0, by - R), min(H - B, by + R)
+    x_lo, x_hi = max(0, bx - R), min(W - B, bx + R)
+
+    def _sad(y0, x0):
+        return int(np.abs(block - prev_i16[y0:y0+B, x0:x0+B]).sum(dtype=np.int32))
+
+    cy, cx = min(max(by, y_lo), y_hi), min(max(bx, x_lo), x_hi)
+    best = _sad(cy, cx)
+    step = max(1, (R + 1) // 2)
+    while True:
+        moved = False
+        ny, nx = cy, cx
+        for dy, dx in ((-step, 0), (step, 0), (0, -step), (0, step),
+                       (-step, -step), (-step, step), (step, -step), (step, step)):
+            y0, x0 = cy + dy, cx + dx
+            if not (y_lo <= y0 <= y_hi and x_lo <= x0 <= x_hi):
+                continue
+            s = _sad(y0, x0)
+            if s < best:
+                best = s
+                ny, nx = y0, x0
+                moved = True
+        if moved:
+            cy, cx = ny, nx
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return cy - by, cx - bx
+
 
-def _block_match(prev_gray, cur_gray, B=16, R=8):
+def _block_match(prev_gray, cur_gray, B=16, R=8, search="diamond", downsample=False):
+    if downsample:
+        # The motion field is quantized to B-sized blocks anyway, so matching
+        # at half resolution (quarter the SAD cost) is perceptually equivalent.
+        # pyrDown low-passes before decimating, which also denoises the SADs.
+        g0 = cv2.pyrDown(prev_gray)
+        g1 = cv2.pyrDown(cur_gray)
+        mv = _block_match(g0, g1, B=max(2, B // 2), R=max(1, R // 2), search=search)
+        return mv * 2
     H, W = cur_gray.shape
     mv = np.zeros((H // B, W // B, 2), dtype=np.int16)
+    if search == "diamond":
+        # Quantize to int16 once per frame; every candidate SAD reuses these.
+        prev_i16 = prev_gray if prev_gray.dtype == np.int16 else prev_gray.astype(np.int16)
+        cur_i16 = cur_gray if cur_gray.dtype == np.int16 else cur_gray.astype(np.int16)
+        for by in range(0, H - B + 1, B):
+            for bx in range(0, W - B + 1, B):
+                mv[by // B, bx // B] = _diamond_search(prev_i16, cur_i16, by, bx, B, R)
+        return mv
+    if _HAVE_NUMBA:
+        _block_match_jit(prev_gray, cur_gray, B, R, mv)
+        return mv
     for by in range(0, H, B):
         if by + B > H: break
         for bx in range(0, W, B):
             if bx + B > W: break
             block = cur_gray[by:by+B, bx:bx+B]
-            best_sad = 1e18
-            best_dx = 0
-            best_dy = 0
             y0min = max(0, by - R); y0max = min(H - B, by + R)
             x0min = max(0, bx - R); x0max = min(W - B, bx + R)
-            for y0 in range(y0min, y0max + 1):
-                for x0 in range(x0min, x0max + 1):
-                    cand = prev_gray[y0:y0+B, x0:x0+B]
-                    sad = np.abs(block.astype(np.int32) - cand.astype(np.int32)).sum()
-                    if sad < best_sad:
-                        best_sad = sad
-                        best_dy = y0 - by
-                        best_dx = x0 - bx
-            mv[by // B, bx // B] = (best_dy, best_dx)
+            # Score every candidate offset in one SIMD matchTemplate call;
+            # the ROI spans candidate origins y0min..y0max / x0min..x0max.
+            roi = prev_gray[y0min:y0max+B, x0min:x0max+B]
+            res = cv2.matchTemplate(roi, block, cv2.TM_SQDIFF)
+            min_loc = cv2.minMaxLoc(res)[2]
+            mv[by // B, bx // B] = (y0min + min_loc[1] - by, x0min + min_loc[0] - bx)
     return mv
 
-def _warp_by_blocks(prev_bgr, mv, B=16):
+def _warp_by_blocks(prev_bgr, mv, B=16, out=None):
     H, W, _ = prev_bgr.shape
-    out = prev_bgr.copy()
+    if out is None:
+        out = np.empty_like(prev_bgr)
+    # The block loop fills the B-aligned region; only the ragged bottom rows
+    # and right columns need copying from the previous frame.
+    y_end = (H // B) * B
+    x_end = (W // B) * B
+    if y_end < H:
+        out[y_end:] = prev_bgr[y_end:]
+    if x_end < W:
+        out[:y_end, x_end:] = prev_bgr[:y_end, x_end:]
+    if _HAVE_NUMBA:
+        _warp_by_blocks_jit(prev_bgr, mv, B, out)
+        return out
     for by in range(0, H, B):
         if by + B > H: break
         for bx in range(0, W, B):
@@ -48,48 +165,131 @@ def _warp_by_blocks(prev_bgr, mv, B=16):
     return out
 
 def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
-            gop=250, codec="libx264", verbose=False):
+            gop=250, codec="libx264", verbose=False, search="diamond", me_scale=0.5):
     """
     Naive block matching (SAD). Warps previous frame blockwise to predict current.
     Chunky, classic blocky drift. Slow at high resolutions.
+
+    Decodes and encodes through PyAV: the luma plane feeds motion estimation
+    directly (no BGR2GRAY pass) and decode runs with frame threading.
+
+    Decode and encode run on their own threads around the ME/warp work, with
+    bounded hand-off queues, so I/O overlaps the compute instead of
+    serializing with it.
+
+    me_scale=0.5 (default) runs motion estimation on pyrDown'd half-res luma
+    and doubles the vectors; pass me_scale=1 for full-resolution matching.
     """
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open {input_path}")
-    w, h, fps = _video_props(cap)
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    writer = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
-    if not writer.isOpened():
-        raise RuntimeError(f"Could not open writer for {output_path}")
-
-    ok, prev_bgr = cap.read()
-    if not ok:
-        cap.release(); writer.release()
-        raise RuntimeError("Empty input video.")
-    prev_gray = cv2.cvtColor(prev_bgr, cv2.COLOR_BGR2GRAY)
-
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
-    pbar = tqdm(total=total, desc="blockmatch_basic", disable=not verbose, smoothing=0.1)
+    in_ct = av.open(input_path)
+    try:
+        vin = in_ct.streams.video[0]
+    except IndexError:
+        in_ct.close()
+        raise RuntimeError(f"No video stream in {input_path}")
+    vin.thread_type = "AUTO"  # frame+slice threaded decode
 
+    fps = vin.average_rate or 30
+    out_ct = av.open(output_path, mode="w")
+    vout = out_ct.add_stream(codec or "libx264", rate=fps)
+    vout.width = vin.codec_context.width
+    vout.height = vin.codec_context.height
+    vout.pix_fmt = "yuv420p"
     try:
-        writer.write(prev_bgr)
-        if total: pbar.update(1)
+        vout.codec_context.gop_size = int(gop)
+    except Exception:
+        pass
+
+    total = vin.frames or None
+    pbar = tqdm(total=total, desc="blockmatch_basic", disable=not verbose, smoothing=0.1)
+
+    # Bounded queues cap in-flight frames at a few MB; a sentinel marks EOF.
+    _EOF = object()
+    decode_q = queue.Queue(maxsize=4)   # reader -> ME/warp: (bgr, gray) pairs
+    encode_q = queue.Queue(maxsize=4)   # ME/warp -> writer: av.VideoFrame
+    stop = threading.Event()
+    writer_err = []
+
+    def _reader():
+        try:
+            for frame in in_ct.decode(vin):
+                if stop.is_set():
+                    return
+                decode_q.put((frame.to_ndarray(format="bgr24"),
+                              frame.to_ndarray(format="gray")))
+            decode_q.put(_EOF)
+        except Exception as e:
+            decode_q.put(e)
+
+    def _writer():
+        try:
+            while True:
+                vf = encode_q.get()
+                if vf is _EOF:
+                    return
+                for pkt in vout.encode(vf):
+                    out_ct.mux(pkt)
+        except Exception as e:
+            writer_err.append(e)
+            # Keep draining so the producer never blocks on a full queue.
+            while encode_q.get() is not _EOF:
+                pass
 
+    def _emit(bgr):
+        if writer_err:
+            raise writer_err[0]
+        # from_ndarray copies, so warp_buf is immediately reusable
+        encode_q.put(av.VideoFrame.from_ndarray(bgr, format="bgr24"))
+
+    reader = threading.Thread(target=_reader, daemon=True)
+    writer = threading.Thread(target=_writer, daemon=True)
+    reader.start()
+    writer.start()
+
+    prev_bgr = None
+    prev_gray = None
+    warp_buf = None
+    try:
         while True:
-            ok, cur_bgr = cap.read()
-            if not ok:
+            item = decode_q.get()
+            if item is _EOF:
                 break
-            cur_gray = cv2.cvtColor(cur_bgr, cv2.COLOR_BGR2GRAY)
-
-            mv = _block_match(prev_gray, cur_gray, B=int(block), R=int(radius))
-            pred = _warp_by_blocks(prev_bgr, mv, B=int(block))
+            if isinstance(item, Exception):
+                raise item
+            cur_bgr, cur_gray = item
 
-            writer.write(pred)
+            if prev_gray is None:
+                warp_buf = np.empty_like(cur_bgr)
+                _emit(cur_bgr)
+            else:
+                mv = _block_match(prev_gray, cur_gray, B=int(block), R=int(radius),
+                                  search=search, downsample=float(me_scale) < 1.0)
+                pred = _warp_by_blocks(prev_bgr, mv, B=int(block), out=warp_buf)
+                _emit(pred)
 
             prev_bgr = cur_bgr
             prev_gray = cur_gray
             pbar.update(1)
+
+        if prev_gray is None:
+            raise RuntimeError("Empty input video.")
     finally:
         pbar.close()
-        cap.release()
-        writer.release()
+        stop.set()
+        # Unstick a reader blocked on a full queue, then wind both threads down.
+        while True:
+            try:
+                decode_q.get_nowait()
+            except queue.Empty:
+                break
+        encode_q.put(_EOF)
+        reader.join(timeout=5)
+        writer.join(timeout=30)
+        try:
+            if not writer_err:
+                for pkt in vout.encode():
+                    out_ct.mux(pkt)
+        finally:
+            out_ct.close()
+            in_ct.close()
+    if writer_err:
+        raise writer_err[0]
@@ -1,7 +1,12 @@
+import io
 import os
 import subprocess
+import tempfile
+from functools import lru_cache
 from typing import Dict
 
+import numpy as np
+
 
 PRESETS: Dict[str, Dict[str, float]] = {
     "urban_grit": {
@@ -99,6 +104,42 @@ def _run(cmd, verbose=False):
     return p
 
 
+@lru_cache(maxsize=1)
+def _detect_hw_accel():
+    """Pick a hardware H.264 encoder from `ffmpeg -encoders`, or None for software."""
+    try:
+        p = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-v", "error", "-encoders"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+    except Exception:
+        return None
+    if p.returncode != 0:
+        return None
+    if "h264_videotoolbox" in p.stdout and os.uname().sysname == "Darwin":
+        return "videotoolbox"
+    if "h264_nvenc" in p.stdout:
+        return "cuda"
+    if "h264_vaapi" in p.stdout and os.path.exists("/dev/dri/renderD128"):
+        return "vaapi"
+    return None
+
+
+@lru_cache(maxsize=None)
+def _probe_audio_codec(path):
+    """Codec name of the first audio stream, or None when there is none."""
+    try:
+        p = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=codec_name", "-of", "csv=p=0", path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+    except Exception:
+        return None
+    name = (p.stdout or "").strip()
+    return name if p.returncode == 0 and name else None
+
+
 def _clamp(value, low, high):
     return max(low, min(high, value))
 
@@ -119,7 +160,119 @@ def _fmt(value):
     return f"{value:.4f}".rstrip("0").rstrip(".")
 
 
-def _build_filter_chain(preset_name, fx_strength, grain, vignette, ghost):
+_LUT_SIZE = 17
+
+_CB_KEYS = ("rs", "gs", "bs", "rm", "gm", "bm", "rh", "gh", "bh")
+
+
+@lru_cache(maxsize=64)
+def _lut_body(contrast, brightness, saturation, gamma, cb):
+    """Bake eq + colorbalance into .cube 3D LUT text (single pixel pass at run time).
+
+    eq is reproduced through BT.601 luma/chroma (gamma and contrast/brightness
+    on Y, saturation on chroma); colorbalance follows FFmpeg's lightness-band
+    weighting. Both are evaluated on the 17^3 grid here instead of per pixel
+    per frame inside libavfilter. `cb` is a 9-tuple in _CB_KEYS order; the
+    result is memoized so batched runs with one preset pay the grid math once.
+    """
+    g = np.linspace(0.0, 1.0, _LUT_SIZE, dtype=np.float64)
+    # .cube ordering: red varies fastest, then green, then blue
+    b, gr, r = np.meshgrid(g, g, g, indexing="ij")
+    rgb = np.stack([r, gr, b], axis=-1).reshape(-1, 3)
+
+    # eq: gamma + contrast/brightness on luma, saturation on chroma
+    y = rgb @ np.array([0.299, 0.587, 0.114])
+    u = (rgb[:, 2] - y) * 0.565
+    v = (rgb[:, 0] - y) * 0.713
+    y = np.clip(y, 0.0, 1.0) ** (1.0 / max(gamma, 1e-6))
+    y = np.clip((y - 0.5) * contrast + 0.5 + brightness, 0.0, 1.0)
+    u *= saturation
+    v *= saturation
+    out = np.stack([
+        y + 1.403 * v,
+        y - 0.344 * u - 0.714 * v,
+        y + 1.770 * u,
+    ], axis=-1)
+    out = np.clip(out, 0.0, 1.0)
+
+    # colorbalance: per-channel shifts weighted by pixel lightness bands
+    light = (out.max(axis=-1) + out.min(axis=-1)) / 2.0
+    a, bb, scale = 4.0, 0.333, 0.7
+    w_s = np.clip((bb - light) * a + 0.5, 0.0, 1.0) * scale
+    w_m = (np.clip((light - bb) * a + 0.5, 0.0, 1.0)
+           * np.clip((1.0 + bb - light) * a + 0.5, 0.0, 1.0) * scale)
+    w_h = np.clip((light + bb - 1.0) * a + 0.5, 0.0, 1.0) * scale
+    for ch in range(3):  # shadow/mid/high indices per channel in _CB_KEYS order
+        out[:, ch] += cb[ch] * w_s + cb[ch + 3] * w_m + cb[ch + 6] * w_h
+    out = np.clip(out, 0.0, 1.0)
+
+    buf = io.StringIO()
+    buf.write(f"LUT_3D_SIZE {_LUT_SIZE}\n")
+    np.savetxt(buf, out, fmt="%.6f")
+    return buf.getvalue()
+
+
+def _write_cube_lut(path, contrast, brightness, saturation, gamma, cb):
+    with open(path, "w") as f:
+        f.write(_lut_body(contrast, brightness, saturation, gamma, cb))
+
+
+def _conv2_full(a, b):
+    """Full 2-D convolution of two small kernels (no scipy dependency)."""
+    ah, aw = a.shape
+    bh, bw = b.shape
+    out = np.zeros((ah + bh - 1, aw + bw - 1))
+    for i in range(bh):
+        for j in range(bw):
+            out[i:i + ah, j:j + aw] += a * b[i, j]
+    return out
+
+
+def _gauss2d(sigma, size=5):
+    x = np.arange(size) - size // 2
+    k = np.exp(-(x ** 2) / (2.0 * sigma * sigma))
+    k2 = np.outer(k, k)
+    return k2 / k2.sum()
+
+
+@lru_cache(maxsize=64)
+def _build_convolution(blur, unsharp):
+    """Fuse gblur + unsharp into one convolution filter (or None when inactive).
+
+    unsharp's 5x5 box sharpen is (1+a)*delta - a*Box5; composed with the blur
+    Gaussian it stays a single kernel, so the two former filter passes cost
+    one frame traversal. Luma gets the fused kernel, chroma only the blur
+    (matching unsharp 5:5:a:3:3:0).
+    """
+    has_blur = blur > 0.01
+    has_sharp = unsharp > 0.01
+    if not (has_blur or has_sharp):
+        return None
+
+    sharp = None
+    if has_sharp:
+        sharp = np.full((5, 5), -unsharp / 25.0)
+        sharp[2, 2] += 1.0 + unsharp
+    gauss = _gauss2d(blur) if has_blur else None
+
+    if has_blur and has_sharp:
+        k = _conv2_full(gauss, sharp)[1:-1, 1:-1]  # crop 9x9 -> 7x7
+        k /= k.sum()
+    else:
+        k = sharp if has_sharp else gauss
+
+    def _mat(kern):
+        ints = np.round(kern * 1024.0).astype(int)
+        return " ".join(str(x) for x in ints.ravel())
+
+    parts = [f"0m={_mat(k)}"]
+    if has_blur:
+        cm = _mat(gauss)
+        parts += [f"1m={cm}", f"2m={cm}"]
+    return "convolution=" + ":".join(parts)
+
+
+def _build_filter_chain(preset_name, fx_strength, grain, vignette, ghost, lut_dir):
     p = PRESETS[preset_name]
     s = _clamp(float(fx_strength), 0.0, 2.0)
 
@@ -128,8 +281,7 @@ def _build_filter_chain(preset_name, fx_strength, grain, vignette, ghost):
     saturation = _scale_from_neutral(p["saturation"], 1.0, s)
     gamma = _scale_from_neutral(p["gamma"], 1.0, s)
 
-    cb_keys = ("rs", "gs", "bs", "rm", "gm", "bm", "rh", "gh", "bh")
-    cb_vals = {k: _scale_from_neutral(p[k], 0.0, s) for k in cb_keys}
+    cb_vals = tuple(_scale_from_neutral(p[k], 0.0, s) for k in _CB_KEYS)
 
     unsharp = _clamp(p["unsharp"] * s, 0.0, 3.0)
     blur = _clamp(p["blur"] * s, 0.0, 3.0)
@@ -149,21 +301,13 @@ def _build_filter_chain(preset_name, fx_strength, grain, vignette, ghost):
     else:
         ghost_amt = _clamp(float(ghost), 0.0, 1.0)
 
-    filters = [
-        (
-            "eq="
-            f"contrast={_fmt(contrast)}:"
-            f"brightness={_fmt(brightness)}:"
-            f"saturation={_fmt(saturation)}:"
-            f"gamma={_fmt(gamma)}"
-        ),
-        "colorbalance=" + ":".join(f"{k}={_fmt(v)}" for k, v in cb_vals.items()),
-    ]
-
-    if blur > 0.01:
-        filters.append(f"gblur=sigma={_fmt(blur)}")
-    if unsharp > 0.01:
-        filters.append(f"unsharp=5:5:{_fmt(unsharp)}:3:3:0")
+    lut_path = os.path.join(lut_dir, "fx.cube")
+    _write_cube_lut(lut_path, contrast, brightness, saturation, gamma, cb_vals)
+    filters = [f"lut3d=file={lut_path}:interp=tetrahedral"]
+
+    conv = _build_convolution(blur, unsharp)
+    if conv:
+        filters.append(conv)
     if grain_amt > 0:
         filters.append(f"noise=alls={grain_amt}:allf=t+u")
     if vignette_amt > 0.01:
@@ -195,9 +339,18 @@ def process(
     vignette=-1.0,
     ghost=-1.0,
     keep_audio=True,
+    hw_accel="auto",
+    reencode_audio=False,
+    preset="ultrafast",
 ):
     """
     Apply preset-based cinematic color effects using FFmpeg filters.
+
+    hw_accel: 'auto' (default) probes for cuda/videotoolbox/vaapi and uses the
+    hardware H.264 encoder when one exists; 'none' keeps the software `codec`.
+    The filter chain itself stays on the CPU (no GPU equivalents for most of
+    it), but hardware decode+encode moves the two compressed-domain stages
+    off the cores doing the pixel work.
     """
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Input file not found: {input_path}")
@@ -214,35 +367,58 @@ def process(
         raise ValueError("gop must be >= 1")
 
     keep_audio = _as_bool(keep_audio)
-    vf = _build_filter_chain(color_preset, fx_strength, grain, vignette, ghost)
-
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        input_path,
-        "-vf",
-        vf,
-        "-map",
-        "0:v:0",
-        "-c:v",
-        str(codec),
-        "-g",
-        str(gop),
-        "-pix_fmt",
-        "yuv420p",
-    ]
+    # The LUT file must outlive the ffmpeg run
+    lut_tmp = tempfile.TemporaryDirectory(prefix="color_fx_")
+    vf = _build_filter_chain(color_preset, fx_strength, grain, vignette, ghost, lut_tmp.name)
+
+    hw = None
+    if hw_accel == "auto":
+        hw = _detect_hw_accel()
+    elif hw_accel and hw_accel != "none":
+        hw = str(hw_accel)
+
+    pre_input = []
+    if hw == "cuda":
+        # Decoded frames come back to system memory for the CPU filter chain.
+        pre_input = ["-hwaccel", "cuda"]
+        venc = ["-c:v", "h264_nvenc", "-preset", "p4", "-rc", "vbr", "-cq", "23"]
+    elif hw == "videotoolbox":
+        pre_input = ["-hwaccel", "videotoolbox"]
+        venc = ["-c:v", "h264_videotoolbox"]
+    elif hw == "vaapi":
+        # CPU filters run first, then the frames are uploaded for the encoder.
+        pre_input = ["-vaapi_device", "/dev/dri/renderD128", "-hwaccel", "vaapi"]
+        vf += ",format=nv12,hwupload"
+        venc = ["-c:v", "h264_vaapi"]
+    else:
+        venc = ["-c:v", str(codec), "-pix_fmt", "yuv420p"]
+        if str(codec) == "libx264":
+            venc += ["-preset", str(preset), "-threads", "0"]
+
+    cmd = (
+        ["ffmpeg", "-y"]
+        + pre_input
+        + ["-i", input_path, "-vf", vf, "-map", "0:v:0"]
+        + venc
+        + ["-g", str(gop)]
+    )
 
     if keep_audio:
         cmd.extend(["-map", "0:a?"])
         ext = os.path.splitext(output_path)[1].lower()
         if ext in {".mp4", ".mov", ".m4v"}:
-            cmd.extend(["-c:a", "aac", "-b:a", "192k"])
+            # AAC sources go straight through; re-encoding them only burns
+            # CPU and a generation. reencode_audio=True forces normalization.
+            if not _as_bool(reencode_audio) and _probe_audio_codec(input_path) == "aac":
+                cmd.extend(["-c:a", "copy"])
+            else:
+                cmd.extend(["-c:a", "aac", "-b:a", "192k"])
         else:
             cmd.extend(["-c:a", "copy"])
     else:
         cmd.append("-an")
 
     cmd.append(output_path)
-    _run(cmd, verbose=verbose)
+    with lut_tmp:
+        _run(cmd, verbose=verbose)
 
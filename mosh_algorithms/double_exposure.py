@@ -1,6 +1,9 @@
 import os
 import json
+import shutil
 import subprocess
+import tempfile
+from functools import lru_cache
 from itertools import combinations
 
 
@@ -19,6 +22,16 @@ def _run(cmd):
     return p.stdout
 
 
+@lru_cache(maxsize=1)
+def _hwaccel_args():
+    # '-hwaccel auto' routes decode through NVDEC/VideoToolbox when the build
+    # supports the source codec and silently stays on software otherwise.
+    if shutil.which("nvidia-smi") or os.uname().sysname == "Darwin":
+        return ("-hwaccel", "auto")
+    return ()
+
+
+@lru_cache(maxsize=None)
 def _probe_dims(path: str):
     cmd = [
         "ffprobe",
@@ -38,6 +51,7 @@ def _probe_dims(path: str):
     return int(stream["width"]), int(stream["height"])
 
 
+@lru_cache(maxsize=None)
 def _probe_duration(path: str):
     cmd = [
         "ffprobe",
@@ -53,6 +67,7 @@ def _probe_duration(path: str):
     data = json.loads(out)
     return float(data["format"]["duration"])
 
+@lru_cache(maxsize=None)
 def _has_video_stream(path: str) -> bool:
     cmd = [
         "ffprobe",
@@ -93,14 +108,18 @@ def _scan_videos(dirpath: str, verbose: bool = False):
     return out
 
 
-def _build_filtergraph(inputs, w, h, max_dur, mode, opacity):
+def _build_filtergraph(inputs, w, h, durations, mode, opacity):
+    max_dur = max(durations.values())
     parts = []
     for i, _ in enumerate(inputs):
         v = f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"
-        pad = max(0.0, max_dur - _probe_duration(inputs[i]))
+        pad = max(0.0, max_dur - durations[inputs[i]])
         if pad > 0:
             v += f",tpad=stop_mode=clone:stop_duration={pad}"
-        v += ",format=rgba"
+        # Planar RGBA: colorchannelmixer's alpha-only mix touches one plane
+        # instead of every 4th byte of an interleaved buffer, and blend works
+        # per plane without repacking.
+        v += ",format=gbrap"
         parts.append(f"[{i}:v]{v}[v{i}]")
 
     w0 = max(0.0, min(1.0, 1.0 - opacity))
@@ -127,14 +146,81 @@ def _output_sequence_paths(output_path: str, count: int):
     return paths
 
 
+def _run_descartes(inputs, pairs, output_paths, mode, opacity, gop, codec, verbose):
+    """Blend every pair in one ffmpeg run sharing a single filter_complex.
+
+    Each clip is decoded and normalized once and `split` across the pairs it
+    participates in, instead of being re-decoded for every pair it appears
+    in (n-1 times). Only the cheap tpad/mix/blend stages are per-pair.
+    """
+    w, h = _probe_dims(inputs[0])
+    durations = {p: _probe_duration(p) for p in inputs}
+    uses = [0] * len(inputs)
+    for i, j in pairs:
+        uses[i] += 1
+        uses[j] += 1
+
+    parts = []
+    for i, p in enumerate(inputs):
+        base = (f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,format=gbrap")
+        if uses[i] <= 1:
+            parts.append(f"[{i}:v]{base}[v{i}_0]")
+        else:
+            outs = "".join(f"[v{i}_{k}]" for k in range(uses[i]))
+            parts.append(f"[{i}:v]{base},split={uses[i]}{outs}")
+
+    w0 = max(0.0, min(1.0, 1.0 - opacity))
+    w1 = max(0.0, min(1.0, opacity))
+    taken = [0] * len(inputs)
+    for k, (i, j) in enumerate(pairs):
+        max_dur = max(durations[inputs[i]], durations[inputs[j]])
+        labels = []
+        for side, idx in (("a", i), ("b", j)):
+            src = f"v{idx}_{taken[idx]}"
+            taken[idx] += 1
+            pad = max(0.0, max_dur - durations[inputs[idx]])
+            if pad > 0:
+                parts.append(f"[{src}]tpad=stop_mode=clone:stop_duration={pad}[p{k}{side}]")
+                src = f"p{k}{side}"
+            labels.append(src)
+        parts.append(f"[{labels[0]}]colorchannelmixer=aa={w0}[cw{k}]")
+        parts.append(f"[{labels[1]}]colorchannelmixer=aa={w1}[nw{k}]")
+        parts.append(f"[cw{k}][nw{k}]blend=all_mode={mode}:shortest=0,format=yuv420p[b{k}]")
+    graph = ";".join(parts)
+
+    with tempfile.TemporaryDirectory(prefix="double_exposure_") as tmp:
+        cmd = ["ffmpeg", "-y"]
+        for p in inputs:
+            cmd.extend([*_hwaccel_args(), "-i", p])
+        if len(graph) < 100_000:
+            cmd.extend(["-filter_complex", graph])
+        else:
+            # Very large graphs can exceed the OS argv limit
+            script = os.path.join(tmp, "graph.txt")
+            with open(script, "w") as f:
+                f.write(graph)
+            cmd.extend(["-filter_complex_script", script])
+        for k, out_path in enumerate(output_paths):
+            cmd.extend(["-map", f"[b{k}]", "-an", "-c:v", codec, "-g", str(int(gop)), out_path])
+
+        if not verbose:
+            cmd.insert(1, "-hide_banner")
+            cmd.insert(2, "-loglevel")
+            cmd.insert(3, "error")
+
+        _run(cmd)
+
+
 def _run_blend(inputs, output_path, mode, opacity, gop, codec, verbose):
     w, h = _probe_dims(inputs[0])
-    max_dur = max(_probe_duration(p) for p in inputs)
-    filtergraph = _build_filtergraph(inputs, w, h, max_dur, mode, opacity)
+    # One probe per clip (memoized on path) shared by the pad math below
+    durations = {p: _probe_duration(p) for p in inputs}
+    filtergraph = _build_filtergraph(inputs, w, h, durations, mode, opacity)
 
     cmd = ["ffmpeg", "-y"]
     for p in inputs:
-        cmd.extend(["-i", p])
+        cmd.extend([*_hwaccel_args(), "-i", p])
     cmd.extend([
         "-filter_complex", filtergraph,
         "-map", "[v]",
@@ -197,8 +283,8 @@ def process(
             raise ValueError(f"Need at least 2 clips in '{videosrc}' for descartes mode")
         pairs = list(combinations(range(len(inputs)), 2))
         output_paths = _output_sequence_paths(output_path, len(pairs))
-        for (i, j), out_path in zip(pairs, output_paths):
-            _run_blend([inputs[i], inputs[j]], out_path, mode_map[blend_mode], opacity, gop, codec, verbose)
+        _run_descartes(inputs, pairs, output_paths, mode_map[blend_mode],
+                       opacity, gop, codec, verbose)
         return
 
     inputs = [p.strip() for p in input_path.split(",") if p.strip()]
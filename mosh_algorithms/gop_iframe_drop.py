@@ -1,52 +1,83 @@
 import av
-import cv2
-import numpy as np
 from tqdm import tqdm
 
 def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
             gop=250, codec="libx264", verbose=False):
     """
     'GOP-ish' datamosh:
-      - Decode with PyAV to detect keyframes.
-      - When an I-frame is encountered, write the *previous* frame instead (duplicate).
-      - Encode using OpenCV (mp4v) to avoid PyAV's MP4 writer issues on macOS.
+      - Demux with PyAV and detect keyframes on the compressed packet side.
+      - When an I-frame packet is encountered, mux a re-timed copy of the
+        previous P-frame packet instead — the decoder re-applies that P
+        against the held reference, giving the classic 'freeze-on-I' visual.
+      - Pure stream copy otherwise: no decode, no re-encode, no BGR round-trip.
 
     Notes:
-      - This produces the classic 'freeze-on-I' visual effect.
-      - For true packet-level GOP surgery (smearing P-frames across a held reference),
-        we'd need container/packet editing; this decoded-domain trick is stable and fast.
+      - Output codec/container parameters are copied from the input stream
+        (the `codec`/`gop` args only apply to algorithms that re-encode).
+      - Memory per frame drops from w*h*3 bytes to the compressed packet size.
     """
-    # --- open input with PyAV
-    with av.open(input_path) as in_container:
+    in_container = av.open(input_path)
+    try:
         v_in = next(s for s in in_container.streams if s.type == "video")
-        rate = v_in.average_rate or v_in.base_rate
-        fps = float(rate) if rate else 30.0
-        w = v_in.codec_context.width
-        h = v_in.codec_context.height
-
-        # --- open output with OpenCV
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        writer = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
-        if not writer.isOpened():
-            raise RuntimeError(f"Could not open writer for {output_path}")
-
-        last_bgr = None
-        total = getattr(v_in, "frames", 0) or None
-        pbar = tqdm(total=total, desc="gop_iframe_drop", disable=not verbose)
+    except StopIteration:
+        in_container.close()
+        raise RuntimeError(f"No video stream in {input_path}")
+    # Skip packets of every other stream in the demuxer
+    for s in in_container.streams:
+        if s is not v_in:
+            try: s.discard = "all"
+            except Exception: pass
 
+    # Single video stream with monotonic PTS: flush packets straight through
+    # instead of letting the muxer buffer and sort them for interleaving.
+    out_container = av.open(output_path, mode="w", options={"flush_packets": "1"})
+    if hasattr(out_container, "add_stream_from_template"):  # PyAV >= 10
+        v_out = out_container.add_stream_from_template(v_in)
+    else:
         try:
-            for frame in in_container.decode(v_in):
-                # current frame as BGR
-                cur_bgr = frame.to_ndarray(format="bgr24")
+            v_out = out_container.add_stream(template=v_in)
+        except TypeError:
+            codec_name = getattr(getattr(v_in, "codec_context", None), "name", None) or "h264"
+            v_out = out_container.add_stream(codec_name)
+            try: v_out.time_base = v_in.time_base
+            except Exception: pass
+            try: v_out.codec_context.extradata = v_in.codec_context.extradata
+            except Exception: pass
 
-                if frame.key_frame and last_bgr is not None:
-                    # on I-frame: duplicate previous frame instead of showing the I-frame
-                    writer.write(last_bgr)
-                else:
-                    writer.write(cur_bgr)
-                    last_bgr = cur_bgr
+    total = getattr(v_in, "frames", 0) or None
+    pbar = tqdm(total=total, desc="gop_iframe_drop", disable=not verbose, mininterval=0.5)
 
-                pbar.update(1)
-        finally:
-            pbar.close()
-            writer.release()
+    # The previous packet's payload is kept as bytes so a re-timed duplicate
+    # can be built from it when an I-frame comes along.
+    last_data = None
+    count = 0
+    try:
+        for pkt in in_container.demux(v_in):
+            if pkt.pts is None:
+                continue
+            if pkt.is_keyframe and last_data is not None:
+                dup = av.Packet(last_data)
+                dup.pts = pkt.pts
+                dup.dts = pkt.dts
+                # The copied timestamps are in the demuxed packet's time base;
+                # without carrying that base along, mux() would read them in
+                # whatever base the muxer settles on at header-write (AVI
+                # rewrites it) and reject the dts as non-monotonic.
+                dup.time_base = pkt.time_base
+                pkt = dup
+            else:
+                last_data = bytes(pkt)
+            # Demuxed packets carry their own time_base; mux() rescales to the
+            # output stream automatically.
+            pkt.stream = v_out
+            out_container.mux(pkt)
+            # Batched progress: one tqdm call (lock + clock read) per 64
+            # packets instead of per packet.
+            count += 1
+            if count % 64 == 0:
+                pbar.update(64)
+    finally:
+        pbar.update(count % 64)
+        pbar.close()
+        out_container.close()
+        in_container.close()
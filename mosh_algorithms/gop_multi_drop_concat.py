@@ -1,46 +1,63 @@
 # mosh_algorithms/gop_multi_drop_concat.py
 import os, json, shutil, subprocess, tempfile
-import av  # for I-frame detection
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import av  # packet-level surgery on the combined stream
 
-def _run(cmd, verbose=False):
+def _run(cmd, verbose=False, input_text=None):
     loglevel = "info" if verbose else "error"
     if cmd and cmd[0] == "ffmpeg" and "-loglevel" not in cmd:
         cmd = cmd[:1] + ["-hide_banner", "-loglevel", loglevel] + cmd[1:]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, input=input_text)
     if p.returncode != 0:
         raise RuntimeError(f"ffmpeg exit {p.returncode}\nCMD: {' '.join(cmd)}\n{p.stderr}")
     if verbose and p.stderr:
         print(p.stderr)
     return p
 
-def _ffprobe(path):
+@lru_cache(maxsize=None)
+def _probe_all(path):
+    # One ffprobe fork per path covering geometry, frame rate and duration —
+    # callers needing several fields no longer pay one fork each.
     cmd = [
         "ffprobe","-v","error","-select_streams","v:0",
-        "-show_entries","stream=width,height,avg_frame_rate",
+        "-show_entries","stream=codec_name,width,height,avg_frame_rate:format=duration",
         "-of","json", path
     ]
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     if p.returncode != 0:
         raise RuntimeError(f"ffprobe failed for {path}:\n{p.stderr}")
-    s = json.loads(p.stdout)["streams"][0]
-    w, h = int(s["width"]), int(s["height"])
+    data = json.loads(p.stdout)
+    s = data["streams"][0]
     fr = s.get("avg_frame_rate", "0/0")
     try:
         n, d = fr.split("/")
         fps = float(n) / float(d) if d != "0" else 30.0
     except Exception:
         fps = 30.0
+    try:
+        duration = float(data["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        duration = 0.0
+    return s.get("codec_name", ""), int(s["width"]), int(s["height"]), fps, duration
+
+def _ffprobe(path):
+    _, w, h, fps, _ = _probe_all(path)
     return w, h, fps
 
 def _ffprobe_duration(path):
-    p = subprocess.run(
-        ["ffprobe","-v","error","-show_entries","format=duration","-of","json", path],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    if p.returncode != 0:
-        raise RuntimeError(f"ffprobe (duration) failed for {path}:\n{p.stderr}")
-    data = json.loads(p.stdout)
-    return float(data["format"]["duration"])
+    duration = _probe_all(path)[4]
+    if duration <= 0:
+        raise RuntimeError(f"ffprobe reported no duration for {path}")
+    return duration
+
+@lru_cache(maxsize=1)
+def _hwaccel_args():
+    # '-hwaccel auto' routes decode through NVDEC/VideoToolbox when the build
+    # supports the source codec and silently stays on software otherwise.
+    if shutil.which("nvidia-smi") or os.uname().sysname == "Darwin":
+        return ("-hwaccel", "auto")
+    return ()
 
 def _safe_fps_str(fps):
     if abs(fps - 23.976) < 0.05: return "24000/1001"
@@ -52,24 +69,107 @@ def _codec_default():
     return "h264_videotoolbox" if os.uname().sysname == "Darwin" else "libx264"
 
 def _collect_iframes(path):
+    # Stream keyframe flags from ffprobe's native packet parser: one CSV line
+    # per packet ('K__' marks a keyframe), scanned without buffering or JSON.
+    # Packet order == frame order here because the pipeline forces -bf 0.
     idxs = []
-    with av.open(path) as cont:
-        v = next(s for s in cont.streams if s.type == "video")
-        for i, frame in enumerate(cont.decode(video=0)):
-            pict = getattr(frame, "pict_type", None)
-            name = getattr(pict, "name", None) or str(pict).split(".")[-1]
-            if name in ("I", "SI", "IDR") or bool(getattr(frame, "key_frame", False)):
-                idxs.append(i)
+    p = subprocess.Popen(
+        ["ffprobe","-v","error","-select_streams","v:0",
+         "-show_entries","packet=flags","-of","csv=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    for i, line in enumerate(p.stdout):
+        if line[:1] == b"K":
+            idxs.append(i)
+    p.wait()
+    if p.returncode != 0:
+        err = p.stderr.read().decode(errors="replace")
+        raise RuntimeError(f"ffprobe packet scan failed for {path}:\n{err}")
     return idxs
 
-def _build_select_not(drop_frame_numbers):
-    if not drop_frame_numbers:
-        return "1"
-    parts = [f"eq(n\\,{n})" for n in sorted(set(drop_frame_numbers))]
-    return f"not({' + '.join(parts)})"
+def _collect_iframes_parallel(path, workers=None):
+    # Partition the scan into equal time intervals and run one ffprobe per
+    # interval in parallel; workers report keyframe PTS, merged and converted
+    # to frame indices via the scanned file's own CFR rate — not the source
+    # clip's probed average, which _safe_fps_str may have snapped to a
+    # different integer rate (a mismatch drifts the indices and makes the
+    # surgery drop the wrong packets). read_intervals seeks to the keyframe
+    # at/before each boundary, so results are deduped on PTS.
+    workers = workers or min(os.cpu_count() or 1, 8)
+    try:
+        fps = _probe_all(path)[3]
+        duration = _ffprobe_duration(path)
+    except Exception:
+        fps = 0.0
+        duration = 0.0
+    if workers <= 1 or duration <= 0 or fps <= 0:
+        return _collect_iframes(path)
+
+    def scan(lo, hi):
+        p = subprocess.run(
+            ["ffprobe","-v","error","-select_streams","v:0",
+             "-read_intervals", f"{lo:.6f}%{hi:.6f}",
+             "-show_entries","packet=pts_time,flags","-of","csv=p=0", path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if p.returncode != 0:
+            raise RuntimeError(f"ffprobe interval scan failed for {path}:\n{p.stderr}")
+        times = []
+        for line in p.stdout.splitlines():
+            cols = line.split(",")
+            if len(cols) >= 2 and cols[1][:1] == "K":
+                try:
+                    t = float(cols[0])
+                except ValueError:
+                    continue
+                if lo <= t < hi or (hi >= duration and t >= lo):
+                    times.append(t)
+        return times
+
+    bounds = [duration * i / workers for i in range(workers + 1)]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        chunks = list(ex.map(lambda b: scan(*b), zip(bounds[:-1], bounds[1:])))
+
+    key_times = sorted({t for chunk in chunks for t in chunk})
+    return sorted({int(round(t * fps)) for t in key_times})
+
+def _packet_surgery_drop(in_path, out_path, drop_idxs):
+    # Copy video packets 1:1, skipping the given packet indices. No decode or
+    # re-encode; valid here because -bf 0 makes packet order == frame order.
+    in_ct = av.open(in_path)
+    vin = next(s for s in in_ct.streams if s.type == "video")
+    for s in in_ct.streams:
+        if s is not vin:
+            try: s.discard = "all"
+            except Exception: pass
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    # Single video stream with monotonic PTS: flush packets straight through
+    # instead of letting the muxer buffer and sort them for interleaving.
+    out_ct = av.open(out_path, mode="w", options={"flush_packets": "1"})
+    try:
+        vout = out_ct.add_stream(template=vin)
+    except TypeError:
+        codec_name = getattr(getattr(vin, "codec_context", None), "name", None) or "mpeg4"
+        vout = out_ct.add_stream(codec_name)
+        try: vout.time_base = vin.time_base
+        except Exception: pass
+        try: vout.codec_context.extradata = vin.codec_context.extradata
+        except Exception: pass
+    try: vout.codec_tag = vin.codec_tag
+    except Exception: pass
+
+    # Demuxed packets carry their own time_base; mux() rescales them to the
+    # output stream automatically.
+    for i, pkt in enumerate(in_ct.demux(vin)):
+        if pkt.pts is None or i in drop_idxs:
+            continue
+        pkt.stream = vout
+        out_ct.mux(pkt)
+    out_ct.close()
+    in_ct.close()
 
 def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
-            gop=9999, codec=None, verbose=False, postcut=4):
+            gop=9999, codec=None, verbose=False, postcut=4, preset="ultrafast"):
     """
     Multi-clip datamosh (cross-clip smear):
       1) Normalize each clip to same WxH/FPS (AVI/MPEG-4, CFR, even dims).
@@ -79,6 +179,9 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
 
     Args:
       postcut: how many frames to also drop immediately after each removed I (e.g., 3–8).
+      preset:  libx264 preset for the MP4 delivery encode. Defaults to
+               ultrafast — glitch artifacts dominate anyway, so the 3-5x
+               slower medium default buys nothing visible here.
     """
     codec = codec or _codec_default()
     if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
@@ -102,64 +205,74 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
     mpeg4_gop = min(int(gop), 600)  # MPEG-4 cap
 
     with tempfile.TemporaryDirectory(prefix="datamosh_multi_v3_") as tmp:
-        # 1) Normalize per clip (NO keyframe forcing here!)
-        norm_paths = []
-        for idx, src in enumerate(inputs):
-            dst = os.path.join(tmp, f"norm_{idx:03d}.avi")
-            _run([
-                "ffmpeg","-y","-i", src,
-                "-an",
-                "-vf", f"scale=trunc(iw/2)*2:trunc(ih/2)*2,scale={base_w}:{base_h},fps={fps_str}",
-                "-r", fps_str, "-vsync", "cfr",
-                "-c:v","mpeg4","-qscale:v","8",
-                "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
-                "-pix_fmt","yuv420p",
-                dst
-            ], verbose=verbose)
-            norm_paths.append(dst)
-
-        # 2) Concat with boundary keyframes forced
-        # Build boundary timestamps (start times of each subsequent clip)
+        # 1+2) Normalize and concat in ONE encode: each input gets its
+        # scale/fps/setpts chain inside the concat filtergraph, so the
+        # per-clip norm_XXX.avi writes (and their read-back) disappear and
+        # every clip is encoded exactly once instead of twice.
+        # Boundary timestamps (start times of each subsequent clip) come from
+        # the source durations — fps normalization keeps them within a frame.
         boundaries = []
         t = 0.0
-        for i, p in enumerate(norm_paths):
+        for i, p in enumerate(inputs):
             dur = _ffprobe_duration(p)
-            if i == 0:
-                t += dur
-                continue
-            boundaries.append(t)
+            if i > 0:
+                boundaries.append(t)
             t += dur
 
         force_list = ",".join(["0"] + [f"{x:.6f}" for x in boundaries]) if boundaries else "0"
 
-        concat_inputs = []
-        for p in norm_paths:
-            concat_inputs.extend(["-i", p])
-        n = len(norm_paths)
-        filtergraph = f"{''.join([f'[{i}:v]' for i in range(n)])}concat=n={n}:v=1:a=0"
+        def _is_normalized(p):
+            codec_name, w, h, fps_p, _ = _probe_all(p)
+            return (p.lower().endswith(".avi") and codec_name == "mpeg4"
+                    and (w, h) == (base_w, base_h) and abs(fps_p - base_fps) < 0.01)
 
         combined = os.path.join(tmp, "combined.avi")
-        _run(["ffmpeg","-y"] + concat_inputs + [
-            "-filter_complex", filtergraph,
-            "-an",
-            "-c:v","mpeg4","-qscale:v","2",
-            "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
-            "-pix_fmt","yuv420p",
-            "-r", fps_str, "-vsync", "cfr",
-            "-force_key_frames", force_list,   # <-- only here
-            combined
-        ], verbose=verbose)
+        if all(_is_normalized(p) for p in inputs):
+            # Sources already match the target AVI/MPEG-4 geometry and rate:
+            # concat with stream copy — no encode pass at all. Each clip
+            # starts on its own I-frame, so the boundary keyframes the
+            # surgery relies on are already in place.
+            listbody = "".join("file '" + p.replace("'", "'\\''") + "'\n"
+                               for p in (os.path.abspath(p) for p in inputs))
+            _run(["ffmpeg","-y","-f","concat","-safe","0",
+                  "-protocol_whitelist","file,pipe,crypto","-i","pipe:0",
+                  "-map","0:v:0","-c","copy","-an", combined],
+                 verbose=verbose, input_text=listbody)
+        else:
+            concat_inputs = []
+            for p in inputs:
+                concat_inputs.extend([*_hwaccel_args(), "-i", p])
+            n = len(inputs)
+            norm = (f"scale={base_w}:{base_h},"
+                    f"fps={fps_str},setpts=PTS-STARTPTS")
+            chains = [f"[{i}:v]{norm}[v{i}]" for i in range(n)]
+            filtergraph = ";".join(chains) + ";" + \
+                "".join(f"[v{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=0"
+
+            _run(["ffmpeg","-y"] + concat_inputs + [
+                "-filter_complex", filtergraph,
+                "-an",
+                "-c:v","mpeg4","-qscale:v","2",
+                "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
+                "-pix_fmt","yuv420p",
+                "-r", fps_str, "-vsync", "cfr",
+                "-force_key_frames", force_list,   # <-- only here
+                combined
+            ], verbose=verbose)
 
         # 3) Build drop list: all I > 0, plus postcut frames after each
-        i_frames = [i for i in _collect_iframes(combined) if i != 0]
-        drop = []
+        i_frames = [i for i in _collect_iframes_parallel(combined) if i != 0]
+        drop = set()
         pc = max(0, int(postcut))
         for i in i_frames:
-            drop.extend(i + k for k in range(0, pc + 1))
-        select_expr = _build_select_not(drop)
+            drop.update(i + k for k in range(0, pc + 1))
 
-        # 4) Final encode from combined with select (NO keyframe forcing here)
+        # 4) Packet surgery: drops are GOP-aligned by construction, so the
+        #    frames can be removed at packet level without decoding anything.
         if wants_mp4:
+            # MP4 wants a real re-encode: surgery first, then one transcode.
+            moshed = os.path.join(tmp, "moshed.avi")
+            _packet_surgery_drop(combined, moshed, drop)
             enc = [
                 "-c:v", codec,
                 "-g", str(gop), "-bf","0","-sc_threshold","0",
@@ -168,18 +281,9 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
                 "-r", fps_str, "-vsync","cfr",
             ]
             if codec == "libx264":
-                enc += ["-x264-params","keyint=9999:min-keyint=9999:scenecut=0:bframes=0:ref=1:weightp=0"]
+                enc += ["-preset", str(preset), "-tune","zerolatency", "-threads","0",
+                        "-x264-params","keyint=9999:min-keyint=9999:scenecut=0:bframes=0:ref=1:weightp=0"]
+            _run(["ffmpeg","-y","-fflags","+genpts+igndts","-i", moshed, "-an"] + enc + [output_path], verbose=verbose)
         else:
-            enc = [
-                "-c:v","mpeg4","-qscale:v","3","-me_method","full","-me_range","32",
-                "-mbd","rd","-mbcmp","rd","-precmp","rd","-cmp","rd",
-                "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
-                "-pix_fmt","yuv420p",
-                "-r", fps_str, "-vsync","cfr",
-            ]
-
-        _run([
-            "ffmpeg","-y","-i", combined,
-            "-vf", f"select='{select_expr}',setpts=N/FRAME_RATE/TB",
-            "-an",
-        ] + enc + [output_path], verbose=verbose)
+            # AVI delivery needs no encode at all — the surgery result is final.
+            _packet_surgery_drop(combined, output_path, drop)
@@ -1,6 +1,5 @@
 # mosh_algorithms/image_to_video_mosh.py
-import os, json, shutil, subprocess, tempfile
-import av  # for I-frame detection
+import os, json, shutil, subprocess, tempfile, functools
 
 def _run(cmd, verbose=False):
     loglevel = "info" if verbose else "error"
@@ -13,7 +12,42 @@ def _run(cmd, verbose=False):
         print(p.stderr)
     return p
 
+def _run_piped(producer, consumer, tmp, verbose=False):
+    """
+    Run two ffmpeg stages with the producer's stdout feeding the consumer's
+    stdin — the intermediate stream never touches disk. stderr of each stage
+    goes to a log file in `tmp` so neither pipe can fill up and deadlock.
+    """
+    loglevel = "info" if verbose else "error"
+    def _prep(cmd):
+        if cmd and cmd[0] == "ffmpeg" and "-loglevel" not in cmd:
+            cmd = cmd[:1] + ["-hide_banner", "-loglevel", loglevel] + cmd[1:]
+        return cmd
+    with open(os.path.join(tmp, "producer.log"), "w+") as log1, \
+         open(os.path.join(tmp, "consumer.log"), "w+") as log2:
+        p1 = subprocess.Popen(_prep(producer), stdout=subprocess.PIPE, stderr=log1)
+        p2 = subprocess.Popen(_prep(consumer), stdin=p1.stdout, stderr=log2)
+        p1.stdout.close()  # consumer owns the pipe; producer sees EPIPE if it dies
+        rc2 = p2.wait()
+        rc1 = p1.wait()
+        log1.seek(0); err1 = log1.read()
+        log2.seek(0); err2 = log2.read()
+    if rc1 != 0 or rc2 != 0:
+        raise RuntimeError(
+            f"ffmpeg pipeline failed (producer exit {rc1}, consumer exit {rc2})\n"
+            f"PRODUCER: {' '.join(producer)}\n{err1}\n"
+            f"CONSUMER: {' '.join(consumer)}\n{err2}"
+        )
+    if verbose:
+        if err1: print(err1)
+        if err2: print(err2)
+
 def _ffprobe(path):
+    # mtime keys the cache so an overwritten file invalidates its entry
+    return _ffprobe_cached(path, os.path.getmtime(path))
+
+@functools.lru_cache(maxsize=64)
+def _ffprobe_cached(path, _mtime):
     cmd = ["ffprobe","-v","error","-select_streams","v:0",
            "-show_entries","stream=width,height,avg_frame_rate","-of","json", path]
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
@@ -35,54 +69,60 @@ def _safe_fps_str(fps):
     if abs(fps-59.94)<0.10:  return "60000/1001"
     return str(max(1, int(round(fps))))
 
-def _collect_iframes(path):
-    idxs = []
-    with av.open(path) as cont:
-        v = next(s for s in cont.streams if s.type=="video")
-        for i, frame in enumerate(cont.decode(video=0)):
-            pict = getattr(frame, "pict_type", None)
-            name = getattr(pict, "name", None) or str(pict).split(".")[-1]
-            if name in ("I","SI","IDR") or bool(getattr(frame,"key_frame",False)):
-                idxs.append(i)
-    return idxs
-
-def _build_select_not(drop_list):
-    if not drop_list: return "1"
-    parts = [f"eq(n\\,{n})" for n in sorted(set(drop_list))]
-    return f"not({' + '.join(parts)})"
-
+def _build_select_drop_expr(postcut):
+    # Stateful O(1) select: st(0) remembers the index of the last I-frame, so
+    # every I after frame 0 plus the `postcut` frames behind it are dropped
+    # without scanning the stream for I-frame indices first.
+    pc = max(0, int(postcut))
+    return (
+        f"if(eq(pict_type\\,I)\\,"
+        f"if(eq(n\\,0)\\,st(0\\,0-{pc + 1})*0+1\\,st(0\\,n)*0)\\,"
+        f"gt(n\\,ld(0)+{pc}))"
+    )
+
+def _select_filter_args(select_expr, tmp):
+    # Very long graphs can exceed the OS argv limit (~128 KB); hand those to
+    # ffmpeg through a filter-script file instead of the command line.
+    vf = f"select='{select_expr}',setpts=N/FRAME_RATE/TB"
+    if len(vf) < 100_000:
+        return ["-vf", vf]
+    script = os.path.join(tmp, "select_script.txt")
+    with open(script, "w") as f:
+        f.write(vf)
+    return ["-filter_script:v", script]
+
+@functools.lru_cache(maxsize=1)
 def _codec_default():
-    return "h264_videotoolbox" if os.uname().sysname == "Darwin" else "libx264"
+    # Probed once per run: a hardware encoder moves the final encode off the
+    # CPU entirely when one is present.
+    if os.uname().sysname == "Darwin":
+        return "h264_videotoolbox"
+    try:
+        p = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        if p.returncode == 0 and "h264_nvenc" in p.stdout and shutil.which("nvidia-smi"):
+            return "h264_nvenc"
+    except Exception:
+        pass
+    return "libx264"
 
-def _make_image_motion_clip(img_path, out_path, w, h, fps_str, dur, mpeg4_gop, kb_mode, verbose=False):
+def _image_motion_chain(w, h, fps_str, dur, kb_mode):
     # Motion seeds vectors so the smear takes hold after the boundary.
-    src = ["-loop","1","-framerate", fps_str, "-t", str(dur), "-i", img_path]
     if kb_mode == "zoom_in":
         # gentle zoom using zoompan
         zoom_step = 0.0015
-        vf = (
+        return (
             f"scale={w}:{h},"
             f"zoompan=z='min(max(pzoom\\,1.0)+{zoom_step}\\,1.15)':"
             f"x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':d=1:s={w}x{h},"
             f"fps={fps_str}"
         )
-    else:
-        # tiny rotation jitter (robust)
-        vf = (
-            f"scale={w}:{h},"
-            f"rotate='0.02*sin(2*PI*t/{max(dur,0.1)})':ow=iw:oh=ih:c=black:fillcolor=black,"
-            f"fps={fps_str}"
-        )
-    _run([
-        "ffmpeg","-y", *src,
-        "-an",
-        "-vf", vf,
-        "-r", fps_str, "-vsync","cfr",
-        "-c:v","mpeg4","-qscale:v","6",
-        "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
-        "-pix_fmt","yuv420p",
-        out_path
-    ], verbose=verbose)
+    # tiny rotation jitter (robust)
+    return (
+        f"scale={w}:{h},"
+        f"rotate='0.02*sin(2*PI*t/{max(dur,0.1)})':ow=iw:oh=ih:c=black:fillcolor=black,"
+        f"fps={fps_str}"
+    )
 
 def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
             gop=9999, codec=None, verbose=False,
@@ -116,61 +156,51 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
     wants_mp4 = output_path.lower().endswith((".mp4",".mov",".m4v"))
 
     with tempfile.TemporaryDirectory(prefix="img2vid_mosh_") as tmp:
-        # 1) Image motion clip (first segment)
-        img_clip = os.path.join(tmp, "image_clip.avi")
-        _make_image_motion_clip(image, img_clip, base_w, base_h, fps_str, img_dur, mpeg4_gop, kb_mode, verbose=verbose)
-
-        # 2) Normalize video to AVI/MPEG-4
-        norm_vid = os.path.join(tmp, "video_norm.avi")
-        _run([
-            "ffmpeg","-y","-i", input_path,
-            "-an",
-            "-vf", f"scale=trunc(iw/2)*2:trunc(ih/2)*2,scale={base_w}:{base_h},fps={fps_str}",
-            "-r", fps_str, "-vsync","cfr",
-            "-c:v","mpeg4","-qscale:v","6",
-            "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
-            "-pix_fmt","yuv420p",
-            norm_vid
-        ], verbose=verbose)
-
-        # 3) Concat [image_clip, video]
-        combined = os.path.join(tmp, "combined.avi")
-        _run([
-            "ffmpeg","-y","-i", img_clip,"-i", norm_vid,
-            "-filter_complex", "[0:v][1:v]concat=n=2:v=1:a=0",
+        # 1) Image motion clip + normalized video + concat in one filtergraph.
+        #    The mpeg4 combined stream goes straight down a pipe (nut keeps
+        #    the timestamps intact) instead of an AVI round trip on disk.
+        graph = (
+            f"[0:v]{_image_motion_chain(base_w, base_h, fps_str, img_dur, kb_mode)},setpts=PTS-STARTPTS[v0];"
+            f"[1:v]fps={fps_str},scale={base_w}:{base_h},setpts=PTS-STARTPTS[v1];"
+            f"[v0][v1]concat=n=2:v=1:a=0"
+        )
+        producer = [
+            "ffmpeg","-y",
+            "-loop","1","-framerate", fps_str, "-t", str(img_dur), "-i", image,
+            "-i", input_path,
+            "-filter_complex", graph,
             "-an",
             "-c:v","mpeg4","-qscale:v","6",
             "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
             "-pix_fmt","yuv420p",
             "-r", fps_str, "-vsync","cfr",
-            combined
-        ], verbose=verbose)
-
-        # 4) Drop all I except very first (0) + postcut frames after each
-        i_frames = _collect_iframes(combined)
-        drop = set()
-        for i in i_frames:
-            if i == 0: 
-                continue
-            for k in range(0, max(0,int(postcut)) + 1):
-                drop.add(i + k)
-        select_expr = _build_select_not(sorted(drop))
-
-        # 5) Final encode
+            "-f","nut","pipe:1"
+        ]
+
+        # 2) Drop all I except the very first (frame 0) + 'postcut' frames after
+        #    each, decided per frame by the stateful select expression — the
+        #    combined stream no longer needs an I-frame index scan.
+        select_expr = _build_select_drop_expr(postcut)
+
+        # 3) Final encode
         if wants_mp4:
             enc = ["-c:v", codec, "-g", str(gop), "-bf","0","-sc_threshold","0",
                    "-pix_fmt","yuv420p", "-movflags","+faststart",
                    "-r", fps_str, "-vsync","cfr"]
             if codec == "libx264":
                 enc += ["-x264-params","keyint=9999:min-keyint=9999:scenecut=0:bframes=0:ref=1:weightp=0"]
+            elif codec == "h264_nvenc":
+                # NVENC spelling of the long-GOP/no-scenecut setup above
+                enc += ["-preset","p1","-tune","ll","-rc","constqp","-qp","18","-no-scenecut","1"]
         else:
             enc = ["-c:v","mpeg4","-qscale:v","6", "-g", str(mpeg4_gop),
                    "-bf","0","-sc_threshold","0", "-pix_fmt","yuv420p",
                    "-r", fps_str, "-vsync","cfr"]
 
         os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-        _run([
-            "ffmpeg","-y","-i", combined,
-            "-vf", f"select='{select_expr}',setpts=N/FRAME_RATE/TB",
+        consumer = [
+            "ffmpeg","-y","-f","nut","-i","pipe:0",
+            *_select_filter_args(select_expr, tmp),
             "-an",
-        ] + enc + [output_path], verbose=verbose)
+        ] + enc + [output_path]
+        _run_piped(producer, consumer, tmp, verbose=verbose)
@@ -4,6 +4,8 @@ import json
 import subprocess
 import tempfile
 import random
+import functools
+from glob import glob
 
 def _run(cmd, verbose=False):
     """Execute ffmpeg command with proper logging."""
@@ -18,17 +20,26 @@ def _run(cmd, verbose=False):
     return p
 
 def _ffprobe(path):
-    """Get video metadata: width, height, fps, duration."""
+    """Get video metadata: width, height, fps, duration, audio codec."""
+    # mtime keys the cache so an overwritten file invalidates its entry
+    return _ffprobe_cached(path, os.path.getmtime(path))
+
+@functools.lru_cache(maxsize=64)
+def _ffprobe_cached(path, _mtime):
     cmd = [
-        "ffprobe", "-v", "error", "-select_streams", "v:0",
-        "-show_entries", "stream=width,height,avg_frame_rate:format=duration",
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,width,height,avg_frame_rate:format=duration",
         "-of", "json", path
     ]
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     if p.returncode != 0:
         raise RuntimeError(f"ffprobe failed for {path}:\n{p.stderr}")
     data = json.loads(p.stdout)
-    s = data["streams"][0]
+    streams = data.get("streams", [])
+    try:
+        s = next(x for x in streams if x.get("codec_type") == "video")
+    except StopIteration:
+        raise RuntimeError(f"No video stream in {path}")
     w, h = int(s["width"]), int(s["height"])
     fr = s.get("avg_frame_rate", "0/0")
     try:
@@ -40,7 +51,11 @@ def _ffprobe(path):
     # Get duration from format
     duration = float(data.get("format", {}).get("duration", 0))
 
-    return w, h, fps, duration
+    # First audio stream's codec (None when the file is silent)
+    audio_codec = next((x.get("codec_name") for x in streams
+                        if x.get("codec_type") == "audio"), None)
+
+    return w, h, fps, duration, audio_codec
 
 def _safe_fps_str(fps):
     """Convert fps to ffmpeg-friendly string."""
@@ -69,7 +84,7 @@ def process(input_path: str, output_path: str, chunk_length: float = 2.0,
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
     # Get video metadata
-    w, h, fps, duration = _ffprobe(input_path)
+    w, h, fps, duration, src_audio = _ffprobe(input_path)
     w = (w // 2) * 2  # Ensure even dimensions
     h = (h // 2) * 2
     fps_str = _safe_fps_str(fps)
@@ -92,26 +107,34 @@ def process(input_path: str, output_path: str, chunk_length: float = 2.0,
 
     with tempfile.TemporaryDirectory(prefix="randomizer_") as tmp:
         # Step 1: Split video into chunks
-        chunk_files = []
         if verbose:
             print(f"[INFO] Splitting video into {num_chunks} chunks...")
 
-        for i in range(num_chunks):
-            start_time = i * chunk_length
-            chunk_path = os.path.join(tmp, f"chunk_{i:04d}.mp4")
-
-            _run([
-                "ffmpeg", "-y", "-i", input_path,
-                "-ss", str(start_time),
-                "-t", str(chunk_length),
-                "-c:v", codec,
-                "-c:a", "aac" if output_path.lower().endswith((".mp4", ".mov", ".m4v")) else "copy",
-                "-pix_fmt", "yuv420p",
-                "-r", fps_str,
-                chunk_path
-            ], verbose=verbose)
-
-            chunk_files.append(chunk_path)
+        # Re-encode audio only when the source codec doesn't fit an mp4-family
+        # container; AAC sources stream-copy straight through.
+        if output_path.lower().endswith((".mp4", ".mov", ".m4v")):
+            a_codec = "copy" if src_audio in (None, "aac") else "aac"
+        else:
+            a_codec = "copy"
+
+        # One pass through the segment muxer cuts every chunk in a single
+        # encode. Source keyframes rarely align with the chunk grid, so a
+        # pure -c copy split would give ragged boundaries; forcing a keyframe
+        # at each chunk start keeps the cuts exact instead.
+        _run([
+            "ffmpeg", "-y", "-i", input_path,
+            "-c:v", codec,
+            "-force_key_frames", f"expr:gte(t,n_forced*{chunk_length})",
+            "-c:a", a_codec,
+            "-pix_fmt", "yuv420p",
+            "-r", fps_str,
+            "-f", "segment",
+            "-segment_time", str(chunk_length),
+            "-reset_timestamps", "1",
+            os.path.join(tmp, "chunk_%04d.mp4"),
+        ], verbose=verbose)
+        chunk_files = sorted(glob(os.path.join(tmp, "chunk_*.mp4")))
+        num_chunks = len(chunk_files)
 
         # Step 2: Randomize the order
         random_order = list(range(num_chunks))
@@ -1,7 +1,8 @@
 # mosh_algorithms/ui_keyframe_editor.py
-import os, json, shutil, subprocess, tempfile, curses, time
+import os, json, shutil, subprocess, tempfile, curses, time, functools, bisect
 import av
 import cv2
+import numpy as np
 
 def _run(cmd, verbose=False):
     loglevel = "info" if verbose else "error"
@@ -15,6 +16,11 @@ def _run(cmd, verbose=False):
     return p
 
 def _ffprobe(first_path):
+    # mtime keys the cache so an overwritten file invalidates its entry
+    return _ffprobe_cached(first_path, os.path.getmtime(first_path))
+
+@functools.lru_cache(maxsize=64)
+def _ffprobe_cached(first_path, _mtime):
     cmd = [
         "ffprobe","-v","error","-select_streams","v:0",
         "-show_entries","stream=width,height,avg_frame_rate",
@@ -39,81 +45,188 @@ def _safe_fps_str(fps):
     if abs(fps - 59.94)  < 0.1:  return "60000/1001"
     return str(max(1, int(round(fps))))
 
+@functools.lru_cache(maxsize=1)
 def _codec_default():
-    return "h264_videotoolbox" if os.uname().sysname == "Darwin" else "libx264"
+    # Probed once per run: a hardware encoder moves the final encode off the
+    # CPU entirely when one is present.
+    if os.uname().sysname == "Darwin":
+        return "h264_videotoolbox"
+    try:
+        p = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        if p.returncode == 0 and "h264_nvenc" in p.stdout and shutil.which("nvidia-smi"):
+            return "h264_nvenc"
+    except Exception:
+        pass
+    return "libx264"
 
 def _collect_keyframes(path):
-    """Return: rows = [(frame_idx, t_sec_or_None, pict_name, is_key)], key_idx = [i of rows where keyframe]."""
-    rows, key_idx = [], []
+    """
+    Return: rows = [(frame_idx, t_sec_or_None, pict_name, is_key)], key_idx = [i of rows where keyframe],
+    pts_by_index = [stream-timebase pts per frame, or None] for exact preview seeks.
+
+    Reads the compressed packet side only — no pixel decode. Keyframe flag
+    and pts come straight from the demuxer; the combined intermediate is
+    encoded with -bf 0, so packet order is frame order and every non-key
+    packet is a P frame.
+    """
+    rows, key_idx, pts_by_index = [], [], []
     with av.open(path) as cont:
         v = next(s for s in cont.streams if s.type == "video")
         tb = v.time_base
         fps = float(v.average_rate) if v.average_rate else None
-        for i, frame in enumerate(cont.decode(video=0)):
-            pict = getattr(frame, "pict_type", None)
-            pict_name = getattr(pict, "name", None) or str(pict).split(".")[-1]
-            key = bool(getattr(frame, "key_frame", False))
-            if frame.pts is not None and (getattr(frame, "time_base", None) or tb) is not None:
-                t = float(frame.pts * (getattr(frame, "time_base", None) or tb))
+        for pkt in cont.demux(v):
+            if pkt.pts is None and pkt.dts is None and not pkt.size:
+                continue  # flush packet at EOF
+            i = len(rows)
+            key = bool(pkt.is_keyframe)
+            if pkt.pts is not None and tb is not None:
+                t = float(pkt.pts * tb)
             elif fps:
                 t = float(i) / float(fps)
             else:
                 t = None
-            rows.append((i, t, pict_name, key))
-            if key or pict_name in ("I","SI","IDR"):
-                key_idx.append(len(rows)-1)  # index in rows list
-    return rows, key_idx
+            rows.append((i, t, "I" if key else "P", key))
+            pts_by_index.append(pkt.pts)
+            if key:
+                key_idx.append(i)  # index in rows list
+    return rows, key_idx, pts_by_index
 
-def _preview_frame(path, frame_index):
+def _preview_container(path):
+    """One container per preview session, reused across P presses."""
+    cached = getattr(_preview_container, "_cache", None)
+    if cached is None or cached[0] != path:
+        if cached is not None:
+            try: cached[1].close()
+            except Exception: pass
+        _preview_container._cache = cached = (path, av.open(path))
+    return cached[1]
+
+def _show_frame(frame):
+    img = frame.to_ndarray(format="bgr24")
+    cv2.imshow("Preview (press any key)", img)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+def _preview_frame(path, frame_index, pts=None):
     """Open a simple OpenCV window showing the requested frame index."""
     try:
-        with av.open(path) as cont:
-            for idx, frame in enumerate(cont.decode(video=0)):
-                if idx == frame_index:
-                    img = frame.to_ndarray(format="bgr24")
-                    cv2.imshow("Preview (press any key)", img)
-                    cv2.waitKey(0)
-                    cv2.destroyAllWindows()
+        cont = _preview_container(path)
+        v = next(s for s in cont.streams if s.type == "video")
+        fps = float(v.average_rate) if v.average_rate else 30.0
+        tb = float(v.time_base) if v.time_base else 1.0 / fps
+        # The packet scan already knows every frame's pts — an exact seek
+        # target, no fps arithmetic needed
+        target_t = pts * tb if pts is not None else frame_index / fps
+        # Seek to the nearest prior keyframe and decode forward from there —
+        # O(GOP) work instead of decoding everything up to frame_index.
+        try:
+            cont.seek(pts if pts is not None else int(target_t / tb), stream=v, backward=True)
+            half_frame = 0.5 / fps
+            for frame in cont.decode(video=0):
+                if frame.pts is None:
+                    continue
+                t = float(frame.pts * (frame.time_base or v.time_base))
+                if t >= target_t - half_frame:
+                    _show_frame(frame)
                     return
+        except Exception:
+            # Unseekable stream: fall back to the linear scan
+            with av.open(path) as lin:
+                for idx, frame in enumerate(lin.decode(video=0)):
+                    if idx == frame_index:
+                        _show_frame(frame)
+                        return
     except Exception:
         pass  # preview is best-effort
 
-def _build_select_not_expr(drop_frame_numbers):
-    """ffmpeg select keeps frames where expr is true → use not(eq(n, ...)+...)."""
-    if not drop_frame_numbers:
-        return "1"
-    parts = [f"eq(n\\,{n})" for n in sorted(set(drop_frame_numbers))]
-    return f"not({' + '.join(parts)})"
+def _keep_ranges(drop_frame_numbers, total_frames):
+    """Collapse the drop set into kept [start, end) frame ranges."""
+    drops = sorted(set(d for d in drop_frame_numbers if 0 <= d < total_frames))
+    ranges, cur = [], 0
+    for d in drops:
+        if d > cur:
+            ranges.append((cur, d))
+        cur = d + 1
+    if cur < total_frames:
+        ranges.append((cur, total_frames))
+    return ranges or [(0, total_frames)]
+
+def _build_keep_filtergraph(ranges):
+    """
+    One trim per kept range, stitched back with concat. ffmpeg discards the
+    dropped frames at dispatch time, so the graph costs O(ranges) instead of
+    evaluating a select expression with one eq() term per dropped frame.
+    """
+    parts = []
+    for k, (a, b) in enumerate(ranges):
+        parts.append(f"[0:v]trim=start_frame={a}:end_frame={b},setpts=PTS-STARTPTS[k{k}]")
+    labels = "".join(f"[k{k}]" for k in range(len(ranges)))
+    parts.append(f"{labels}concat=n={len(ranges)}:v=1:a=0,setpts=N/FRAME_RATE/TB[v]")
+    return ";".join(parts)
+
+def _filter_complex_args(graph, tmp):
+    # Many small kept ranges can push the graph past the OS argv limit
+    # (~128 KB); hand those to ffmpeg through a script file instead.
+    if len(graph) < 100_000:
+        return ["-filter_complex", graph]
+    script = os.path.join(tmp, "keep_graph.txt")
+    with open(script, "w") as f:
+        f.write(graph)
+    return ["-filter_complex_script", script]
 
-def _draw_timeline(stdscr, y, W, rows, marked_set, cursor_row):
+def _draw_timeline(stdscr, y, W, nframes, key_rows, marked_set, cursor_row, cache, marked_rev):
     """
     Compact timeline: compress all frames into W-2 bins.
       'I'  = I-frame kept
       'X'  = I-frame marked for drop
       '.'  = no I in bin
     Cursor shown as '^' under the column.
+
+    The I/X line only depends on the mark set and the width, so it is cached
+    across keypresses and rebuilt — from key_rows, not all rows — when
+    `marked_rev` or `bins` changes. Cursor-only moves just redraw the caret.
     """
     if W < 20: return
-    nframes = len(rows)
     bins = max(10, W - 2)
     col_for_row = lambda r: min(bins-1, int(r * bins / max(1, nframes)))
-    # Precompute which bins contain I-frames (kept or marked)
-    bin_char = ['.'] * bins
-    for i, (fidx, _, pict, key) in enumerate(rows):
-        if pict in ("I","SI","IDR") or key:
-            c = 'X' if i in marked_set and i != 0 else 'I'
-            col = col_for_row(i)
-            bin_char[col] = c
-    # Render line
-    line = ''.join(bin_char)
-    stdscr.addstr(y, 1, line[:W-2])
+    if cache.get("bins") != bins or cache.get("rev") != marked_rev:
+        arr = np.full(bins, ord('.'), dtype=np.uint8)
+        if key_rows:
+            key_arr = cache.get("key_arr")
+            if key_arr is None or len(key_arr) != len(key_rows):
+                cache["key_arr"] = key_arr = np.asarray(key_rows, dtype=np.int64)
+            cols = np.minimum(bins - 1, key_arr * bins // max(1, nframes))
+            mm = np.zeros(nframes, dtype=bool)
+            if marked_set:
+                mm[np.fromiter(marked_set, dtype=np.int64, count=len(marked_set))] = True
+            mm[0] = False  # frame 0 is never droppable
+            marked_cols = mm[key_arr]
+            # X wins over I when a bin holds both a kept and a marked keyframe
+            arr[cols[~marked_cols]] = ord('I')
+            arr[cols[marked_cols]] = ord('X')
+        cache["bins"], cache["rev"], cache["line"] = bins, marked_rev, arr.tobytes().decode('ascii')
+    stdscr.addstr(y, 1, cache["line"][:W-2])
     # Cursor caret
     col = col_for_row(cursor_row)
-    caret = [' '] * len(line)
-    if 0 <= col < len(caret):
+    caret = [' '] * bins
+    if 0 <= col < bins:
         caret[col] = '^'
     stdscr.addstr(y+1, 1, ''.join(caret)[:W-2])
 
+def _jump_next_i(key_rows, cur, direction):
+    """direction=+1 or -1; nearest I-frame row index in that direction (clamped)."""
+    if not key_rows:
+        return cur
+    i = bisect.bisect_left(key_rows, cur)
+    if direction > 0:
+        if i < len(key_rows) and key_rows[i] == cur:
+            i += 1
+        i = min(len(key_rows) - 1, i)
+    else:
+        i = max(0, i - 1)
+    return key_rows[i]
+
 def _tui(rows, key_rows, stdscr):
     curses.curs_set(0)
     stdscr.nodelay(False)
@@ -125,24 +238,30 @@ def _tui(rows, key_rows, stdscr):
     # Default: mark all I (except very first frame) to drop
     marked = set(i for i,(idx,t,p,ky) in enumerate(rows) if (idx != 0 and (p in ("I","SI","IDR") or ky)))
     postcut = 0
+    marked_rev = 0   # bumped on every mark change; keys the timeline cache
+    tl_cache = {}
 
-    def jump_next_i(cur, direction):
-        """direction=+1 or -1; jump to nearest I-frame row index from key_rows."""
-        if not key_rows: return cur
-        # find current position in key_rows
-        # first, location of nearest keyframe <= cur
-        left = 0
-        right = len(key_rows)-1
-        pos = 0
-        while left <= right:
-            mid = (left+right)//2
-            if key_rows[mid] <= cur:
-                pos = mid; left = mid+1
-            else:
-                right = mid-1
-        # move
-        pos = max(0, min(len(key_rows)-1, pos + (1 if direction > 0 else -1)))
-        return key_rows[pos]
+    # Row list rendered once into a pad: scrolling becomes an ncurses blit
+    # and mark toggles patch single cells, instead of re-formatting every
+    # visible line in Python on each keypress.
+    def _row_line(i):
+        idx, t, p, ky = rows[i]
+        tstr = '' if t is None else f'{t:8.3f}'
+        return f"{i:3d}  {idx:6d}  {tstr:>8}   {p:>3}   {int(ky)}    "
+    drop_col = len(_row_line(0))
+    pad = curses.newpad(len(rows) + 1, max(drop_col + 2, 48))
+    for i in range(len(rows)):
+        pad.addstr(i, 0, _row_line(i))
+        if i in marked and i != 0:
+            pad.addstr(i, drop_col, 'X')
+    hl = [0]  # row currently shown in reverse video
+    pad.chgat(0, 0, curses.A_REVERSE)
+
+    def _patch_mark(i):
+        pad.addstr(i, drop_col, 'X' if i in marked and i != 0 else ' ')
+        # addstr resets the cell's attributes; restore the highlight if this
+        # is the selected row
+        pad.chgat(i, 0, curses.A_REVERSE if i == hl[0] else curses.A_NORMAL)
 
     def redraw():
         stdscr.erase()
@@ -151,22 +270,18 @@ def _tui(rows, key_rows, stdscr):
         stdscr.addstr(2, 0, f"Keyframes found: {len(key_rows)}   marked-to-drop: {sum(1 for i in key_rows if i in marked and rows[i][0]!=0)}   postcut={postcut}")
         rowstart = 3
         if timeline:
-            _draw_timeline(stdscr, rowstart, W, rows, marked, sel)
+            _draw_timeline(stdscr, rowstart, W, len(rows), key_rows, marked, sel, tl_cache, marked_rev)
             rowstart += 2
         stdscr.addstr(rowstart, 0, "  #   idx      time(s)   type  key  drop")
         max_rows = H - rowstart - 1
         start = max(0, min(sel - max_rows//2, len(rows) - max_rows))
-        end = min(len(rows), start + max_rows)
-        for i in range(start, end):
-            idx, t, p, ky = rows[i]
-            line = f"{i:3d}  {idx:6d}  {'' if t is None else f'{t:8.3f}'}   {p:>3}   {int(ky)}    {'X' if i in marked and i!=0 else ' '}"
-            if i == sel:
-                stdscr.attron(curses.A_REVERSE)
-                stdscr.addstr(rowstart + 1 + i - start, 0, line[:W-1])
-                stdscr.attroff(curses.A_REVERSE)
-            else:
-                stdscr.addstr(rowstart + 1 + i - start, 0, line[:W-1])
-        stdscr.refresh()
+        if hl[0] != sel:
+            pad.chgat(hl[0], 0, curses.A_NORMAL)
+            pad.chgat(sel, 0, curses.A_REVERSE)
+            hl[0] = sel
+        stdscr.noutrefresh()
+        pad.noutrefresh(start, 0, rowstart + 1, 0, H - 1, W - 1)
+        curses.doupdate()
 
     while True:
         redraw()
@@ -180,29 +295,37 @@ def _tui(rows, key_rows, stdscr):
         elif ch in (ord('t'), ord('T')):
             timeline = not timeline
         elif ch in (ord('g'),):
-            sel = jump_next_i(sel, -1)
+            sel = _jump_next_i(key_rows, sel, -1)
         elif ch in (ord('G'),):
-            sel = jump_next_i(sel, +1)
+            sel = _jump_next_i(key_rows, sel, +1)
         elif ch in (ord(' '), ord('x'), ord('X')):
             if sel != 0:
                 if sel in marked: marked.remove(sel)
                 else: marked.add(sel)
+                marked_rev += 1
+                _patch_mark(sel)
         elif ch in (ord('a'), ord('A')):
-            marked = set(i for i in key_rows if rows[i][0] != 0)
+            old_marked, marked = marked, set(i for i in key_rows if rows[i][0] != 0)
+            marked_rev += 1
+            for i in old_marked ^ marked: _patch_mark(i)
         elif ch in (ord('n'), ord('N')):
-            marked = set()
+            old_marked, marked = marked, set()
+            marked_rev += 1
+            for i in old_marked: _patch_mark(i)
         elif ch in (ord('+'), ord('=')):
             postcut = min(postcut + 1, 30)
         elif ch in (ord('-'), ord('_')):
             postcut = max(postcut - 1, 0)
         elif ch in (ord('d'), ord('D')):
             # One-shot: drop all boundary I's + set postcut=3 (you can tweak after)
-            marked = set(i for i in key_rows if rows[i][0] != 0)
+            old_marked, marked = marked, set(i for i in key_rows if rows[i][0] != 0)
+            marked_rev += 1
+            for i in old_marked ^ marked: _patch_mark(i)
             postcut = max(postcut, 3)
         elif ch in (ord('p'), ord('P')):
             curses.def_prog_mode()
             curses.endwin()
-            _preview_frame(_tui.video_path, rows[sel][0])
+            _preview_frame(_tui.video_path, rows[sel][0], _tui.pts_by_index[sel])
             time.sleep(0.05)
             stdscr.refresh()
         elif ch in (curses.KEY_ENTER, 10, 13):
@@ -246,50 +369,41 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
     mpeg4_gop = min(int(gop), 600)  # mpeg4 cap
 
     with tempfile.TemporaryDirectory(prefix="mosh_ui_") as tmp:
-        # 1) Normalize each clip
-        norm_paths = []
-        for idx, src in enumerate(inputs):
-            dst = os.path.join(tmp, f"norm_{idx:03d}.avi")
-            _run([
-                "ffmpeg","-y","-i", src,
-                "-an",
-                "-vf", f"scale=trunc(iw/2)*2:trunc(ih/2)*2,scale={base_w}:{base_h},fps={fps_str}",
-                "-r", fps_str, "-vsync", "cfr",
-                "-c:v","mpeg4","-qscale:v","6",  # a bit blockier by default
-                "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
-                "-pix_fmt","yuv420p",
-                dst
-            ], verbose=verbose)
-            norm_paths.append(dst)
-
-        # 2) Concat
-        n = len(norm_paths)
+        # 1) Normalize + concat every clip in one filtergraph → combined.
+        #    A single mpeg4 encode instead of one per input plus a concat
+        #    pass; the intermediate norm_*.avi round trips are gone.
+        n = len(inputs)
         concat_inputs = []
-        for p in norm_paths: concat_inputs.extend(["-i", p])
-        filtergraph = f"{''.join([f'[{i}:v]' for i in range(n)])}concat=n={n}:v=1:a=0"
+        for p in inputs: concat_inputs.extend(["-i", p])
+        chains = "".join(
+            f"[{i}:v]fps={fps_str},scale={base_w}:{base_h},setpts=PTS-STARTPTS[v{i}];"
+            for i in range(n)
+        )
+        filtergraph = chains + f"{''.join([f'[v{i}]' for i in range(n)])}concat=n={n}:v=1:a=0"
         combined = os.path.join(tmp, "combined.avi")
         _run(["ffmpeg","-y"] + concat_inputs + [
             "-filter_complex", filtergraph,
             "-an",
-            "-c:v","mpeg4","-qscale:v","6",
+            "-c:v","mpeg4","-qscale:v","6",  # a bit blockier by default
             "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
             "-pix_fmt","yuv420p",
             "-r", fps_str, "-vsync", "cfr",
             combined
         ], verbose=verbose)
 
-        # 3) TUI
-        rows, key_rows = _collect_keyframes(combined)
+        # 2) TUI
+        rows, key_rows, pts_by_index = _collect_keyframes(combined)
         if not rows:
             raise RuntimeError("No frames decoded from combined video.")
         _tui.video_path = combined
+        _tui.pts_by_index = pts_by_index
         def _run_tui(stdscr): return _tui(rows, key_rows, stdscr)
         drop_frames, postcut = curses.wrapper(_run_tui)
         if drop_frames is None:
             raise RuntimeError("Cancelled by user.")
 
-        # 4) Final encode (single pass): select not(drop_frames) + setpts
-        select_expr = _build_select_not_expr(drop_frames)
+        # 3) Final encode (single pass): trim/concat the kept ranges + setpts
+        graph = _build_keep_filtergraph(_keep_ranges(drop_frames, len(rows)))
         if wants_mp4:
             enc = [
                 "-c:v", codec,
@@ -300,6 +414,9 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
             ]
             if codec == "libx264":
                 enc += ["-x264-params","keyint=9999:min-keyint=9999:scenecut=0:bframes=0:ref=1:weightp=0"]
+            elif codec == "h264_nvenc":
+                # NVENC spelling of the long-GOP/no-scenecut setup above
+                enc += ["-preset","p1","-tune","ll","-rc","constqp","-qp","18","-no-scenecut","1"]
         else:
             enc = [
                 "-c:v","mpeg4","-qscale:v","6",
@@ -310,6 +427,7 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
 
         _run([
             "ffmpeg","-y","-i", combined,
-            "-vf", f"select='{select_expr}',setpts=N/FRAME_RATE/TB",
+            *_filter_complex_args(graph, tmp),
+            "-map","[v]",
             "-an",
         ] + enc + [output_path], verbose=verbose)
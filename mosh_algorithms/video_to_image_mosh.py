@@ -1,6 +1,5 @@
 # mosh_algorithms/video_to_image_mosh.py
-import os, json, shutil, subprocess, tempfile
-import av  # used to find I-frames deterministically
+import os, json, shutil, subprocess, tempfile, functools
 
 def _run(cmd, verbose=False):
     loglevel = "info" if verbose else "error"
@@ -14,6 +13,11 @@ def _run(cmd, verbose=False):
     return p
 
 def _ffprobe(path):
+    # mtime keys the cache so an overwritten file invalidates its entry
+    return _ffprobe_cached(path, os.path.getmtime(path))
+
+@functools.lru_cache(maxsize=64)
+def _ffprobe_cached(path, _mtime):
     cmd = ["ffprobe","-v","error","-select_streams","v:0",
            "-show_entries","stream=width,height,avg_frame_rate","-of","json", path]
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
@@ -35,23 +39,29 @@ def _safe_fps_str(fps):
     if abs(fps-59.94)<0.10:  return "60000/1001"
     return str(max(1, int(round(fps))))
 
-def _collect_iframes(path):
-    """Return list of absolute frame indices where pict_type is I (or key)."""
-    idxs = []
-    with av.open(path) as cont:
-        v = next(s for s in cont.streams if s.type=="video")
-        for i, frame in enumerate(cont.decode(video=0)):
-            pict = getattr(frame, "pict_type", None)
-            name = getattr(pict, "name", None) or str(pict).split(".")[-1]
-            if name in ("I","SI","IDR") or bool(getattr(frame,"key_frame",False)):
-                idxs.append(i)
-    return idxs
-
-def _build_select_not(drop_list):
-    if not drop_list: return "1"
-    parts = [f"eq(n\\,{n})" for n in sorted(set(drop_list))]
-    return f"not({' + '.join(parts)})"
-
+def _build_select_drop_expr(postcut):
+    # Stateful O(1) select: st(0) remembers the index of the last I-frame, so
+    # every I after frame 0 plus the `postcut` frames behind it are dropped
+    # without scanning the stream for I-frame indices first.
+    pc = max(0, int(postcut))
+    return (
+        f"if(eq(pict_type\\,I)\\,"
+        f"if(eq(n\\,0)\\,st(0\\,0-{pc + 1})*0+1\\,st(0\\,n)*0)\\,"
+        f"gt(n\\,ld(0)+{pc}))"
+    )
+
+def _select_filter_args(select_expr, tmp):
+    # Very long graphs can exceed the OS argv limit (~128 KB); hand those to
+    # ffmpeg through a filter-script file instead of the command line.
+    vf = f"select='{select_expr}',setpts=N/FRAME_RATE/TB"
+    if len(vf) < 100_000:
+        return ["-vf", vf]
+    script = os.path.join(tmp, "select_script.txt")
+    with open(script, "w") as f:
+        f.write(vf)
+    return ["-filter_script:v", script]
+
+@functools.lru_cache(maxsize=1)
 def _codec_default():
     return "h264_videotoolbox" if os.uname().sysname == "Darwin" else "libx264"
 
@@ -130,7 +140,7 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
         _run([
             "ffmpeg","-y","-i", input_path,
             "-an",
-            "-vf", f"scale=trunc(iw/2)*2:trunc(ih/2)*2,scale={base_w}:{base_h},fps={fps_str}",
+            "-vf", f"scale={base_w}:{base_h},fps={fps_str}",
             "-r", fps_str, "-vsync","cfr",
             "-c:v","mpeg4","-qscale:v","6",
             "-g", str(mpeg4_gop), "-bf","0","-sc_threshold","0",
@@ -155,15 +165,10 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
             combined
         ], verbose=verbose)
 
-        # 4) Compute which frames to drop: all I except very first (frame 0), plus 'postcut' after each
-        i_frames = _collect_iframes(combined)
-        drop = set()
-        for i in i_frames:
-            if i == 0: 
-                continue
-            for k in range(0, max(0,int(postcut)) + 1):
-                drop.add(i + k)
-        select_expr = _build_select_not(sorted(drop))
+        # 4) Drop all I except the very first (frame 0) + 'postcut' frames after
+        #    each, decided per frame by the stateful select expression — the
+        #    combined stream no longer needs an I-frame index scan.
+        select_expr = _build_select_drop_expr(postcut)
 
         # 5) Final single encode after select
         if wants_mp4:
@@ -180,6 +185,6 @@ def process(input_path: str, output_path: str, alpha=0.85, block=16, radius=8,
         os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
         _run([
             "ffmpeg","-y","-i", combined,
-            "-vf", f"select='{select_expr}',setpts=N/FRAME_RATE/TB",
+            *_select_filter_args(select_expr, tmp),
             "-an",
         ] + enc + [output_path], verbose=verbose)
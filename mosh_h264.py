@@ -10,11 +10,12 @@ Modern H.264-based datamosh using packet surgery:
 """
 
 import argparse
+import functools
+import struct
 import subprocess
 import sys
 import os
 import json
-import tempfile
 import shutil
 from pathlib import Path
 
@@ -24,6 +25,8 @@ except ImportError:
     print("Error: PyAV not installed. Run: pip install av", file=sys.stderr)
     sys.exit(1)
 
+import numpy as np
+
 
 def run_ffmpeg(cmd, description, verbose=False):
     """Execute FFmpeg command with error handling."""
@@ -35,20 +38,29 @@ def run_ffmpeg(cmd, description, verbose=False):
     if cmd[0] == "ffmpeg" and "-loglevel" not in cmd:
         cmd = cmd[:1] + ["-hide_banner", "-loglevel", loglevel] + cmd[1:]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
+    # stdout goes straight to /dev/null and stderr stays as bytes — it is
+    # only decoded when actually printed (failure or verbose), not per call.
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
         print(f"Error: {description} failed", file=sys.stderr)
-        print(result.stderr, file=sys.stderr)
+        print(stderr.decode(errors='replace'), file=sys.stderr)
         sys.exit(1)
 
-    if verbose and result.stderr:
-        print(result.stderr)
+    if verbose and stderr:
+        print(stderr.decode(errors='replace'))
 
-    return result
+    return proc
 
 
 def get_duration(video_path):
-    """Get video duration in seconds using ffprobe."""
+    """Get video duration in seconds using ffprobe (cached per file)."""
+    # mtime keys the cache so an overwritten file invalidates its entry
+    return _duration_cached(str(video_path), Path(video_path).stat().st_mtime)
+
+
+@functools.lru_cache(maxsize=64)
+def _duration_cached(video_path, _mtime):
     cmd = [
         'ffprobe',
         '-v', 'error',
@@ -56,12 +68,13 @@ def get_duration(video_path):
         '-of', 'json',
         str(video_path)
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if result.returncode != 0:
         print(f"Error: Failed to probe {video_path}", file=sys.stderr)
-        print(result.stderr, file=sys.stderr)
+        print(result.stderr.decode(errors='replace'), file=sys.stderr)
         sys.exit(1)
 
+    # json.loads takes the stdout bytes directly — no text-mode decode pass
     data = json.loads(result.stdout)
     return float(data['format']['duration'])
 
@@ -76,11 +89,28 @@ def validate_inputs(clip_a, clip_b):
         sys.exit(1)
 
 
-def normalize_to_h264(input_path, output_path, fps, width, crf, gop_len, verbose=False):
-    """Normalize clip to H.264 with very long GOP."""
+def normalize_and_concat(clip_a, clip_b, output_path, fps, width, crf, gop_len, verbose=False):
+    """
+    Normalize both clips and concatenate them into one long-GOP H.264 file
+    in a single ffmpeg run.
+
+    One filtergraph retimes and scales each input and feeds concat straight
+    into a single x264 encode — the encoder is initialized once, and no
+    intermediate elementary streams hit disk. SEI NALs are stripped at mux
+    time by filter_units when this ffmpeg has it.
+    """
+    graph = (
+        f"[0:v]fps={fps},scale={width}:-2,setpts=PTS-STARTPTS[a];"
+        f"[1:v]fps={fps},scale={width}:-2,setpts=PTS-STARTPTS[b];"
+        f"[a][b]concat=n=2:v=1:a=0,format=yuv420p[v]"
+    )
+    bsf = ['-bsf:v', 'filter_units=remove_types=6'] if _has_filter_units_bsf() else []
     cmd = [
-        'ffmpeg', '-y', '-i', str(input_path),
-        '-vf', f'fps={fps},scale={width}:-2,format=yuv420p',
+        'ffmpeg', '-y',
+        '-i', str(clip_a),
+        '-i', str(clip_b),
+        '-filter_complex', graph,
+        '-map', '[v]',
         '-c:v', 'libx264',
         '-crf', str(crf),
         '-g', str(gop_len),
@@ -88,50 +118,92 @@ def normalize_to_h264(input_path, output_path, fps, width, crf, gop_len, verbose
         '-sc_threshold', '0',  # Disable scene cut detection
         '-x264-params', 'keyint=9999:min-keyint=9999',  # Force very long GOP
         '-an',
+        *bsf,
         str(output_path)
     ]
-    run_ffmpeg(cmd, f"Normalizing {Path(input_path).name} to H.264 long-GOP", verbose)
+    run_ffmpeg(cmd, "Normalizing and concatenating clips (fused long-GOP encode)", verbose)
 
 
-def concat_copy(h264_list, output_path, verbose=False):
-    """Concatenate H.264 files using concat demuxer."""
-    list_file = output_path.parent / 'concat_list.txt'
-    with open(list_file, 'w') as f:
-        for h264_path in h264_list:
-            escaped = str(h264_path).replace("'", "'\\''")
-            f.write(f"file '{escaped}'\n")
+@functools.lru_cache(maxsize=1)
+def _has_filter_units_bsf():
+    """True when this ffmpeg ships the filter_units bitstream filter."""
+    try:
+        p = subprocess.run(['ffmpeg', '-hide_banner', '-bsfs'],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        return p.returncode == 0 and 'filter_units' in p.stdout
+    except Exception:
+        return False
 
-    cmd = [
-        'ffmpeg', '-y',
-        '-f', 'concat',
-        '-safe', '0',
-        '-i', str(list_file),
-        '-c', 'copy',
-        str(output_path)
-    ]
 
-    run_ffmpeg(cmd, "Concatenating H.264 clips (codec copy)", verbose)
-    list_file.unlink()
+# Escape table for single quotes in concat-demuxer list entries
+_CONCAT_QUOTE_ESCAPE = str.maketrans({"'": "'\\''"})
 
 
-def is_idr_frame(packet):
-    """
-    Check if packet is an IDR frame (instantaneous decoder refresh).
-    IDR frames are synchronization points that reset decoder state.
-    """
-    # In H.264, IDR frames are keyframes with specific NAL unit type
-    # PyAV marks them as keyframes, but not all keyframes are IDR
-    if not packet.is_keyframe:
-        return False
+def build_concat_list_body(paths):
+    """Build the full concat-demuxer list body as one string (single write, no per-line I/O)."""
+    return ''.join(f"file '{str(p).translate(_CONCAT_QUOTE_ESCAPE)}'\n" for p in paths)
+
 
-    # For H.264, we need to check the actual NAL unit type
-    # NAL type 5 = IDR frame, type 1 = non-IDR I-frame
-    # This is a simplified check - in practice, PyAV doesn't expose NAL types easily
-    # So we'll treat all keyframes as potential IDRs for now
-    return True
+# H.264 NAL unit types we care about: 5 = IDR slice, 6 = SEI
+_NAL_IDR = 5
+_NAL_SEI = 6
 
 
-def packet_surgery_h264(input_mp4, output_mp4, join_time_sec, no_iframe_window, postcut, verbose=False):
+def parse_avcc_nals(buf):
+    """
+    Parse an AVCC (4-byte length-prefixed) H.264 packet payload.
+
+    Returns a list of (start, end, nal_type) spans with the length prefix
+    included, or None when the payload doesn't parse as AVCC (e.g. Annex-B
+    start codes or an empty flush packet).
+    """
+    nals = []
+    off = 0
+    end = len(buf)
+    while off + 4 <= end:
+        (size,) = struct.unpack_from('>I', buf, off)
+        if size <= 0 or off + 4 + size > end:
+            return None
+        nals.append((off, off + 4 + size, buf[off + 4] & 0x1F))
+        off += 4 + size
+    return nals if nals and off == end else None
+
+
+def parse_annexb_nals(buf):
+    """
+    Parse an Annex-B H.264 payload (00 00 01 / 00 00 00 01 start codes).
+
+    One vectorized NumPy pass finds every start code at once — no Python
+    byte loop. Returns (start, end, nal_type) spans with the start code
+    included, or None when the payload contains no start codes.
+    """
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    if arr.size < 4:
+        return None
+    z = arr == 0
+    hits = np.flatnonzero(z[:-2] & z[1:-1] & (arr[2:] == 1))
+    hits = hits[hits + 3 < arr.size]
+    if hits.size == 0:
+        return None
+    types = arr[hits + 3] & 0x1F
+    # A 4-byte 00 00 00 01 code matches at its second zero; pull each span
+    # start back to the first zero of the start code.
+    starts = hits - ((hits > 0) & z[hits - 1])
+    ends = np.append(starts[1:], arr.size)
+    return list(zip(starts.tolist(), ends.tolist(), types.tolist()))
+
+
+def strip_sei_nals(buf, nals):
+    """Rebuild a packet payload with SEI NAL units removed."""
+    out = bytearray()
+    for start, end, nal_type in nals:
+        if nal_type != _NAL_SEI:
+            out += buf[start:end]
+    return out
+
+
+def packet_surgery_h264(input_mp4, output_mp4, join_time_sec, no_iframe_window, postcut,
+                        strip_sei=True, verbose=False):
     """
     H.264 packet surgery: Strip IDR frames in window and remove SEI messages.
 
@@ -139,6 +211,10 @@ def packet_surgery_h264(input_mp4, output_mp4, join_time_sec, no_iframe_window,
     1. Removing IDR (sync) frames in the specified time window
     2. Dropping postcut packets after each removed IDR
     3. Filtering out SEI (supplemental enhancement info) that could reset decoder
+
+    Pass strip_sei=False when SEI was already removed upstream by ffmpeg's
+    filter_units bitstream filter — NAL classification still runs, but the
+    Python-side payload rebuild is skipped.
     """
     print(f"\n=== H.264 Packet Surgery ===")
     print(f"Window: [{join_time_sec:.3f}s, {join_time_sec + no_iframe_window:.3f}s]")
@@ -146,23 +222,33 @@ def packet_surgery_h264(input_mp4, output_mp4, join_time_sec, no_iframe_window,
 
     in_ct = av.open(str(input_mp4))
     vin = next(s for s in in_ct.streams if s.type == "video")
+    # Let libavformat drop packets of any other stream inside the demuxer
+    for s in in_ct.streams:
+        if s is not vin:
+            try:
+                s.discard = "all"
+            except Exception:
+                pass
 
     out_ct = av.open(str(output_mp4), mode="w")
 
     # Create output stream
-    try:
-        vout = out_ct.add_stream(template=vin)
-    except TypeError:
-        # Fallback for older PyAV
-        vout = out_ct.add_stream("h264")
-        try:
-            vout.time_base = vin.time_base
-        except Exception:
-            pass
+    if hasattr(out_ct, "add_stream_from_template"):  # PyAV >= 10
+        vout = out_ct.add_stream_from_template(vin)
+    else:
         try:
-            vout.codec_context.extradata = vin.codec_context.extradata
-        except Exception:
-            pass
+            vout = out_ct.add_stream(template=vin)
+        except TypeError:
+            # Fallback for older PyAV
+            vout = out_ct.add_stream("h264")
+            try:
+                vout.time_base = vin.time_base
+            except Exception:
+                pass
+            try:
+                vout.codec_context.extradata = vin.codec_context.extradata
+            except Exception:
+                pass
 
     try:
         vout.codec_tag = vin.codec_tag
@@ -175,89 +261,188 @@ def packet_surgery_h264(input_mp4, output_mp4, join_time_sec, no_iframe_window,
     total_packets = 0
     sei_removed = 0
 
+    # Surviving packets are queued and handed to libav in 256-packet batches
+    # through a locally bound mux — one call flushes the whole batch instead
+    # of a method lookup + CFFI crossing per packet.
+    mux = out_ct.mux
+    batch = []
+
     window_start = join_time_sec
     window_end = join_time_sec + no_iframe_window
 
     for pkt in in_ct.demux(vin):
+        if pkt.pts is None and pkt.dts is None and not pkt.size:
+            continue  # demuxer flush packet
         total_packets += 1
         pkt_time = float(pkt.pts * vin.time_base) if pkt.pts is not None else 0
 
-        # Check for SEI packets (supplemental enhancement info)
-        # SEI can trigger decoder resets, so we filter them out
-        # Note: PyAV doesn't directly expose NAL types, so this is a heuristic
-        # SEI packets are typically small and not keyframes
-        is_sei = not pkt.is_keyframe and pkt.size < 100
-
-        if is_sei:
-            sei_removed += 1
-            if verbose:
-                print(f"  Filtered SEI-like packet at {pkt_time:.3f}s (size: {pkt.size})")
-            continue
+        # Classify by real NAL-unit types: type 5 is an IDR slice, type 6 is
+        # SEI. SEI NALs ride inside frame packets, so they are stripped from
+        # the payload rather than dropping the whole packet. Falls back to the
+        # container keyframe flag when the payload fits neither layout.
+        # memoryview reads the packet buffer in place — no bytes() copy per
+        # packet (PyAV packets expose the buffer protocol).
+        buf = memoryview(pkt)
+        nals = parse_avcc_nals(buf) or parse_annexb_nals(buf)
+        if nals is None:
+            is_idr = pkt.is_keyframe
+        else:
+            is_idr = any(t == _NAL_IDR for _, _, t in nals)
+            if strip_sei and any(t == _NAL_SEI for _, _, t in nals):
+                sei_removed += 1
+                if verbose:
+                    print(f"  Stripped SEI NAL(s) at {pkt_time:.3f}s (size: {pkt.size})")
+                stripped = strip_sei_nals(buf, nals)
+                if not stripped:
+                    continue  # packet was pure SEI
+                new_pkt = av.Packet(bytes(stripped))
+                new_pkt.pts = pkt.pts
+                new_pkt.dts = pkt.dts
+                try:
+                    new_pkt.time_base = pkt.time_base
+                    new_pkt.is_keyframe = pkt.is_keyframe
+                except Exception:
+                    pass
+                pkt = new_pkt
 
-        if pkt.is_keyframe:
+        # One keep/drop decision, one mux path at the bottom
+        keep = True
+        if is_idr:
             if keep_first_idr:
                 # Always keep the very first IDR frame
                 keep_first_idr = False
-                try:
-                    pkt.rescale_ts(vin.time_base, vout.time_base)
-                except Exception:
-                    pass
-                pkt.stream = vout
-                out_ct.mux(pkt)
             elif window_start <= pkt_time <= window_end:
                 # Drop IDR frame in window
+                keep = False
                 removed_count += 1
                 pending_drop = postcut
                 if verbose:
                     print(f"  Dropped IDR at {pkt_time:.3f}s (packet #{total_packets})")
-            else:
-                # Keep IDR frame outside window
-                try:
-                    pkt.rescale_ts(vin.time_base, vout.time_base)
-                except Exception:
-                    pass
-                pkt.stream = vout
-                out_ct.mux(pkt)
-        else:
-            # P or non-keyframe
-            if pending_drop > 0:
-                pending_drop -= 1
-                if verbose:
-                    print(f"  Dropped packet (postcut) at {pkt_time:.3f}s")
-            else:
-                try:
-                    pkt.rescale_ts(vin.time_base, vout.time_base)
-                except Exception:
-                    pass
-                pkt.stream = vout
-                out_ct.mux(pkt)
+        elif pending_drop > 0:
+            # P or non-keyframe inside a postcut run
+            keep = False
+            pending_drop -= 1
+            if verbose:
+                print(f"  Dropped packet (postcut) at {pkt_time:.3f}s")
 
+        if keep:
+            # Packets carry their own time_base; mux() rescales them to the
+            # output stream when the batch is flushed.
+            pkt.stream = vout
+            batch.append(pkt)
+
+        if len(batch) >= 256:
+            mux(batch)
+            batch.clear()
+
+    if batch:
+        mux(batch)
     out_ct.close()
     in_ct.close()
 
-    print(f"Removed {removed_count} IDR frames and {sei_removed} SEI packets from {total_packets} total packets")
+    print(f"Removed {removed_count} IDR frames and stripped SEI from {sei_removed} of {total_packets} total packets")
 
 
-def repeat_smear_segment_h264(input_mp4, output_mp4, join_time_sec, repeat_boost, repeat_times, verbose=False):
+def _copy_file(src, dst):
+    """
+    Copy a file through os.sendfile where the platform supports file-to-file
+    sendfile (Linux) — the bytes move inside the kernel with no userspace
+    buffer. Falls back to shutil.copy elsewhere (e.g. macOS restricts
+    sendfile to sockets).
+    """
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            size = os.fstat(s.fileno()).st_size
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(d.fileno(), s.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        return
+    except (AttributeError, OSError):
+        pass
+    shutil.copy(src, dst)
+
+
+def _smear_concat_copy(input_mp4, output_mp4, segment_start, segment_end,
+                       repeat_times, total_duration, verbose=False):
+    """
+    Attempt the smear concat with codec copy: -c copy range extracts plus the
+    concat demuxer with +genpts to regenerate the broken timing. Returns True
+    on success; any ffmpeg failure leaves the caller to re-encode instead.
+    Copy cuts land on packet boundaries rather than exact timestamps, which
+    is fine for a stream whose references are already broken on purpose.
+    """
+    def _try(cmd):
+        cmd = cmd[:1] + ['-hide_banner', '-loglevel', 'error'] + cmd[1:]
+        p = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if p.returncode != 0 and verbose:
+            print(p.stderr.decode(errors='replace'), file=sys.stderr)
+        return p.returncode == 0
+
+    temp_dir = Path(input_mp4).parent
+    before_seg = temp_dir / 'before_seg.mp4'
+    repeat_seg = temp_dir / 'repeat_seg.mp4'
+    after_seg = temp_dir / 'after_seg.mp4'
+    list_file = temp_dir / 'smear_concat.txt'
+    try:
+        paths = []
+        if segment_start > 0.01:
+            if not _try(['ffmpeg', '-y', '-i', str(input_mp4),
+                         '-ss', '0', '-t', str(segment_start), '-c', 'copy', str(before_seg)]):
+                return False
+            paths.append(before_seg)
+
+        if not _try(['ffmpeg', '-y', '-i', str(input_mp4),
+                     '-ss', str(segment_start), '-t', str(segment_end - segment_start),
+                     '-c', 'copy', str(repeat_seg)]):
+            return False
+        paths += [repeat_seg] * repeat_times
+
+        if segment_end < total_duration - 0.01:
+            if not _try(['ffmpeg', '-y', '-i', str(input_mp4),
+                         '-ss', str(segment_end), '-c', 'copy', str(after_seg)]):
+                return False
+            paths.append(after_seg)
+
+        if any(not p.exists() or p.stat().st_size == 0 for p in paths):
+            return False
+
+        list_file.write_text(build_concat_list_body(paths), encoding='utf-8')
+        ok = _try(['ffmpeg', '-y', '-fflags', '+genpts',
+                   '-f', 'concat', '-safe', '0', '-i', str(list_file),
+                   '-c', 'copy', str(output_mp4)])
+        return ok and Path(output_mp4).exists() and Path(output_mp4).stat().st_size > 0
+    finally:
+        for p in (before_seg, repeat_seg, after_seg, list_file):
+            p.unlink(missing_ok=True)
+
+
+def repeat_smear_segment_h264(input_mp4, output_mp4, join_time_sec, repeat_boost, repeat_times,
+                              total_duration=None, verbose=False):
     """
     Repeat a segment after join point to amplify smear (H.264 version).
     Uses FFmpeg codec-copy to preserve broken references.
+
+    total_duration can be threaded in by callers that already probed the
+    stream; it is only probed here when not supplied.
     """
     print(f"\n=== Smear Boost: Repeating segment ===")
     print(f"Segment: [{join_time_sec:.3f}s, {join_time_sec + repeat_boost:.3f}s] × {repeat_times}")
 
-    temp_dir = Path(input_mp4).parent
     segment_start = join_time_sec
     segment_end = join_time_sec + repeat_boost
 
     # Get total duration to validate segments
-    total_duration = get_duration(input_mp4)
+    if total_duration is None:
+        total_duration = get_duration(input_mp4)
 
     # If repeat segment would be empty or invalid, just copy the input
     if segment_start >= total_duration or repeat_boost <= 0.01:
         print(f"Warning: Cannot repeat segment (start={segment_start:.3f}s >= duration={total_duration:.3f}s)")
         print(f"Copying input to output without smear boost")
-        shutil.copy(input_mp4, output_mp4)
+        _copy_file(input_mp4, output_mp4)
         return
 
     # Adjust segment_end if it exceeds duration
@@ -266,109 +451,47 @@ def repeat_smear_segment_h264(input_mp4, output_mp4, join_time_sec, repeat_boost
         repeat_boost = segment_end - segment_start
         print(f"Adjusted repeat_boost to {repeat_boost:.3f}s (video ends before planned segment)")
 
-    # Extract segments
-    before_seg = temp_dir / 'before_seg.mp4'
-    repeat_seg = temp_dir / 'repeat_seg.mp4'
-    after_seg = temp_dir / 'after_seg.mp4'
-
-    segments_to_concat = []
-
-    # Helper to check if segment has valid video stream
-    def has_video_stream(path):
-        try:
-            cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
-                   '-show_entries', 'stream=codec_type', '-of', 'json', str(path)]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                return False
-            data = json.loads(result.stdout)
-            return len(data.get('streams', [])) > 0
-        except:
-            return False
+    # Codec-copy first: no encode at all when the concat demuxer accepts the
+    # broken stream, which is the dominant-cost win for this whole script.
+    print("\n[Trying codec-copy concat]")
+    if _smear_concat_copy(input_mp4, output_mp4, segment_start, segment_end,
+                          repeat_times, total_duration, verbose=verbose):
+        print(f"Smear boost complete (codec copy)")
+        return
+    print("Codec-copy concat failed; falling back to re-encode")
 
-    # Before: [0, segment_start]
+    # Fallback: build the before/repeat×N/after timeline in one ffmpeg run —
+    # trim cuts the single input, concat stitches the pieces, one lossless
+    # encode. Each occurrence gets its own trim chain — a labeled pad can
+    # only be consumed once, but [0:v] can feed many.
+    time_ranges = []
     if segment_start > 0.01:
-        cmd_before = [
-            'ffmpeg', '-y', '-i', str(input_mp4),
-            '-ss', '0',
-            '-t', str(segment_start),
-            '-c', 'copy',
-            str(before_seg)
-        ]
-        run_ffmpeg(cmd_before, "Extracting before segment", verbose)
-        if has_video_stream(before_seg):
-            segments_to_concat.append(before_seg)
-        else:
-            print(f"Warning: Before segment is empty, skipping")
-
-    # Repeat: [segment_start, segment_end]
-    cmd_repeat = [
+        time_ranges.append((0, segment_start))
+    time_ranges += [(segment_start, segment_end)] * repeat_times
+    if segment_end < total_duration - 0.01:
+        time_ranges.append((segment_end, None))
+
+    chains = []
+    labels = []
+    for i, (t0, t1) in enumerate(time_ranges):
+        spec = f'trim=start={t0}' if t1 is None else f'trim={t0}:{t1}'
+        chains.append(f'[0:v]{spec},setpts=PTS-STARTPTS[s{i}]')
+        labels.append(f'[s{i}]')
+    filter_str = ';'.join(chains) + f";{''.join(labels)}concat=n={len(time_ranges)}:v=1:a=0[v]"
+
+    # Note: We have to re-encode here since filter_complex doesn't support codec copy
+    # Use high quality H.264 settings to preserve glitches
+    cmd_concat = [
         'ffmpeg', '-y', '-i', str(input_mp4),
-        '-ss', str(segment_start),
-        '-t', str(repeat_boost),
-        '-c', 'copy',
-        str(repeat_seg)
+        '-filter_complex', filter_str,
+        '-map', '[v]',
+        '-c:v', 'libx264',
+        '-preset', 'ultrafast',  # Fast encoding
+        '-qp', '0',  # Lossless to preserve artifacts
+        '-pix_fmt', 'yuv420p',
+        str(output_mp4)
     ]
-    run_ffmpeg(cmd_repeat, "Extracting repeat segment", verbose)
-
-    # Validate repeat segment has video
-    if not has_video_stream(repeat_seg):
-        print(f"Warning: Repeat segment is empty, falling back to copy input")
-        shutil.copy(input_mp4, output_mp4)
-        return
-
-    # Add repeat segment N times
-    for _ in range(repeat_times):
-        segments_to_concat.append(repeat_seg)
-
-    # After: [segment_end, end]
-    if segment_end < total_duration - 0.01:
-        cmd_after = [
-            'ffmpeg', '-y', '-i', str(input_mp4),
-            '-ss', str(segment_end),
-            '-c', 'copy',
-            str(after_seg)
-        ]
-        run_ffmpeg(cmd_after, "Extracting after segment", verbose)
-        if has_video_stream(after_seg):
-            segments_to_concat.append(after_seg)
-        else:
-            print(f"Warning: After segment is empty, skipping")
-
-    # Concat - use filter_complex instead of concat demuxer
-    # This is more robust when dealing with broken H.264 streams
-    if len(segments_to_concat) == 1:
-        # Only one segment, just copy it
-        shutil.copy(segments_to_concat[0], output_mp4)
-    else:
-        # Build filter_complex concat
-        inputs = []
-        for seg in segments_to_concat:
-            inputs.extend(['-i', str(seg)])
-
-        # Build concat filter string: [0:v][1:v][2:v]...concat=n=N:v=1:a=0[v]
-        concat_inputs = ''.join([f'[{i}:v]' for i in range(len(segments_to_concat))])
-        filter_str = f'{concat_inputs}concat=n={len(segments_to_concat)}:v=1:a=0[v]'
-
-        # Note: We have to re-encode here since filter_complex doesn't support codec copy
-        # Use high quality H.264 settings to preserve glitches
-        cmd_concat = [
-            'ffmpeg', '-y',
-            *inputs,
-            '-filter_complex', filter_str,
-            '-map', '[v]',
-            '-c:v', 'libx264',
-            '-preset', 'ultrafast',  # Fast encoding
-            '-qp', '0',  # Lossless to preserve artifacts
-            '-pix_fmt', 'yuv420p',
-            str(output_mp4)
-        ]
-        run_ffmpeg(cmd_concat, f"Concatenating {len(segments_to_concat)} segments (re-encode)", verbose)
-
-    # Cleanup
-    before_seg.unlink(missing_ok=True)
-    repeat_seg.unlink(missing_ok=True)
-    after_seg.unlink(missing_ok=True)
+    run_ffmpeg(cmd_concat, f"Repeating segment x{repeat_times} (single trim/concat pass)", verbose)
 
     print(f"Smear boost complete")
 
@@ -402,61 +525,49 @@ def main():
     print("=== Validating inputs ===")
     validate_inputs(args.a, args.b)
 
-    # Create temp working directory
-    temp_dir = Path(tempfile.mkdtemp(prefix='mosh_h264_'))
-    print(f"\nWorking directory: {temp_dir}")
-
-    try:
-        # Step 1: Normalize to H.264 long-GOP
-        print("\n=== Step 1: Normalizing to H.264 long-GOP ===")
-        h264_a = temp_dir / 'A.mp4'
-        h264_b = temp_dir / 'B.mp4'
-
-        normalize_to_h264(args.a, h264_a, args.fps, args.width, args.crf, args.gop_len, verbose=args.verbose)
-        normalize_to_h264(args.b, h264_b, args.fps, args.width, args.crf, args.gop_len, verbose=args.verbose)
-
-        # Step 2: Probe join time
-        print("\n=== Step 2: Probing join time ===")
-        join_t = get_duration(h264_a)
-        print(f"JOIN_T = {join_t:.3f}s")
-
-        # Step 3: Concatenate with codec copy
-        print("\n=== Step 3: Concatenating (codec copy) ===")
-        out_longgop = Path.cwd() / 'out_longgop_h264.mp4'
-        concat_copy([h264_a, h264_b], out_longgop, verbose=args.verbose)
-
-        total_duration = get_duration(out_longgop)
-        print(f"Total duration = {total_duration:.3f}s")
-
-        # Validate windows
-        if join_t + args.no_iframe_window > total_duration:
-            print(f"Warning: no_iframe_window extends beyond video end", file=sys.stderr)
-            args.no_iframe_window = total_duration - join_t
-
-        if join_t + args.repeat_boost > total_duration:
-            print(f"Warning: repeat_boost extends beyond video end", file=sys.stderr)
-            args.repeat_boost = total_duration - join_t
-
-        # Step 4: H.264 packet surgery
-        print("\n=== Step 4: H.264 packet surgery ===")
-        mosh_core = Path.cwd() / 'mosh_core_h264.mp4'
-        packet_surgery_h264(out_longgop, mosh_core, join_t, args.no_iframe_window, args.postcut, verbose=args.verbose)
-
-        # Step 5: Amplify smear by repeating segment
-        print("\n=== Step 5: Smear boost ===")
-        mosh_final = Path.cwd() / 'mosh_final_h264.mp4'
-        repeat_smear_segment_h264(mosh_core, mosh_final, join_t, args.repeat_boost, args.repeat_times, verbose=args.verbose)
-
-        print("\n=== Success! ===")
-        print(f"Outputs:")
-        print(f"  - {out_longgop} (long GOP concat)")
-        print(f"  - {mosh_core} (IDR frames stripped)")
-        print(f"  - {mosh_final} (smear boosted)")
-
-    finally:
-        # Clean up temp directory
-        print(f"\nCleaning up: {temp_dir}")
-        shutil.rmtree(temp_dir)
+    # Step 1: Normalize + concatenate in one fused encode — both clips go
+    # through a single filtergraph into one long-GOP x264 run, so there
+    # are no per-clip intermediates and no separate concat pass.
+    print("\n=== Step 1: Normalizing + concatenating (fused encode) ===")
+    out_longgop = Path.cwd() / 'out_longgop_h264.mp4'
+    normalize_and_concat(args.a, args.b, out_longgop, args.fps, args.width,
+                         args.crf, args.gop_len, verbose=args.verbose)
+
+    # Step 2: Probe join time — fps normalization preserves the source
+    # span, so clip A's own duration is the join point
+    print("\n=== Step 2: Probing join time ===")
+    join_t = get_duration(args.a)
+    print(f"JOIN_T = {join_t:.3f}s")
+
+    total_duration = get_duration(out_longgop)
+    print(f"Total duration = {total_duration:.3f}s")
+
+    # Validate windows
+    if join_t + args.no_iframe_window > total_duration:
+        print(f"Warning: no_iframe_window extends beyond video end", file=sys.stderr)
+        args.no_iframe_window = total_duration - join_t
+
+    if join_t + args.repeat_boost > total_duration:
+        print(f"Warning: repeat_boost extends beyond video end", file=sys.stderr)
+        args.repeat_boost = total_duration - join_t
+
+    # Step 3: H.264 packet surgery
+    print("\n=== Step 3: H.264 packet surgery ===")
+    mosh_core = Path.cwd() / 'mosh_core_h264.mp4'
+    packet_surgery_h264(out_longgop, mosh_core, join_t, args.no_iframe_window, args.postcut,
+                        strip_sei=not _has_filter_units_bsf(), verbose=args.verbose)
+
+    # Step 4: Amplify smear by repeating segment
+    print("\n=== Step 4: Smear boost ===")
+    mosh_final = Path.cwd() / 'mosh_final_h264.mp4'
+    repeat_smear_segment_h264(mosh_core, mosh_final, join_t, args.repeat_boost, args.repeat_times,
+                              total_duration=total_duration, verbose=args.verbose)
+
+    print("\n=== Success! ===")
+    print(f"Outputs:")
+    print(f"  - {out_longgop} (long GOP concat)")
+    print(f"  - {mosh_core} (IDR frames stripped)")
+    print(f"  - {mosh_final} (smear boosted)")
 
 
 if __name__ == '__main__':
@@ -7,6 +7,7 @@ and forcing P-cascade across the zoom with no new I-frames.
 """
 
 import argparse
+import functools
 import subprocess
 import sys
 import os
@@ -15,6 +16,11 @@ import tempfile
 import shutil
 from pathlib import Path
 
+try:
+    import av
+except ImportError:
+    av = None  # codec-copy I-frame strip falls back to ffmpeg re-encode
+
 
 def run_ffmpeg(cmd, description, verbose=False):
     """Execute FFmpeg command with error handling."""
@@ -22,21 +28,30 @@ def run_ffmpeg(cmd, description, verbose=False):
     if verbose:
         print(f"Command: {' '.join(cmd)}")
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
+    # stdout goes straight to /dev/null and stderr stays as bytes — it is
+    # only decoded when actually printed (failure or verbose), not per call.
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
         print(f"Error: {description} failed", file=sys.stderr)
         print(f"Command: {' '.join(cmd)}", file=sys.stderr)
-        print(result.stderr, file=sys.stderr)
+        print(stderr.decode(errors='replace'), file=sys.stderr)
         sys.exit(1)
 
-    if verbose and result.stderr:
-        print(result.stderr)
+    if verbose and stderr:
+        print(stderr.decode(errors='replace'))
 
-    return result
+    return proc
 
 
 def get_video_info(video_path):
-    """Get video duration and dimensions using ffprobe."""
+    """Get video duration and dimensions using ffprobe (cached per file)."""
+    # mtime keys the cache so an overwritten file invalidates its entry
+    return _video_info_cached(str(video_path), Path(video_path).stat().st_mtime)
+
+
+@functools.lru_cache(maxsize=64)
+def _video_info_cached(video_path, _mtime):
     cmd = [
         'ffprobe',
         '-v', 'error',
@@ -45,12 +60,13 @@ def get_video_info(video_path):
         '-of', 'json',
         str(video_path)
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if result.returncode != 0:
         print(f"Error: Failed to probe {video_path}", file=sys.stderr)
-        print(result.stderr, file=sys.stderr)
+        print(result.stderr.decode(errors='replace'), file=sys.stderr)
         sys.exit(1)
 
+    # json.loads takes the stdout bytes directly — no text-mode decode pass
     data = json.loads(result.stdout)
     stream = data['streams'][0]
     width = int(stream['width'])
@@ -178,8 +194,59 @@ def concat_with_longgop(before_path, zoom_path, after_path, output_path, q, verb
     run_ffmpeg(cmd, "Concatenating with long GOP", verbose)
 
 
+def _strip_iframes_copy(input_path, output_path, win_start, win_end, verbose=False):
+    """Packet-level I-frame strip with codec copy — no decode, no re-encode."""
+    with av.open(str(input_path)) as in_ct, av.open(str(output_path), mode='w') as out_ct:
+        vin = next(s for s in in_ct.streams if s.type == 'video')
+        for s in in_ct.streams:
+            if s is not vin:
+                try:
+                    s.discard = 'all'
+                except Exception:
+                    pass
+
+        if hasattr(out_ct, 'add_stream_from_template'):  # PyAV >= 10
+            vout = out_ct.add_stream_from_template(vin)
+        else:
+            vout = out_ct.add_stream(template=vin)
+
+        tb_in = vin.time_base
+        mux = out_ct.mux
+        dropped = 0
+        for pkt in in_ct.demux(vin):
+            if pkt.pts is None and pkt.dts is None and not pkt.size:
+                continue  # demuxer flush packet
+            pkt_time = float(pkt.pts * tb_in) if pkt.pts is not None else 0.0
+            if pkt.is_keyframe and win_start <= pkt_time <= win_end:
+                dropped += 1
+                if verbose:
+                    print(f"  Dropped I-frame at {pkt_time:.3f}s")
+                continue
+            # Demuxed packets carry their own time_base; mux() rescales them
+            # to the output stream automatically.
+            pkt.stream = vout
+            mux(pkt)
+    print(f"Dropped {dropped} I-frame packets (codec copy)")
+
+
 def strip_iframes_window(input_path, output_path, win_start, win_end, q, verbose=False):
-    """Force P-cascade by stripping I-frames in window [win_start, win_end]."""
+    """
+    Force P-cascade by stripping I-frames in window [win_start, win_end].
+
+    Keyframe packets inside the window are dropped and the rest is remuxed
+    with codec copy, so the step no longer decodes and re-encodes every
+    frame just to discard a few. The old select re-encode remains as the
+    fallback when PyAV is unavailable or the copy pass fails.
+    """
+    if av is not None:
+        print(f"\n[Stripping I-frames in window [{win_start:.3f}s, {win_end:.3f}s] (codec copy)]")
+        try:
+            _strip_iframes_copy(input_path, output_path, win_start, win_end, verbose)
+            return
+        except Exception as exc:
+            print(f"Warning: codec-copy I-frame strip failed ({exc}); falling back to re-encode",
+                  file=sys.stderr)
+
     select_expr = f"select='not(between(t,{win_start},{win_end})*eq(pict_type,I))',setpts=N/FRAME_RATE/TB"
 
     cmd = [
@@ -63,8 +63,8 @@ source "$VENV_DIR/bin/activate"
 python -m pip install --upgrade pip setuptools wheel
 
 # --- Python packages ---------------------------------------------------------
-echo "Installing Python packages: numpy, opencv-python-headless, av, tqdm"
-pip install numpy opencv-python-headless av tqdm
+echo "Installing Python packages: numpy, opencv-python-headless, av>=12, tqdm"
+pip install numpy opencv-python-headless "av>=12" tqdm
 
 echo "Verifying installs..."
 python - <<'PY'
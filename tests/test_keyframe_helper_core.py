@@ -5,6 +5,7 @@ from tools.keyframe_helper_core import (
     build_selection_payload,
     clamp_frame,
     find_nearest_keyframe_frame,
+    find_nearest_keyframe_frames,
     keyframe_times_to_frames,
 )
 
@@ -26,6 +27,20 @@ class KeyframeHelperCoreTests(unittest.TestCase):
         self.assertEqual(find_nearest_keyframe_frame(3, keys), 0)
         self.assertEqual(find_nearest_keyframe_frame(49, keys), 50)
         self.assertEqual(find_nearest_keyframe_frame(74, keys), 75)
+        # outside the list clamps to the ends
+        self.assertEqual(find_nearest_keyframe_frame(-10, keys), 0)
+        self.assertEqual(find_nearest_keyframe_frame(999, keys), 75)
+        # exact ties resolve to the lower keyframe
+        self.assertEqual(find_nearest_keyframe_frame(25, [0, 50]), 0)
+        self.assertEqual(find_nearest_keyframe_frame(7, []), 7)
+
+    def test_find_nearest_keyframe_frames_batch(self):
+        keys = [0, 25, 50, 75]
+        queries = [-10, 0, 3, 25, 37, 38, 49, 74, 999]
+        expected = [find_nearest_keyframe_frame(q, keys) for q in queries]
+        self.assertEqual(find_nearest_keyframe_frames(queries, keys), expected)
+        self.assertEqual(find_nearest_keyframe_frames([], keys), [])
+        self.assertEqual(find_nearest_keyframe_frames([7, 9], []), [7, 9])
 
     def test_payload_contains_selection_and_commands(self):
         info = VideoInfo(path="clip.mp4", fps=25.0, frame_count=250, duration=10.0)
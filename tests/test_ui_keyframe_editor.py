@@ -0,0 +1,48 @@
+import unittest
+
+from mosh_algorithms.ui_keyframe_editor import _jump_next_i, _keep_ranges
+
+
+class JumpNextITests(unittest.TestCase):
+    KEYS = [0, 25, 50, 75]
+
+    def test_forward_from_keyframe(self):
+        self.assertEqual(_jump_next_i(self.KEYS, 25, +1), 50)
+
+    def test_forward_between_keyframes(self):
+        self.assertEqual(_jump_next_i(self.KEYS, 26, +1), 50)
+
+    def test_forward_clamps_at_last(self):
+        self.assertEqual(_jump_next_i(self.KEYS, 75, +1), 75)
+        self.assertEqual(_jump_next_i(self.KEYS, 90, +1), 75)
+
+    def test_backward_from_keyframe(self):
+        self.assertEqual(_jump_next_i(self.KEYS, 50, -1), 25)
+
+    def test_backward_between_keyframes(self):
+        # previous keyframe, not two back
+        self.assertEqual(_jump_next_i(self.KEYS, 49, -1), 25)
+
+    def test_backward_clamps_at_first(self):
+        self.assertEqual(_jump_next_i(self.KEYS, 0, -1), 0)
+
+    def test_empty_keyframe_list(self):
+        self.assertEqual(_jump_next_i([], 7, +1), 7)
+
+
+class KeepRangesTests(unittest.TestCase):
+    def test_no_drops_keeps_everything(self):
+        self.assertEqual(_keep_ranges([], 10), [(0, 10)])
+
+    def test_interior_drops_split_ranges(self):
+        self.assertEqual(_keep_ranges([3, 4, 5, 8], 10), [(0, 3), (6, 8), (9, 10)])
+
+    def test_out_of_bounds_drops_ignored(self):
+        self.assertEqual(_keep_ranges([-1, 10, 99], 10), [(0, 10)])
+
+    def test_trailing_drop(self):
+        self.assertEqual(_keep_ranges([9], 10), [(0, 9)])
+
+
+if __name__ == "__main__":
+    unittest.main()
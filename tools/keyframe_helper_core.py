@@ -3,13 +3,29 @@
 
 from __future__ import annotations
 
+import functools
 import json
+import math
+import os
+import re
 import shlex
+import struct
 import subprocess
-from dataclasses import asdict, dataclass
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Sequence
 
+import numpy as np
+
+try:
+    import orjson  # optional: 2-3x faster on multi-MB ffprobe payloads
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 
 @dataclass(frozen=True)
 class VideoInfo:
@@ -17,6 +33,10 @@ class VideoInfo:
     fps: float
     frame_count: int
     duration: float
+    # Exact rate as parsed from avg_frame_rate (e.g. 24000/1001); (0, 1)
+    # means unknown and callers fall back to the float fps.
+    fps_num: int = 0
+    fps_den: int = 1
 
 
 @dataclass(frozen=True)
@@ -29,26 +49,60 @@ class SelectionInfo:
     time_delta_to_keyframe: float
 
 
-def _run_ffprobe_json(cmd: Sequence[str]) -> dict:
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+def _coerce_float(value, default: float | None = None) -> float | None:
+    if value in (None, "", "N/A"):
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_plain(obj) -> dict:
+    # dataclasses.asdict deep-copies every field; these are flat dataclasses
+    # of scalars, so a direct field read is enough.
+    return {field: getattr(obj, field) for field in obj.__dataclass_fields__}
+
+
+def _run_ffprobe_raw(cmd: Sequence[str]) -> bytes:
+    # Bytes mode: skip the universal-newlines decode pass entirely.
+    # Decode stderr only on failure.
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if proc.returncode != 0:
-        raise RuntimeError(f"ffprobe failed ({proc.returncode}): {' '.join(cmd)}\n{proc.stderr}")
-    return json.loads(proc.stdout or "{}")
+        stderr = proc.stderr.decode(errors="replace")
+        raise RuntimeError(f"ffprobe failed ({proc.returncode}): {' '.join(cmd)}\n{stderr}")
+    return proc.stdout
 
 
-def _parse_fps(rate: str | None) -> float:
+def _run_ffprobe_json(cmd: Sequence[str]) -> dict:
+    return _json_loads(_run_ffprobe_raw(cmd) or b"{}")
+
+
+def _parse_fps_rational(rate: str | None) -> tuple[int, int]:
     if not rate:
-        return 30.0
+        return 30, 1
+    n_str, _, d_str = str(rate).partition("/")
+    try:
+        num = int(n_str)
+        den = int(d_str) if d_str else 1
+        if num > 0 and den > 0:
+            return num, den
+        return 30, 1
+    except Exception:
+        pass
+    # non-rational forms (e.g. "29.97") — fixed-point fallback
     try:
-        n_str, d_str = str(rate).split("/", 1)
-        n = float(n_str)
-        d = float(d_str)
-        if d == 0:
-            return 30.0
-        fps = n / d
-        return fps if fps > 0 else 30.0
+        fps = float(rate)
+        if fps <= 0:
+            return 30, 1
+        return int(round(fps * 1000)), 1000
     except Exception:
-        return 30.0
+        return 30, 1
+
+
+def _parse_fps(rate: str | None) -> float:
+    num, den = _parse_fps_rational(rate)
+    return float(num) / float(den)
 
 
 def clamp_frame(frame_idx: int, frame_count: int) -> int:
@@ -61,12 +115,151 @@ def clamp_frame(frame_idx: int, frame_count: int) -> int:
     return int(frame_idx)
 
 
-def frame_to_time(frame_idx: int, fps: float) -> float:
+def frame_to_time(frame_idx: int, fps: float, fps_num: int = 0, fps_den: int = 1) -> float:
+    if fps_num > 0 and fps_den > 0:
+        # integer multiply first, one float division at the end
+        return int(frame_idx) * fps_den / fps_num
     fps_safe = fps if fps > 0 else 30.0
     return float(frame_idx) / float(fps_safe)
 
 
+_MP4_SUFFIXES = {".mp4", ".m4v", ".mov"}
+_MOOV_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _iter_mp4_boxes(buf: bytes, start: int, end: int):
+    off = start
+    while off + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, off)
+        header = 8
+        if size == 1:
+            if off + 16 > end:
+                return
+            size = struct.unpack_from(">Q", buf, off + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - off
+        if size < header or off + size > end:
+            return
+        yield box_type, off + header, off + size
+        off += size
+
+
+def _find_mp4_box(buf: bytes, start: int, end: int, box_type: bytes):
+    for found_type, payload_start, payload_end in _iter_mp4_boxes(buf, start, end):
+        if found_type == box_type:
+            return payload_start, payload_end
+    return None
+
+
+def _read_moov(handle, file_size: int):
+    # walk top-level boxes by seeking; moov may sit before or after mdat
+    off = 0
+    while off + 8 <= file_size:
+        handle.seek(off)
+        header = handle.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack_from(">I4s", header, 0)
+        header_len = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - off
+        if size < header_len:
+            return None
+        if box_type == b"moov":
+            if size > _MOOV_MAX_BYTES:
+                return None
+            handle.seek(off + header_len)
+            return handle.read(size - header_len)
+        off += size
+    return None
+
+
+def _read_mp4_timescale_duration(buf: bytes, payload_start: int):
+    # mvhd/mdhd share the layout: version 1 widens the three leading times to u64
+    if buf[payload_start] == 1:
+        return struct.unpack_from(">IQ", buf, payload_start + 20)
+    return struct.unpack_from(">II", buf, payload_start + 12)
+
+
+def _probe_mp4_header(video_path: str) -> VideoInfo | None:
+    # Everything probe_video_info asks ffprobe for (rate, frame count,
+    # duration) already sits in the moov header of a well-formed mp4/mov:
+    # mvhd for movie duration, the video trak's mdhd + stsz for rate/frames.
+    # Reading it directly avoids spawning ffprobe at all.
+    path = Path(video_path)
+    if path.suffix.lower() not in _MP4_SUFFIXES:
+        return None
+    try:
+        file_size = path.stat().st_size
+        with open(path, "rb") as handle:
+            moov = _read_moov(handle, file_size)
+        if not moov:
+            return None
+
+        duration = 0.0
+        mvhd = _find_mp4_box(moov, 0, len(moov), b"mvhd")
+        if mvhd is not None:
+            timescale, raw_duration = _read_mp4_timescale_duration(moov, mvhd[0])
+            if timescale > 0:
+                duration = raw_duration / timescale
+
+        for box_type, trak_start, trak_end in _iter_mp4_boxes(moov, 0, len(moov)):
+            if box_type != b"trak":
+                continue
+            mdia = _find_mp4_box(moov, trak_start, trak_end, b"mdia")
+            if mdia is None:
+                continue
+            hdlr = _find_mp4_box(moov, mdia[0], mdia[1], b"hdlr")
+            if hdlr is None or moov[hdlr[0] + 8 : hdlr[0] + 12] != b"vide":
+                continue
+            mdhd = _find_mp4_box(moov, mdia[0], mdia[1], b"mdhd")
+            minf = _find_mp4_box(moov, mdia[0], mdia[1], b"minf")
+            if mdhd is None or minf is None:
+                continue
+            stbl = _find_mp4_box(moov, minf[0], minf[1], b"stbl")
+            if stbl is None:
+                continue
+            stsz = _find_mp4_box(moov, stbl[0], stbl[1], b"stsz") or _find_mp4_box(
+                moov, stbl[0], stbl[1], b"stz2"
+            )
+            if stsz is None:
+                continue
+
+            timescale, raw_duration = _read_mp4_timescale_duration(moov, mdhd[0])
+            frame_count = struct.unpack_from(">I", moov, stsz[0] + 8)[0]
+            if frame_count <= 0 or timescale <= 0 or raw_duration <= 0:
+                return None
+            fps_num = frame_count * timescale
+            fps_den = raw_duration
+            g = math.gcd(fps_num, fps_den)
+            fps_num //= g
+            fps_den //= g
+            if duration <= 0:
+                duration = raw_duration / timescale
+            return VideoInfo(
+                path=str(video_path),
+                fps=float(fps_num) / float(fps_den),
+                frame_count=int(frame_count),
+                duration=float(duration),
+                fps_num=int(fps_num),
+                fps_den=int(fps_den),
+            )
+        return None
+    except Exception:
+        return None
+
+
 def probe_video_info(video_path: str) -> VideoInfo:
+    fast = _probe_mp4_header(video_path)
+    if fast is not None:
+        return fast
+
     cmd = [
         "ffprobe",
         "-v",
@@ -85,32 +278,14 @@ def probe_video_info(video_path: str) -> VideoInfo:
         raise RuntimeError(f"No video stream found: {video_path}")
     stream = streams[0]
 
-    fps = _parse_fps(stream.get("avg_frame_rate"))
+    fps_num, fps_den = _parse_fps_rational(stream.get("avg_frame_rate"))
+    fps = float(fps_num) / float(fps_den)
 
-    duration = 0.0
-    for key in ("duration",):
-        raw = stream.get(key)
-        if raw not in (None, ""):
-            try:
-                duration = float(raw)
-                break
-            except Exception:
-                pass
+    duration = _coerce_float(stream.get("duration"), 0.0)
     if duration <= 0:
-        raw_fmt = (payload.get("format") or {}).get("duration")
-        if raw_fmt not in (None, ""):
-            try:
-                duration = float(raw_fmt)
-            except Exception:
-                duration = 0.0
-
-    frame_count = 0
-    raw_nb = stream.get("nb_frames")
-    if raw_nb not in (None, "", "N/A"):
-        try:
-            frame_count = int(raw_nb)
-        except Exception:
-            frame_count = 0
+        duration = _coerce_float((payload.get("format") or {}).get("duration"), 0.0)
+
+    frame_count = int(_coerce_float(stream.get("nb_frames"), 0.0))
     if frame_count <= 0 and duration > 0:
         frame_count = max(1, int(round(duration * fps)))
     if frame_count <= 0:
@@ -118,80 +293,156 @@ def probe_video_info(video_path: str) -> VideoInfo:
     if duration <= 0:
         duration = float(frame_count) / float(fps if fps > 0 else 30.0)
 
-    return VideoInfo(path=str(video_path), fps=float(fps), frame_count=int(frame_count), duration=float(duration))
+    return VideoInfo(
+        path=str(video_path),
+        fps=float(fps),
+        frame_count=int(frame_count),
+        duration=float(duration),
+        fps_num=int(fps_num),
+        fps_den=int(fps_den),
+    )
+
+
+# Keyframe packets in ffprobe's packet JSON, matched straight on the bytes so
+# no dict objects are built. ffprobe has emitted pts_time before flags for
+# years, but both orderings are tried.
+_KEYFRAME_RE_PTS_FIRST = re.compile(rb'"pts_time":\s*"(-?[0-9.eE+-]+)"[^}]*?"flags":\s*"[^"]*K')
+_KEYFRAME_RE_FLAGS_FIRST = re.compile(rb'"flags":\s*"[^"]*K[^"]*"[^}]*?"pts_time":\s*"(-?[0-9.eE+-]+)"')
+
+
+def _scan_keyframe_times(data: bytes) -> List[float] | None:
+    # None means "unsure, fall back to the JSON parser"
+    matches = _KEYFRAME_RE_PTS_FIRST.findall(data)
+    if not matches:
+        matches = _KEYFRAME_RE_FLAGS_FIRST.findall(data)
+    if not matches:
+        return None
+    values: List[float] = []
+    for raw in matches:
+        ts = _coerce_float(raw.decode("ascii", "replace"))
+        if ts is not None:
+            values.append(ts)
+    return values
 
 
-def collect_keyframe_times(video_path: str) -> List[float]:
+def _collect_keyframe_interval(video_path: str, interval: tuple | None = None) -> List[float]:
+    # Packet-level scan: no decoding, unlike -skip_frame nokey -show_frames.
+    # Keyframes carry "K" in the packet flags string (e.g. "K_" / "K__").
     cmd = [
         "ffprobe",
         "-v",
         "error",
         "-select_streams",
         "v:0",
-        "-skip_frame",
-        "nokey",
-        "-show_frames",
+    ]
+    if interval is not None:
+        cmd += ["-read_intervals", f"{interval[0]:.6f}%{interval[1]:.6f}"]
+    cmd += [
         "-show_entries",
-        "frame=key_frame,best_effort_timestamp_time,pkt_pts_time",
+        "packet=pts_time,flags",
         "-of",
         "json",
         str(video_path),
     ]
-    payload = _run_ffprobe_json(cmd)
-    frames = payload.get("frames") or []
+    raw = _run_ffprobe_raw(cmd)
+    scanned = _scan_keyframe_times(raw)
+    if scanned is not None:
+        return scanned
+
+    payload = _json_loads(raw or b"{}")
+    packets = payload.get("packets") or []
 
     values: List[float] = []
-    for frame in frames:
-        if int(frame.get("key_frame", 0)) != 1:
-            continue
-        ts_raw = frame.get("best_effort_timestamp_time")
-        if ts_raw in (None, ""):
-            ts_raw = frame.get("pkt_pts_time")
-        if ts_raw in (None, ""):
-            continue
-        try:
-            values.append(float(ts_raw))
-        except Exception:
+    for packet in packets:
+        if "K" not in str(packet.get("flags", "")):
             continue
+        ts = _coerce_float(packet.get("pts_time"))
+        if ts is not None:
+            values.append(ts)
+    return values
+
+
+def collect_keyframe_times(video_path: str, duration: float | None = None) -> List[float]:
+    # With a known duration, split the file into one -read_intervals segment
+    # per worker and probe them in parallel (ffprobe releases the GIL while
+    # running). Boundary duplicates are folded by sorted(set(...)).
+    workers = min(os.cpu_count() or 1, 8)
+    if duration is not None and duration > 0 and workers > 1:
+        step = float(duration) / workers
+        intervals = [(i * step, (i + 1) * step) for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(lambda iv: _collect_keyframe_interval(video_path, iv), intervals)
+        values = [ts for chunk in chunks for ts in chunk]
+    else:
+        values = _collect_keyframe_interval(video_path)
 
     if not values:
         return [0.0]
-    uniq = sorted(set(values))
-    return uniq
+    return sorted(set(values))
 
 
 def keyframe_times_to_frames(keyframe_times: Sequence[float], video_info: VideoInfo) -> List[int]:
-    out: List[int] = []
-    for ts in keyframe_times:
-        try:
-            idx = int(round(float(ts) * video_info.fps))
-        except Exception:
-            continue
-        out.append(clamp_frame(idx, video_info.frame_count))
-    if not out:
+    try:
+        arr = np.asarray(keyframe_times, dtype=np.float64)
+    except (TypeError, ValueError):
+        clean = []
+        for ts in keyframe_times:
+            try:
+                clean.append(float(ts))
+            except Exception:
+                continue
+        arr = np.asarray(clean, dtype=np.float64)
+    if arr.size == 0:
         return [0]
-    return sorted(set(out))
+    if video_info.fps_num > 0 and video_info.fps_den > 0:
+        # integer nanosecond arithmetic: exact for 24000/1001-style rates,
+        # where repeated ts*float(fps) round-trips drift off by a frame
+        ts_ns = np.rint(arr * 1_000_000_000).astype(np.int64)
+        den_ns = video_info.fps_den * 1_000_000_000
+        idx = (ts_ns * video_info.fps_num + den_ns // 2) // den_ns
+    else:
+        idx = np.rint(arr * video_info.fps).astype(np.int64)
+    np.clip(idx, 0, max(0, video_info.frame_count - 1), out=idx)
+    return np.unique(idx).tolist()
 
 
 def find_nearest_keyframe_frame(frame_idx: int, keyframe_frames: Sequence[int]) -> int:
+    # keyframe_frames is sorted (keyframe_times_to_frames), so binary search;
+    # ties go to the lower frame like the previous strict-< linear scan.
     if not keyframe_frames:
         return int(frame_idx)
-    best = keyframe_frames[0]
-    best_delta = abs(best - frame_idx)
-    for kf in keyframe_frames[1:]:
-        delta = abs(kf - frame_idx)
-        if delta < best_delta:
-            best = kf
-            best_delta = delta
-    return int(best)
+    pos = bisect_left(keyframe_frames, frame_idx)
+    if pos == 0:
+        return int(keyframe_frames[0])
+    if pos == len(keyframe_frames):
+        return int(keyframe_frames[-1])
+    before = keyframe_frames[pos - 1]
+    after = keyframe_frames[pos]
+    return int(before) if frame_idx - before <= after - frame_idx else int(after)
+
+
+def find_nearest_keyframe_frames(frame_indices: Sequence[int], keyframe_frames: Sequence[int]) -> List[int]:
+    # batch variant: one searchsorted over contiguous int64 arrays instead of
+    # a bisect per query; same tie-to-lower rule as the scalar version
+    q = np.asarray(frame_indices, dtype=np.int64)
+    if q.size == 0:
+        return []
+    if not len(keyframe_frames):
+        return q.tolist()
+    kf = np.asarray(keyframe_frames, dtype=np.int64)
+    pos = np.searchsorted(kf, q)
+    left = np.clip(pos - 1, 0, kf.size - 1)
+    right = np.clip(pos, 0, kf.size - 1)
+    pick_left = (q - kf[left]) <= (kf[right] - q)
+    return np.where(pick_left, kf[left], kf[right]).tolist()
 
 
 def build_selection_info(video_info: VideoInfo, selected_frame: int, keyframe_frames: Sequence[int]) -> SelectionInfo:
     safe_frame = clamp_frame(int(selected_frame), video_info.frame_count)
-    selected_time = frame_to_time(safe_frame, video_info.fps)
+    selected_time = frame_to_time(safe_frame, video_info.fps, video_info.fps_num, video_info.fps_den)
 
     nearest_frame = find_nearest_keyframe_frame(safe_frame, keyframe_frames)
-    nearest_time = frame_to_time(nearest_frame, video_info.fps)
+    nearest_time = frame_to_time(nearest_frame, video_info.fps, video_info.fps_num, video_info.fps_den)
 
     frame_delta = safe_frame - nearest_frame
     time_delta = selected_time - nearest_time
@@ -205,15 +456,22 @@ def build_selection_info(video_info: VideoInfo, selected_frame: int, keyframe_fr
     )
 
 
+@functools.lru_cache(maxsize=8)
+def _video_prefix(video_path: str) -> tuple[str, str]:
+    # shlex.quote + Path.stem are called on every suggestion rebuild for the
+    # same video; quoted input/output strings never change per path.
+    input_q = shlex.quote(video_path)
+    out_q = shlex.quote(f"{Path(video_path).stem}.moshed.mp4")
+    return input_q, out_q
+
+
 def build_command_suggestions(
     video_info: VideoInfo,
     selection: SelectionInfo,
     repeat_count: int = 12,
     kill_ratio: float = 1.0,
 ) -> dict:
-    input_q = shlex.quote(video_info.path)
-    stem = Path(video_info.path).stem
-    out_q = shlex.quote(f"{stem}.moshed.mp4")
+    input_q, out_q = _video_prefix(video_info.path)
 
     repeat = max(0, int(repeat_count))
     kill = max(0.0, float(kill_ratio))
@@ -247,8 +505,8 @@ def build_selection_payload(
 ) -> dict:
     selection = build_selection_info(video_info, selected_frame, keyframe_frames)
     return {
-        "video": asdict(video_info),
-        "selection": asdict(selection),
+        "video": _as_plain(video_info),
+        "selection": _as_plain(selection),
         "suggested_commands": build_command_suggestions(
             video_info,
             selection,
@@ -4,16 +4,23 @@
 from __future__ import annotations
 
 import argparse
+import bisect
 import json
 import os
 import sys
+from collections import OrderedDict
 from pathlib import Path
 
+import numpy as np
+
 SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
+from dataclasses import asdict  # noqa: E402
+
 from keyframe_helper_core import (  # noqa: E402
+    VideoInfo,
     build_selection_payload,
     build_selection_info,
     clamp_frame,
@@ -36,12 +43,50 @@ SELECT_KEYS = {13, 10, ord(" "), ord("m")}
 SAVE_KEYS = {ord("s"), ord("S")}
 QUIT_KEYS = {27, ord("q"), ord("Q")}
 
+FRAME_CACHE_SIZE = 64
+
 
 def _default_output_path(video_path: str) -> str:
     src = Path(video_path)
     return str(src.with_suffix(".mosh_start.json"))
 
 
+def _probe_cache_path(video_path: str) -> str:
+    return str(Path(video_path).with_suffix(".kfcache.json"))
+
+
+def _probe_cache_key(video_path: str) -> list:
+    stat = os.stat(video_path)
+    return [stat.st_mtime, stat.st_size]
+
+
+def _load_probe_cache(video_path: str):
+    # Returns (video_info, keyframe_times) or None if the cache is missing/stale.
+    try:
+        with open(_probe_cache_path(video_path), "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if data.get("key") != _probe_cache_key(video_path):
+            return None
+        video_info = VideoInfo(**data["video"])
+        keyframe_times = [float(ts) for ts in data["keyframe_times"]]
+        return video_info, keyframe_times
+    except Exception:
+        return None
+
+
+def _save_probe_cache(video_path: str, video_info, keyframe_times) -> None:
+    payload = {
+        "key": _probe_cache_key(video_path),
+        "video": asdict(video_info),
+        "keyframe_times": list(keyframe_times),
+    }
+    try:
+        with open(_probe_cache_path(video_path), "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+    except OSError:
+        pass  # cache is best-effort; read-only dirs just skip it
+
+
 def _timeline_bounds(frame_width: int, frame_height: int):
     x0 = 24
     x1 = max(x0 + 10, frame_width - 24)
@@ -58,45 +103,82 @@ def _frame_from_x(x: int, x0: int, x1: int, frame_count: int) -> int:
     return clamp_frame(int(round(ratio * (frame_count - 1))), frame_count)
 
 
+def _display_keyframes(keyframe_frames: list[int]) -> list[int]:
+    # Downsample once at load time; _draw_overlay runs on every repaint.
+    draw_step = 1
+    if len(keyframe_frames) > 1200:
+        draw_step = max(1, len(keyframe_frames) // 1200)
+    return keyframe_frames[::draw_step]
+
+
 def _jump_prev_keyframe(current_frame: int, keyframe_frames: list[int]) -> int:
-    prev = 0
-    for frame in keyframe_frames:
-        if frame >= current_frame:
-            break
-        prev = frame
-    return prev
+    # keyframe_frames is sorted — last keyframe strictly before current_frame
+    i = bisect.bisect_left(keyframe_frames, current_frame)
+    return keyframe_frames[i - 1] if i > 0 else 0
 
 
 def _jump_next_keyframe(current_frame: int, keyframe_frames: list[int], frame_count: int) -> int:
-    for frame in keyframe_frames:
-        if frame > current_frame:
-            return frame
+    # first keyframe strictly after current_frame
+    i = bisect.bisect_right(keyframe_frames, current_frame)
+    if i < len(keyframe_frames):
+        return keyframe_frames[i]
     return clamp_frame(frame_count - 1, frame_count)
 
 
+def _timeline_layout(frame_width: int, frame_height: int, frame_count: int, display_keyframes: list[int]):
+    # bounds + tick segments depend only on the frame size, so they are
+    # computed once per size and cached by _draw_overlay
+    x0, y0, x1, y1 = _timeline_bounds(frame_width, frame_height)
+    segs = None
+    if frame_count > 1 and display_keyframes:
+        xs = x0 + np.rint(
+            np.asarray(display_keyframes, dtype=np.float64) / float(frame_count - 1) * (x1 - x0)
+        ).astype(np.int32)
+        segs = np.empty((xs.size, 2, 2), dtype=np.int32)
+        segs[:, 0, 0] = xs
+        segs[:, 0, 1] = y0
+        segs[:, 1, 0] = xs
+        segs[:, 1, 1] = y1
+    return {"bounds": (x0, y0, x1, y1), "segs": segs}
+
+
 def _draw_overlay(
     frame,
     frame_idx: int,
     frame_count: int,
     fps: float,
     keyframe_frames: list[int],
+    display_keyframes: list[int],
     selected_frame: int | None,
+    layout_cache: dict | None = None,
+    scratch=None,
 ):
     cv2_mod = _require_cv2()
     h, w = frame.shape[:2]
-    x0, y0, x1, y1 = _timeline_bounds(w, h)
-
-    disp = frame.copy()
+    if layout_cache is None:
+        layout_cache = {}
+    layout = layout_cache.get((w, h))
+    if layout is None:
+        layout_cache.clear()
+        layout = _timeline_layout(w, h, frame_count, display_keyframes)
+        layout_cache[(w, h)] = layout
+    x0, y0, x1, y1 = layout["bounds"]
+
+    # With a caller-provided scratch canvas the frame is copied into a reused
+    # buffer (no per-repaint allocation) and left untouched; without one the
+    # overlay draws straight into the frame.
+    if scratch is not None:
+        np.copyto(scratch, frame)
+        disp = scratch
+    else:
+        disp = frame
     cv2_mod.rectangle(disp, (x0, y0), (x1, y1), (30, 30, 30), -1)
     cv2_mod.rectangle(disp, (x0, y0), (x1, y1), (180, 180, 180), 1)
 
     if frame_count > 1:
-        draw_step = 1
-        if len(keyframe_frames) > 1200:
-            draw_step = max(1, len(keyframe_frames) // 1200)
-        for keyframe in keyframe_frames[::draw_step]:
-            kx = x0 + int(round((float(keyframe) / float(frame_count - 1)) * (x1 - x0)))
-            cv2_mod.line(disp, (kx, y0), (kx, y1), (90, 90, 90), 1)
+        if layout["segs"] is not None:
+            # one polylines call instead of a cv2.line per tick
+            cv2_mod.polylines(disp, layout["segs"], False, (90, 90, 90), 1)
 
         cur_x = x0 + int(round((float(frame_idx) / float(frame_count - 1)) * (x1 - x0)))
         cv2_mod.line(disp, (cur_x, y0 - 8), (cur_x, y1 + 4), (0, 255, 0), 2)
@@ -151,9 +233,15 @@ def run_gui(video_path: str, output_path: str, repeat_count: int, kill_ratio: fl
     if not os.path.exists(video_path):
         raise FileNotFoundError(video_path)
 
-    video_info = probe_video_info(video_path)
-    keyframe_times = collect_keyframe_times(video_path)
+    cached = _load_probe_cache(video_path)
+    if cached is not None:
+        video_info, keyframe_times = cached
+    else:
+        video_info = probe_video_info(video_path)
+        keyframe_times = collect_keyframe_times(video_path, duration=video_info.duration)
+        _save_probe_cache(video_path, video_info, keyframe_times)
     keyframe_frames = keyframe_times_to_frames(keyframe_times, video_info)
+    display_keyframes = _display_keyframes(keyframe_frames)
 
     cap = cv2_mod.VideoCapture(video_path)
     if not cap.isOpened():
@@ -176,14 +264,44 @@ def run_gui(video_path: str, output_path: str, repeat_count: int, kill_ratio: fl
     cv2_mod.namedWindow(window_name, cv2_mod.WINDOW_NORMAL)
     cv2_mod.setMouseCallback(window_name, _on_mouse)
 
+    # CAP_PROP_POS_FRAMES seeks force a keyframe seek + decode-forward in most
+    # backends; stepping +1 is the common case, so only seek on real jumps.
+    # Revisited frames come from an LRU of recently decoded frames instead of
+    # a GOP re-decode.
+    last_decoded_frame = -2
+    frame_cache: OrderedDict = OrderedDict()
+    layout_cache: dict = {}
+    scratch = None  # reused overlay canvas, allocated on the first decode
+
+    def _get_frame(idx: int):
+        nonlocal last_decoded_frame
+        cached = frame_cache.get(idx)
+        if cached is not None:
+            frame_cache.move_to_end(idx)
+            # the overlay draws into the scratch canvas, so cached frames
+            # can be handed out without a protective copy
+            return cached
+        if idx != last_decoded_frame + 1:
+            cap.set(cv2_mod.CAP_PROP_POS_FRAMES, float(idx))
+        ok, decoded = cap.read()
+        if not ok or decoded is None:
+            last_decoded_frame = -2
+            return None
+        last_decoded_frame = idx
+        frame_cache[idx] = decoded
+        while len(frame_cache) > FRAME_CACHE_SIZE:
+            frame_cache.popitem(last=False)
+        return decoded
+
     try:
         while True:
             frame_idx = clamp_frame(state["frame_idx"], video_info.frame_count)
-            cap.set(cv2_mod.CAP_PROP_POS_FRAMES, float(frame_idx))
-            ok, frame = cap.read()
-            if not ok or frame is None:
+            frame = _get_frame(frame_idx)
+            if frame is None:
                 state["frame_idx"] = clamp_frame(frame_idx - 1, video_info.frame_count)
                 continue
+            if scratch is None or scratch.shape != frame.shape:
+                scratch = np.empty_like(frame)
 
             canvas, bounds = _draw_overlay(
                 frame,
@@ -191,7 +309,10 @@ def run_gui(video_path: str, output_path: str, repeat_count: int, kill_ratio: fl
                 frame_count=video_info.frame_count,
                 fps=video_info.fps,
                 keyframe_frames=keyframe_frames,
+                display_keyframes=display_keyframes,
                 selected_frame=state["selected_frame"],
+                layout_cache=layout_cache,
+                scratch=scratch,
             )
             state["timeline"] = bounds
             cv2_mod.imshow(window_name, canvas)
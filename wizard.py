@@ -3,488 +3,621 @@
 Interactive wizard for d4t4m0sh
 Guides users through algorithm selection and configuration with detailed explanations.
 """
+import functools
 import os
 import sys
-import subprocess
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, replace
+from typing import List, Dict, Any, Optional, Tuple
 
 VIDEO_EXTS = (".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm", ".gif")
-
-# Algorithm metadata with detailed descriptions
-ALGORITHM_INFO = {
-    "inspect_gop": {
-        "name": "GOP Inspector",
-        "category": "analysis",
-        "desc": "Analyze video GOP (Group of Pictures) structure. Shows frame types (I/P/B) to understand keyframe distribution.",
-        "use_case": "Use this first to see what you're working with - how many I-frames, GOP length, etc.",
-        "inputs": "single",
-        "outputs": ".csv",
-        "options": []
-    },
-    "gop_multi_drop_concat": {
-        "name": "Multi-Clip Concat & Drop",
-        "category": "basic",
-        "desc": "Concatenates multiple clips, forces keyframes at boundaries, then drops them. Supports smear holds and random postcut.",
-        "use_case": "Blend multiple clips together with motion smearing. Good for music videos.",
-        "inputs": "multiple",
-        "outputs": ".mp4/.avi",
-        "options": ["gop", "codec", "postcut", "postcut_rand", "hold_sec", "verbose"]
-    },
-    "video_to_image_mosh": {
-        "name": "Video → Image Mosh",
-        "category": "creative",
-        "desc": "Smears video motion INTO a still image. Creates trippy effect where the image seems to move.",
-        "use_case": "Turn a portrait or artwork into an animated, glitchy piece with motion from your video.",
-        "inputs": "single",
-        "outputs": ".mp4/.avi",
-        "options": ["image", "img_dur", "kb_mode", "gop", "codec", "verbose"]
-    },
-    "image_to_video_mosh": {
-        "name": "Image → Video Mosh",
-        "category": "creative",
-        "desc": "Creates motion from a still image, then smears it into video. Image appears to flow/melt.",
-        "use_case": "Animate a static image with artificial motion (rotation, zoom), then datamosh it.",
-        "inputs": "single",
-        "outputs": ".mp4/.avi",
-        "options": ["image", "img_dur", "kb_mode", "gop", "codec", "verbose"]
-    },
-    "color_fx_ffmpeg": {
-        "name": "Cinematic Color FX (FFmpeg)",
-        "category": "creative",
-        "desc": "Applies gritty, cinematic color grading presets inspired by the docs reference images.",
-        "use_case": "Grade footage before/after datamosh to get urban, dirty, faded, or hard-contrast looks.",
-        "inputs": "single",
-        "outputs": ".mp4/.avi",
-        "options": ["color_preset", "fx_strength", "grain", "vignette", "ghost", "keep_audio", "codec", "gop", "verbose"]
-    },
-    "double_exposure": {
-        "name": "Double Exposure Blend",
-        "category": "creative",
-        "desc": "Blend two clips using overlay/add/subtract/darken/lighten with adjustable opacity.",
-        "use_case": "Layer two moving clips for double-exposure or composite-style effects.",
-        "inputs": "two",
-        "outputs": ".mp4/.avi",
-        "options": ["blend_mode", "opacity", "descartes", "gop", "codec", "verbose"]
-    },
-    "avidemux_style": {
-        "name": "Avidemux-Style Surgery (manual prep)",
-        "category": "avidemux",
-        "desc": "Pure packet surgery, NO re-encode. Works on pre-converted Xvid AVI files. Strongest artifacts.",
-        "use_case": "Old-school, maximum glitch. You must first convert clips to Xvid with convert_to_xvid.sh.",
-        "inputs": "multiple",
-        "outputs": ".avi (video only)",
-        "options": ["postcut", "postcut_rand", "drop_mode", "verbose"]
-    },
-    "avidemux_style_all": {
-        "name": "Avidemux-Style All-In-One",
-        "category": "avidemux",
-        "desc": "One-shot: convert → concat → packet surgery → deliver. Can output AVI or MP4 with audio.",
-        "use_case": "Easiest way to get strong Avidemux-style mosh. Handles everything automatically.",
-        "inputs": "multiple",
-        "outputs": ".avi or .mp4",
-        "options": ["mosh_q", "gop", "hold_sec", "postcut", "postcut_rand", "drop_mode", "codec", "audio_from", "verbose"]
-    },
-    "mosh_zoom_oneclip": {
-        "name": "Melting Zoom (Single Clip)",
-        "category": "creative",
-        "desc": "Artificial zoom + datamosh on a single clip. Freezes a frame, generates zoom ramp, forces P-cascade for 'melting zoom' effect.",
-        "use_case": "Create trippy zoom effects that melt/smear. Great for beat drops, time stretching, or psychedelic visuals.",
-        "inputs": "single",
-        "outputs": ".mp4",
-        "options": ["fps", "width", "zoom_q", "zoom_t", "zoom_dur", "zoom_tail", "zoom_direction", "deliver_crf"]
-    },
-    "aviglitch_mosh": {
-        "name": "AviGlitch-Style Packet Mosh",
-        "category": "advanced",
-        "desc": "Direct AVI packet manipulation using PyAV. Classic drop/dup mode plus manual bloom pivot control. No re-encoding.",
-        "use_case": "Classic AviGlitch workflow without Ruby, or bloom burst insertion when you already know pivot frame index.",
-        "inputs": "single",
-        "outputs": ".avi",
-        "options": [
-            "ag_effect",
-            "aviglitch_prep",
-            "prep_q",
-            "prep_gop_ag",
-            "prep_fps",
-            "drop_start",
-            "drop_end",
-            "dup_at",
-            "dup_count",
-            "pivot_frame",
-            "repeat_count",
-            "kill_ratio",
-            "ag_keep_audio",
-            "verbose",
-        ]
-    },
-    "randomizer": {
-        "name": "Video Randomizer",
-        "category": "creative",
-        "desc": "Splits video into chunks of specified length and randomly reorders them. Creates glitchy, non-linear temporal effects.",
-        "use_case": "Create chaotic, disjointed video sequences. Great for experimental/glitch aesthetics and abstract visuals.",
-        "inputs": "single",
-        "outputs": ".mp4/.avi",
-        "options": ["chunk_length", "codec", "verbose"]
+_VIDEO_EXT_SET = frozenset(VIDEO_EXTS)
+
+@dataclass(frozen=True, slots=True)
+class OptInfo:
+    """Immutable option metadata; slots keep the table compact and
+    attribute access avoids a dict hash per lookup."""
+    type: str
+    default: Any
+    prompt: str
+    help: str = ""
+    choices: tuple = ()
+
+
+_META_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "d4t4m0sh", "wizard_meta.pkl"
+)
+
+
+def _build_metadata():
+    # Algorithm metadata with detailed descriptions
+    algorithm_info = {
+        "inspect_gop": {
+            "name": "GOP Inspector",
+            "category": "analysis",
+            "desc": "Analyze video GOP (Group of Pictures) structure. Shows frame types (I/P/B) to understand keyframe distribution.",
+            "use_case": "Use this first to see what you're working with - how many I-frames, GOP length, etc.",
+            "inputs": "single",
+            "outputs": ".csv",
+            "options": []
+        },
+        "gop_multi_drop_concat": {
+            "name": "Multi-Clip Concat & Drop",
+            "category": "basic",
+            "desc": "Concatenates multiple clips, forces keyframes at boundaries, then drops them. Supports smear holds and random postcut.",
+            "use_case": "Blend multiple clips together with motion smearing. Good for music videos.",
+            "inputs": "multiple",
+            "outputs": ".mp4/.avi",
+            "options": ["gop", "codec", "postcut", "postcut_rand", "hold_sec", "verbose"]
+        },
+        "video_to_image_mosh": {
+            "name": "Video → Image Mosh",
+            "category": "creative",
+            "desc": "Smears video motion INTO a still image. Creates trippy effect where the image seems to move.",
+            "use_case": "Turn a portrait or artwork into an animated, glitchy piece with motion from your video.",
+            "inputs": "single",
+            "outputs": ".mp4/.avi",
+            "options": ["image", "img_dur", "kb_mode", "gop", "codec", "verbose"]
+        },
+        "image_to_video_mosh": {
+            "name": "Image → Video Mosh",
+            "category": "creative",
+            "desc": "Creates motion from a still image, then smears it into video. Image appears to flow/melt.",
+            "use_case": "Animate a static image with artificial motion (rotation, zoom), then datamosh it.",
+            "inputs": "single",
+            "outputs": ".mp4/.avi",
+            "options": ["image", "img_dur", "kb_mode", "gop", "codec", "verbose"]
+        },
+        "color_fx_ffmpeg": {
+            "name": "Cinematic Color FX (FFmpeg)",
+            "category": "creative",
+            "desc": "Applies gritty, cinematic color grading presets inspired by the docs reference images.",
+            "use_case": "Grade footage before/after datamosh to get urban, dirty, faded, or hard-contrast looks.",
+            "inputs": "single",
+            "outputs": ".mp4/.avi",
+            "options": ["color_preset", "fx_strength", "grain", "vignette", "ghost", "keep_audio", "codec", "gop", "verbose"]
+        },
+        "double_exposure": {
+            "name": "Double Exposure Blend",
+            "category": "creative",
+            "desc": "Blend two clips using overlay/add/subtract/darken/lighten with adjustable opacity.",
+            "use_case": "Layer two moving clips for double-exposure or composite-style effects.",
+            "inputs": "two",
+            "outputs": ".mp4/.avi",
+            "options": ["blend_mode", "opacity", "descartes", "gop", "codec", "verbose"]
+        },
+        "avidemux_style": {
+            "name": "Avidemux-Style Surgery (manual prep)",
+            "category": "avidemux",
+            "desc": "Pure packet surgery, NO re-encode. Works on pre-converted Xvid AVI files. Strongest artifacts.",
+            "use_case": "Old-school, maximum glitch. You must first convert clips to Xvid with convert_to_xvid.sh.",
+            "inputs": "multiple",
+            "outputs": ".avi (video only)",
+            "options": ["postcut", "postcut_rand", "drop_mode", "verbose"],
+            "option_overrides": {
+                "postcut": {
+                    "default": 12,
+                    "prompt": "Postcut (packets to drop after I-frame removal)",
+                    "help": "How many packets to drop after removing each I-frame. Higher = stronger smear (try 10-20 for extreme)."
+                }
+            }
+        },
+        "avidemux_style_all": {
+            "name": "Avidemux-Style All-In-One",
+            "category": "avidemux",
+            "desc": "One-shot: convert → concat → packet surgery → deliver. Can output AVI or MP4 with audio.",
+            "use_case": "Easiest way to get strong Avidemux-style mosh. Handles everything automatically.",
+            "inputs": "multiple",
+            "outputs": ".avi or .mp4",
+            "options": ["mosh_q", "gop", "hold_sec", "postcut", "postcut_rand", "drop_mode", "codec", "audio_from", "verbose"],
+            "option_overrides": {
+                "postcut": {
+                    "default": 12,
+                    "prompt": "Postcut (packets to drop after I-frame removal)",
+                    "help": "How many packets to drop after removing each I-frame. Higher = stronger smear (try 10-20 for extreme)."
+                }
+            }
+        },
+        "mosh_zoom_oneclip": {
+            "name": "Melting Zoom (Single Clip)",
+            "category": "creative",
+            "desc": "Artificial zoom + datamosh on a single clip. Freezes a frame, generates zoom ramp, forces P-cascade for 'melting zoom' effect.",
+            "use_case": "Create trippy zoom effects that melt/smear. Great for beat drops, time stretching, or psychedelic visuals.",
+            "inputs": "single",
+            "outputs": ".mp4",
+            "options": ["fps", "width", "zoom_q", "zoom_t", "zoom_dur", "zoom_tail", "zoom_direction", "deliver_crf"]
+        },
+        "aviglitch_mosh": {
+            "name": "AviGlitch-Style Packet Mosh",
+            "category": "advanced",
+            "desc": "Direct AVI packet manipulation using PyAV. Classic drop/dup mode plus manual bloom pivot control. No re-encoding.",
+            "use_case": "Classic AviGlitch workflow without Ruby, or bloom burst insertion when you already know pivot frame index.",
+            "inputs": "single",
+            "outputs": ".avi",
+            "options": [
+                "ag_effect",
+                "aviglitch_prep",
+                "prep_q",
+                "prep_gop_ag",
+                "prep_fps",
+                "drop_start",
+                "drop_end",
+                "dup_at",
+                "dup_count",
+                "pivot_frame",
+                "repeat_count",
+                "kill_ratio",
+                "ag_keep_audio",
+                "verbose",
+            ]
+        },
+        "randomizer": {
+            "name": "Video Randomizer",
+            "category": "creative",
+            "desc": "Splits video into chunks of specified length and randomly reorders them. Creates glitchy, non-linear temporal effects.",
+            "use_case": "Create chaotic, disjointed video sequences. Great for experimental/glitch aesthetics and abstract visuals.",
+            "inputs": "single",
+            "outputs": ".mp4/.avi",
+            "options": ["chunk_length", "codec", "verbose"]
+        }
     }
-}
 
-# Option metadata with detailed help
-OPTION_INFO = {
-    "gop": {
-        "type": "int",
-        "default": 250,
-        "prompt": "GOP size (keyframe interval)",
-        "help": "Larger = fewer I-frames = stronger mosh. For MPEG-4, cap around 600. Try 300-600 for strong effects."
-    },
-    "codec": {
-        "type": "choice",
-        "default": "libx264",
-        "choices": ["libx264", "h264_videotoolbox", "mpeg4"],
-        "prompt": "Video codec for final encode",
-        "help": "libx264 (software, best quality), h264_videotoolbox (macOS hardware), mpeg4 (MPEG-4 ASP)"
-    },
-    "postcut": {
-        "type": "int",
-        "default": 8,
-        "prompt": "Postcut (frames to drop after each removed I-frame)",
-        "help": "How many frames/packets to drop after removing a keyframe. Higher = stronger smear (try 8-14)."
-    },
-    "postcut_rand": {
-        "type": "range",
-        "default": None,
-        "prompt": "Random postcut range (e.g. 6:12)",
-        "help": "Randomize postcut per boundary. Format: MIN:MAX. Overrides --postcut. Adds unpredictability."
-    },
-    "drop_mode": {
-        "type": "choice",
-        "default": "all_after_first",
-        "choices": ["all_after_first", "boundaries_only"],
-        "prompt": "Drop mode strategy",
-        "help": "all_after_first: remove ALL I-frames after first (max smear). boundaries_only: only at clip joins."
-    },
-    "mosh_q": {
-        "type": "int",
-        "default": 10,
-        "prompt": "Mosh quality (Xvid/MPEG-4 quantizer)",
-        "help": "1-31. Higher = blockier/grainier = more datamosh artifact. Try 10-14 for strong effects."
-    },
-    "postcut": {
-        "type": "int",
-        "default": 12,
-        "prompt": "Postcut (packets to drop after I-frame removal)",
-        "help": "How many packets to drop after removing each I-frame. Higher = stronger smear (try 10-20 for extreme)."
-    },
-    "hold_sec": {
-        "type": "float",
-        "default": 0.0,
-        "prompt": "Smear hold duration (seconds)",
-        "help": "Duplicate last frame of each clip (except final). Creates 'freeze smear' at joins. Try 0.5-1.5."
-    },
-    "audio_from": {
-        "type": "file",
-        "default": None,
-        "prompt": "Audio source file (optional)",
-        "help": "Path to file to extract audio from. Only for avidemux_style_all when outputting MP4."
-    },
-    "image": {
-        "type": "file",
-        "default": None,
-        "prompt": "Still image path",
-        "help": "Path to image file (jpg, png) for video↔image mosh algorithms."
-    },
-    "img_dur": {
-        "type": "float",
-        "default": 3.0,
-        "prompt": "Image motion clip duration (seconds)",
-        "help": "How long the generated image motion clip should be. Try 3-10 seconds."
-    },
-    "kb_mode": {
-        "type": "choice",
-        "default": "rotate",
-        "choices": ["rotate", "zoom_in"],
-        "prompt": "Image motion style",
-        "help": "rotate: gentle rotation, zoom_in: slow zoom effect. Affects how the image 'moves'."
-    },
-    "color_preset": {
-        "type": "choice",
-        "default": "urban_grit",
-        "choices": ["urban_grit", "dirty_glass", "faded_teal_amber", "hard_shadow_split"],
-        "prompt": "Color preset",
-        "help": "Preset style inspired by docs examples."
-    },
-    "fx_strength": {
-        "type": "float",
-        "default": 1.0,
-        "prompt": "Effect strength (0.0-2.0)",
-        "help": "1.0 = preset default. Lower for subtle grade, higher for stronger look."
-    },
-    "grain": {
-        "type": "int",
-        "default": -1,
-        "prompt": "Grain amount (0-60, or -1 for preset default)",
-        "help": "Use -1 to let the preset decide. Higher values add more film-like noise."
-    },
-    "vignette": {
-        "type": "float",
-        "default": -1.0,
-        "prompt": "Vignette strength (0.0-2.0, or -1 for preset default)",
-        "help": "Darkens edges. Use -1 to keep preset behavior."
-    },
-    "ghost": {
-        "type": "float",
-        "default": -1.0,
-        "prompt": "Ghosting blend (0.0-1.0, or -1 for preset default)",
-        "help": "Adds subtle frame trails. Use -1 to keep preset behavior."
-    },
-    "keep_audio": {
-        "type": "bool",
-        "default": True,
-        "prompt": "Keep audio track",
-        "help": "If disabled, output video will be silent."
-    },
-    "blend_mode": {
-        "type": "choice",
-        "default": "overlay",
-        "choices": ["overlay", "add", "subtract", "darken", "lighten"],
-        "prompt": "Blend mode",
-        "help": "Overlay uses classic compositing; add/subtract/darken/lighten create stronger double-exposure effects."
-    },
-    "opacity": {
-        "type": "float",
-        "default": 0.5,
-        "prompt": "Opacity for clip B (0..1)",
-        "help": "Weighting of the second clip. 0.5 = 50/50 blend."
-    },
-    "descartes": {
-        "type": "bool",
-        "default": False,
-        "prompt": "Descartes mode (blend all clips in videosrc; output one per clip)",
-        "help": "Uses all clips in videosrc and writes a numbered output per clip."
-    },
-    "verbose": {
-        "type": "bool",
-        "default": False,
-        "prompt": "Verbose output",
-        "help": "Show detailed FFmpeg logs during processing."
-    },
-    "fps": {
-        "type": "int",
-        "default": 30,
-        "prompt": "Target framerate",
-        "help": "Normalize both clips to this FPS. Standard rates: 24, 30, 60."
-    },
-    "width": {
-        "type": "int",
-        "default": 1280,
-        "prompt": "Target width (height auto-scaled)",
-        "help": "Width in pixels. Height maintains aspect ratio. Common: 1280, 1920."
-    },
-    "gop_len": {
-        "type": "int",
-        "default": 9999,
-        "prompt": "GOP length (max keyframe distance)",
-        "help": "Very high value = single long GOP = maximum smear. Use 9999 for extreme effects."
-    },
-    "no_iframe_window": {
-        "type": "float",
-        "default": 2.0,
-        "prompt": "I-frame strip window duration (seconds)",
-        "help": "How long after join to strip I-frames. Longer = longer melting effect. Try 2.0-4.0 for extreme."
-    },
-    "repeat_boost": {
-        "type": "float",
-        "default": 0.5,
-        "prompt": "Repeat segment duration (seconds)",
-        "help": "Duration after join to repeat for smear boost. Amplifies the transition. Try 0.3-1.0."
-    },
-    "repeat_times": {
-        "type": "int",
-        "default": 5,
-        "prompt": "Number of repeat cycles",
-        "help": "How many times to repeat the boost segment. More = heavier smear. Try 5-10 for extreme."
-    },
-    "zoom_q": {
-        "type": "int",
-        "default": 3,
-        "prompt": "MPEG-4 quantizer for intermediates",
-        "help": "1-31. Lower = higher quality for zoom concat. Use 3-5 for clean zoom, 8-12 for grainier effect."
-    },
-    "zoom_t": {
-        "type": "str",
-        "default": "00:00:05.000",
-        "prompt": "Mosh start timestamp (HH:MM:SS.mmm or seconds)",
-        "help": "When to start the zoom effect. Format: HH:MM:SS.mmm or just seconds (e.g. '5' or '5.5')."
-    },
-    "zoom_dur": {
-        "type": "float",
-        "default": 1.0,
-        "prompt": "Zoom duration (seconds)",
-        "help": "How long the zoom ramp lasts. Try 0.5-2.0 seconds."
-    },
-    "zoom_tail": {
-        "type": "float",
-        "default": 1.0,
-        "prompt": "P-only tail duration (seconds)",
-        "help": "How long the P-cascade continues after zoom. Longer = more smear. Try 1.0-3.0."
-    },
-    "zoom_direction": {
-        "type": "choice",
-        "default": "out",
-        "choices": ["out", "in"],
-        "prompt": "Zoom direction",
-        "help": "out: push in (image gets bigger), in: pull out (image gets smaller)"
-    },
-    "deliver_crf": {
-        "type": "int",
-        "default": 18,
-        "prompt": "Final H.264 CRF (quality)",
-        "help": "Lower = higher quality for final MP4. 18 (high), 23 (balanced), 28 (smaller file)."
-    },
-    "h264_crf": {
-        "type": "int",
-        "default": 23,
-        "prompt": "H.264 CRF (quality)",
-        "help": "Lower = higher quality. 18 (visually lossless), 23 (balanced), 28 (smaller file). Try 20-25."
-    },
-    "vbitrate": {
-        "type": "str",
-        "default": "3M",
-        "prompt": "Video bitrate (e.g. 3M, 5M)",
-        "help": "Bitrate for MPEG-TS encoding. Higher = better quality, larger file. Use 3M-8M."
-    },
-    "keyint": {
-        "type": "int",
-        "default": 240,
-        "prompt": "Keyframe interval (GOP length)",
-        "help": "Frames between keyframes. Higher = longer GOP = stronger mosh potential. Try 120-500."
-    },
-    "start_ms": {
-        "type": "int",
-        "default": 5000,
-        "prompt": "Corruption start time (milliseconds)",
-        "help": "When to start dropping TS packets. E.g. 5000 = 5 seconds into video."
-    },
-    "duration_ms": {
-        "type": "int",
-        "default": 1200,
-        "prompt": "Corruption duration (milliseconds)",
-        "help": "How long to drop packets. Longer = more extreme corruption. Try 800-2000ms."
-    },
-    "ts_pps": {
-        "type": "str",
-        "default": "auto",
-        "prompt": "TS packets per second (auto or number)",
-        "help": "'auto' derives from bitrate. Or specify numeric value for manual control."
-    },
-    "ts_pid": {
-        "type": "str",
-        "default": None,
-        "prompt": "Target PID (hex like 0x100, or leave empty)",
-        "help": "Optional: drop only this video PID to preserve audio. Leave empty to drop all packets."
-    },
-    "ts_format": {
-        "type": "choice",
-        "default": "mp4",
-        "choices": ["mp4", "avi"],
-        "prompt": "Output format",
-        "help": "mp4: codec-copy remux (fast, preserves corruption). avi: Xvid re-encode (mosh-friendly, blockier)."
-    },
-    "xvid_q": {
-        "type": "int",
-        "default": 3,
-        "prompt": "Xvid quality (for AVI output)",
-        "help": "1-31, lower=better. Use 3-5 for clean, 8-12 for grainier effect. Only applies to AVI output."
-    },
-    "aviglitch_prep": {
-        "type": "bool",
-        "default": False,
-        "prompt": "Auto-convert to MPEG-4 ASP AVI first?",
-        "help": "Convert input to glitch-friendly format (MPEG-4 ASP, long GOP, no B-frames) before moshing."
-    },
-    "ag_effect": {
-        "type": "choice",
-        "default": "classic",
-        "choices": ["classic", "bloom"],
-        "prompt": "AviGlitch effect mode",
-        "help": "classic: I-frame drop / P-frame duplication. bloom: pivot-frame burst insertion."
-    },
-    "prep_q": {
-        "type": "int",
-        "default": 3,
-        "prompt": "Prep quality (1-31, lower=better)",
-        "help": "Quality for prep conversion. 3 (high quality), 5 (balanced), 8-12 (grainier/blockier)."
-    },
-    "prep_gop_ag": {
-        "type": "int",
-        "default": 300,
-        "prompt": "Prep GOP length",
-        "help": "Keyframe interval for prep. Higher = longer GOP = stronger mosh potential. Try 300-600."
-    },
-    "prep_fps": {
-        "type": "int",
-        "default": 24,
-        "prompt": "Prep FPS",
-        "help": "Frame rate for prep conversion. Common: 24, 30, 60."
-    },
-    "drop_start": {
-        "type": "optional_float",
-        "default": None,
-        "prompt": "I-frame drop window start (seconds)",
-        "help": "Start time to remove keyframes (creates smear). Leave empty to skip I-frame removal."
-    },
-    "drop_end": {
-        "type": "optional_float",
-        "default": None,
-        "prompt": "I-frame drop window end (seconds)",
-        "help": "End time for keyframe removal window. Must be > drop_start."
-    },
-    "dup_at": {
-        "type": "optional_float",
-        "default": None,
-        "prompt": "P-frame duplication start time (seconds)",
-        "help": "When to start duplicating P-frames (creates bloom/echo). Leave empty to skip duplication."
-    },
-    "dup_count": {
-        "type": "int",
-        "default": 12,
-        "prompt": "Number of P-frame duplicates",
-        "help": "How many times to duplicate the P-frame. More = stronger bloom. Try 8-20."
-    },
-    "pivot_frame": {
-        "type": "int",
-        "default": 0,
-        "prompt": "Bloom pivot frame chunk index",
-        "help": "Frame-chunk index to duplicate in bloom mode. Values outside range are safely clamped."
-    },
-    "repeat_count": {
-        "type": "int",
-        "default": 12,
-        "prompt": "Bloom repeat count",
-        "help": "How many duplicates of the pivot chunk to insert."
-    },
-    "kill_ratio": {
-        "type": "float",
-        "default": 1.0,
-        "prompt": "Bloom kill ratio",
-        "help": "Keeps chunks where size <= max_frame_size * ratio before bloom insertion."
-    },
-    "ag_keep_audio": {
-        "type": "bool",
-        "default": False,
-        "prompt": "Keep audio in bloom output",
-        "help": "If enabled, passes --keep-audio to bloom mode."
-    },
-    "chunk_length": {
-        "type": "float",
-        "default": 2.0,
-        "prompt": "Chunk length (seconds)",
-        "help": "Duration of each video chunk to randomize. Shorter = more chaotic. Try 0.5-3.0 seconds."
+    # Option metadata with detailed help
+    option_info = {
+        "gop": {
+            "type": "int",
+            "default": 250,
+            "prompt": "GOP size (keyframe interval)",
+            "help": "Larger = fewer I-frames = stronger mosh. For MPEG-4, cap around 600. Try 300-600 for strong effects."
+        },
+        "codec": {
+            "type": "choice",
+            "default": "libx264",
+            "choices": ["libx264", "h264_videotoolbox", "mpeg4"],
+            "prompt": "Video codec for final encode",
+            "help": "libx264 (software, best quality), h264_videotoolbox (macOS hardware), mpeg4 (MPEG-4 ASP)"
+        },
+        "postcut": {
+            "type": "int",
+            "default": 8,
+            "prompt": "Postcut (frames to drop after each removed I-frame)",
+            "help": "How many frames/packets to drop after removing a keyframe. Higher = stronger smear (try 8-14)."
+        },
+        "postcut_rand": {
+            "type": "range",
+            "default": None,
+            "prompt": "Random postcut range (e.g. 6:12)",
+            "help": "Randomize postcut per boundary. Format: MIN:MAX. Overrides --postcut. Adds unpredictability."
+        },
+        "drop_mode": {
+            "type": "choice",
+            "default": "all_after_first",
+            "choices": ["all_after_first", "boundaries_only"],
+            "prompt": "Drop mode strategy",
+            "help": "all_after_first: remove ALL I-frames after first (max smear). boundaries_only: only at clip joins."
+        },
+        "mosh_q": {
+            "type": "int",
+            "default": 10,
+            "prompt": "Mosh quality (Xvid/MPEG-4 quantizer)",
+            "help": "1-31. Higher = blockier/grainier = more datamosh artifact. Try 10-14 for strong effects."
+        },
+        "hold_sec": {
+            "type": "float",
+            "default": 0.0,
+            "prompt": "Smear hold duration (seconds)",
+            "help": "Duplicate last frame of each clip (except final). Creates 'freeze smear' at joins. Try 0.5-1.5."
+        },
+        "audio_from": {
+            "type": "file",
+            "default": None,
+            "prompt": "Audio source file (optional)",
+            "help": "Path to file to extract audio from. Only for avidemux_style_all when outputting MP4."
+        },
+        "image": {
+            "type": "file",
+            "default": None,
+            "prompt": "Still image path",
+            "help": "Path to image file (jpg, png) for video↔image mosh algorithms."
+        },
+        "img_dur": {
+            "type": "float",
+            "default": 3.0,
+            "prompt": "Image motion clip duration (seconds)",
+            "help": "How long the generated image motion clip should be. Try 3-10 seconds."
+        },
+        "kb_mode": {
+            "type": "choice",
+            "default": "rotate",
+            "choices": ["rotate", "zoom_in"],
+            "prompt": "Image motion style",
+            "help": "rotate: gentle rotation, zoom_in: slow zoom effect. Affects how the image 'moves'."
+        },
+        "color_preset": {
+            "type": "choice",
+            "default": "urban_grit",
+            "choices": ["urban_grit", "dirty_glass", "faded_teal_amber", "hard_shadow_split"],
+            "prompt": "Color preset",
+            "help": "Preset style inspired by docs examples."
+        },
+        "fx_strength": {
+            "type": "float",
+            "default": 1.0,
+            "prompt": "Effect strength (0.0-2.0)",
+            "help": "1.0 = preset default. Lower for subtle grade, higher for stronger look."
+        },
+        "grain": {
+            "type": "int",
+            "default": -1,
+            "prompt": "Grain amount (0-60, or -1 for preset default)",
+            "help": "Use -1 to let the preset decide. Higher values add more film-like noise."
+        },
+        "vignette": {
+            "type": "float",
+            "default": -1.0,
+            "prompt": "Vignette strength (0.0-2.0, or -1 for preset default)",
+            "help": "Darkens edges. Use -1 to keep preset behavior."
+        },
+        "ghost": {
+            "type": "float",
+            "default": -1.0,
+            "prompt": "Ghosting blend (0.0-1.0, or -1 for preset default)",
+            "help": "Adds subtle frame trails. Use -1 to keep preset behavior."
+        },
+        "keep_audio": {
+            "type": "bool",
+            "default": True,
+            "prompt": "Keep audio track",
+            "help": "If disabled, output video will be silent."
+        },
+        "blend_mode": {
+            "type": "choice",
+            "default": "overlay",
+            "choices": ["overlay", "add", "subtract", "darken", "lighten"],
+            "prompt": "Blend mode",
+            "help": "Overlay uses classic compositing; add/subtract/darken/lighten create stronger double-exposure effects."
+        },
+        "opacity": {
+            "type": "float",
+            "default": 0.5,
+            "prompt": "Opacity for clip B (0..1)",
+            "help": "Weighting of the second clip. 0.5 = 50/50 blend."
+        },
+        "descartes": {
+            "type": "bool",
+            "default": False,
+            "prompt": "Descartes mode (blend all clips in videosrc; output one per clip)",
+            "help": "Uses all clips in videosrc and writes a numbered output per clip."
+        },
+        "verbose": {
+            "type": "bool",
+            "default": False,
+            "prompt": "Verbose output",
+            "help": "Show detailed FFmpeg logs during processing."
+        },
+        "fps": {
+            "type": "int",
+            "default": 30,
+            "prompt": "Target framerate",
+            "help": "Normalize both clips to this FPS. Standard rates: 24, 30, 60."
+        },
+        "width": {
+            "type": "int",
+            "default": 1280,
+            "prompt": "Target width (height auto-scaled)",
+            "help": "Width in pixels. Height maintains aspect ratio. Common: 1280, 1920."
+        },
+        "gop_len": {
+            "type": "int",
+            "default": 9999,
+            "prompt": "GOP length (max keyframe distance)",
+            "help": "Very high value = single long GOP = maximum smear. Use 9999 for extreme effects."
+        },
+        "no_iframe_window": {
+            "type": "float",
+            "default": 2.0,
+            "prompt": "I-frame strip window duration (seconds)",
+            "help": "How long after join to strip I-frames. Longer = longer melting effect. Try 2.0-4.0 for extreme."
+        },
+        "repeat_boost": {
+            "type": "float",
+            "default": 0.5,
+            "prompt": "Repeat segment duration (seconds)",
+            "help": "Duration after join to repeat for smear boost. Amplifies the transition. Try 0.3-1.0."
+        },
+        "repeat_times": {
+            "type": "int",
+            "default": 5,
+            "prompt": "Number of repeat cycles",
+            "help": "How many times to repeat the boost segment. More = heavier smear. Try 5-10 for extreme."
+        },
+        "zoom_q": {
+            "type": "int",
+            "default": 3,
+            "prompt": "MPEG-4 quantizer for intermediates",
+            "help": "1-31. Lower = higher quality for zoom concat. Use 3-5 for clean zoom, 8-12 for grainier effect."
+        },
+        "zoom_t": {
+            "type": "str",
+            "default": "00:00:05.000",
+            "prompt": "Mosh start timestamp (HH:MM:SS.mmm or seconds)",
+            "help": "When to start the zoom effect. Format: HH:MM:SS.mmm or just seconds (e.g. '5' or '5.5')."
+        },
+        "zoom_dur": {
+            "type": "float",
+            "default": 1.0,
+            "prompt": "Zoom duration (seconds)",
+            "help": "How long the zoom ramp lasts. Try 0.5-2.0 seconds."
+        },
+        "zoom_tail": {
+            "type": "float",
+            "default": 1.0,
+            "prompt": "P-only tail duration (seconds)",
+            "help": "How long the P-cascade continues after zoom. Longer = more smear. Try 1.0-3.0."
+        },
+        "zoom_direction": {
+            "type": "choice",
+            "default": "out",
+            "choices": ["out", "in"],
+            "prompt": "Zoom direction",
+            "help": "out: push in (image gets bigger), in: pull out (image gets smaller)"
+        },
+        "deliver_crf": {
+            "type": "int",
+            "default": 18,
+            "prompt": "Final H.264 CRF (quality)",
+            "help": "Lower = higher quality for final MP4. 18 (high), 23 (balanced), 28 (smaller file)."
+        },
+        "h264_crf": {
+            "type": "int",
+            "default": 23,
+            "prompt": "H.264 CRF (quality)",
+            "help": "Lower = higher quality. 18 (visually lossless), 23 (balanced), 28 (smaller file). Try 20-25."
+        },
+        "vbitrate": {
+            "type": "str",
+            "default": "3M",
+            "prompt": "Video bitrate (e.g. 3M, 5M)",
+            "help": "Bitrate for MPEG-TS encoding. Higher = better quality, larger file. Use 3M-8M."
+        },
+        "keyint": {
+            "type": "int",
+            "default": 240,
+            "prompt": "Keyframe interval (GOP length)",
+            "help": "Frames between keyframes. Higher = longer GOP = stronger mosh potential. Try 120-500."
+        },
+        "start_ms": {
+            "type": "int",
+            "default": 5000,
+            "prompt": "Corruption start time (milliseconds)",
+            "help": "When to start dropping TS packets. E.g. 5000 = 5 seconds into video."
+        },
+        "duration_ms": {
+            "type": "int",
+            "default": 1200,
+            "prompt": "Corruption duration (milliseconds)",
+            "help": "How long to drop packets. Longer = more extreme corruption. Try 800-2000ms."
+        },
+        "ts_pps": {
+            "type": "str",
+            "default": "auto",
+            "prompt": "TS packets per second (auto or number)",
+            "help": "'auto' derives from bitrate. Or specify numeric value for manual control."
+        },
+        "ts_pid": {
+            "type": "str",
+            "default": None,
+            "prompt": "Target PID (hex like 0x100, or leave empty)",
+            "help": "Optional: drop only this video PID to preserve audio. Leave empty to drop all packets."
+        },
+        "ts_format": {
+            "type": "choice",
+            "default": "mp4",
+            "choices": ["mp4", "avi"],
+            "prompt": "Output format",
+            "help": "mp4: codec-copy remux (fast, preserves corruption). avi: Xvid re-encode (mosh-friendly, blockier)."
+        },
+        "xvid_q": {
+            "type": "int",
+            "default": 3,
+            "prompt": "Xvid quality (for AVI output)",
+            "help": "1-31, lower=better. Use 3-5 for clean, 8-12 for grainier effect. Only applies to AVI output."
+        },
+        "aviglitch_prep": {
+            "type": "bool",
+            "default": False,
+            "prompt": "Auto-convert to MPEG-4 ASP AVI first?",
+            "help": "Convert input to glitch-friendly format (MPEG-4 ASP, long GOP, no B-frames) before moshing."
+        },
+        "ag_effect": {
+            "type": "choice",
+            "default": "classic",
+            "choices": ["classic", "bloom"],
+            "prompt": "AviGlitch effect mode",
+            "help": "classic: I-frame drop / P-frame duplication. bloom: pivot-frame burst insertion."
+        },
+        "prep_q": {
+            "type": "int",
+            "default": 3,
+            "prompt": "Prep quality (1-31, lower=better)",
+            "help": "Quality for prep conversion. 3 (high quality), 5 (balanced), 8-12 (grainier/blockier)."
+        },
+        "prep_gop_ag": {
+            "type": "int",
+            "default": 300,
+            "prompt": "Prep GOP length",
+            "help": "Keyframe interval for prep. Higher = longer GOP = stronger mosh potential. Try 300-600."
+        },
+        "prep_fps": {
+            "type": "int",
+            "default": 24,
+            "prompt": "Prep FPS",
+            "help": "Frame rate for prep conversion. Common: 24, 30, 60."
+        },
+        "drop_start": {
+            "type": "optional_float",
+            "default": None,
+            "prompt": "I-frame drop window start (seconds)",
+            "help": "Start time to remove keyframes (creates smear). Leave empty to skip I-frame removal."
+        },
+        "drop_end": {
+            "type": "optional_float",
+            "default": None,
+            "prompt": "I-frame drop window end (seconds)",
+            "help": "End time for keyframe removal window. Must be > drop_start."
+        },
+        "dup_at": {
+            "type": "optional_float",
+            "default": None,
+            "prompt": "P-frame duplication start time (seconds)",
+            "help": "When to start duplicating P-frames (creates bloom/echo). Leave empty to skip duplication."
+        },
+        "dup_count": {
+            "type": "int",
+            "default": 12,
+            "prompt": "Number of P-frame duplicates",
+            "help": "How many times to duplicate the P-frame. More = stronger bloom. Try 8-20."
+        },
+        "pivot_frame": {
+            "type": "int",
+            "default": 0,
+            "prompt": "Bloom pivot frame chunk index",
+            "help": "Frame-chunk index to duplicate in bloom mode. Values outside range are safely clamped."
+        },
+        "repeat_count": {
+            "type": "int",
+            "default": 12,
+            "prompt": "Bloom repeat count",
+            "help": "How many duplicates of the pivot chunk to insert."
+        },
+        "kill_ratio": {
+            "type": "float",
+            "default": 1.0,
+            "prompt": "Bloom kill ratio",
+            "help": "Keeps chunks where size <= max_frame_size * ratio before bloom insertion."
+        },
+        "ag_keep_audio": {
+            "type": "bool",
+            "default": False,
+            "prompt": "Keep audio in bloom output",
+            "help": "If enabled, passes --keep-audio to bloom mode."
+        },
+        "chunk_length": {
+            "type": "float",
+            "default": 2.0,
+            "prompt": "Chunk length (seconds)",
+            "help": "Duration of each video chunk to randomize. Shorter = more chaotic. Try 0.5-3.0 seconds."
+        }
     }
+    option_info = {
+        name: OptInfo(
+            type=spec["type"],
+            default=spec["default"],
+            prompt=spec["prompt"],
+            help=spec.get("help", ""),
+            choices=tuple(spec.get("choices", ())),
+        )
+        for name, spec in option_info.items()
+    }
+    return algorithm_info, option_info
+
+
+def _load_metadata():
+    # The two metadata tables are hundreds of dict-literal opcodes executed on
+    # every interpreter start; unpickling them from a cache is one C-level load.
+    # The stamp ties the cache to this file's mtime, so edits invalidate it.
+    import pickle
+
+    stamp = ("v1", os.path.getmtime(__file__))
+    try:
+        with open(_META_CACHE_PATH, "rb") as handle:
+            payload = pickle.load(handle)
+        if payload.get("stamp") == stamp:
+            return payload["algorithms"], payload["options"]
+    except Exception:
+        pass
+
+    algorithms, options = _build_metadata()
+    try:
+        os.makedirs(os.path.dirname(_META_CACHE_PATH), exist_ok=True)
+        with open(_META_CACHE_PATH, "wb") as handle:
+            pickle.dump(
+                {"stamp": stamp, "algorithms": algorithms, "options": options},
+                handle,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+    except OSError:
+        pass  # cache is best-effort
+    return algorithms, options
+
+
+ALGORITHM_INFO, OPTION_INFO = _load_metadata()
+
+# Category grouping never changes at runtime, so build it once here instead of
+# on every select_algorithm call / "back to menu" pass.
+_CATEGORY_ORDER = ("analysis", "basic", "advanced", "creative", "avidemux")
+_CATEGORY_NAMES = {
+    "analysis": "🔍 Analysis Tools",
+    "basic": "⚡ Basic Datamosh",
+    "advanced": "🎯 Advanced Control",
+    "creative": "🎨 Creative Effects",
+    "avidemux": "💥 Avidemux-Style (Strongest)"
+}
+# config key → CLI flag for build_command's tool-specific paths; keys absent
+# from a map fall back to --{key}. Boolean-only switches live in _BOOL_FLAGS.
+_FLAG_MAP_ZOOM = {
+    "zoom_q": "--q",
+    "zoom_t": "--t",
+    "zoom_dur": "--zoom-dur",
+    "zoom_tail": "--tail",
+    "zoom_direction": "--zoom-direction",
+    "deliver_crf": "--deliver-crf",
+}
+_FLAG_MAP_AVIGLITCH = {
+    "prep_q": "--prep-q",
+    "prep_gop_ag": "--prep-gop",
+    "prep_fps": "--prep-fps",
 }
+_FLAG_MAP_MAIN = {
+    "postcut_rand": "--postcut-rand",
+    "kb_mode": "--kb",
+}
+_BOOL_FLAGS = {
+    "verbose": "-v",
+    "aviglitch_prep": "--prep",
+}
+# aviglitch options emitted as validated pairs after the generic loop
+_AVIGLITCH_DEFERRED = frozenset({
+    "ag_effect",
+    "drop_start",
+    "drop_end",
+    "dup_at",
+    "dup_count",
+    "pivot_frame",
+    "repeat_count",
+    "kill_ratio",
+    "ag_keep_audio",
+})
+
+# Default output extension per category; anything unlisted suggests .mp4.
+_CATEGORY_DEFAULT_EXT = {"avidemux": ".avi", "analysis": ".csv"}
+_CATEGORIZED = {cat: [] for cat in _CATEGORY_ORDER}
+for _algo_id, _info in ALGORITHM_INFO.items():
+    _CATEGORIZED[_info["category"]].append((_algo_id, _info))
+_FLAT_CHOICES = [algo_id for cat in _CATEGORY_ORDER for algo_id, _ in _CATEGORIZED[cat]]
+
+# Clear screen + scrollback, cursor home. Writing this directly avoids a
+# fork/exec of `clear`/`cls` on every screen transition.
+_CLEAR_SEQ = "\x1b[H\x1b[2J\x1b[3J"
+
+if os.name == "nt":
+    # Enables VT processing on modern Windows consoles so ANSI sequences work.
+    os.system("")
 
 def clear_screen():
     """Clear terminal screen."""
-    os.system('clear' if os.name != 'nt' else 'cls')
+    if sys.stdout.isatty():
+        sys.stdout.write(_CLEAR_SEQ)
+        sys.stdout.flush()
 
 def ensure_tty_newline():
     """Ensure Enter sends a newline on POSIX ttys (fixes stray ^M input)."""
@@ -515,42 +648,57 @@ def print_section(title: str):
     print(f"  {title}")
     print(f"{'─'*70}\n")
 
-def scan_videos(dirpath: str) -> List[str]:
-    """Scan directory for video files."""
-    if not os.path.isdir(dirpath):
-        return []
+@functools.lru_cache(maxsize=8)
+def _scan_videos_cached(dirpath: str, mtime_ns: int) -> Tuple[Tuple[str, int], ...]:
+    # os.scandir gives name, type and stat from one directory read, so this is
+    # one stat per entry (vs. listdir + isfile + getsize = three).
     videos = []
-    for name in sorted(os.listdir(dirpath)):
-        p = os.path.join(dirpath, name)
-        if os.path.isfile(p) and name.lower().endswith(VIDEO_EXTS):
-            videos.append(p)
-    return videos
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            # splitext + set probe: no full-name lowercasing, no 7-way endswith
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext in _VIDEO_EXT_SET and entry.is_file():
+                videos.append((entry.path, entry.stat().st_size))
+    videos.sort()
+    return tuple(videos)
+
+def scan_videos(dirpath: str) -> List[Tuple[str, int]]:
+    """Scan directory for video files. Returns sorted (path, size_bytes) pairs."""
+    try:
+        mtime_ns = os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return []
+    # cache key includes the directory mtime, so edits invalidate naturally
+    return list(_scan_videos_cached(dirpath, mtime_ns))
 
 def prompt_choice(prompt: str, choices: List[str], default: Optional[str] = None, show_help: bool = True) -> str:
     """Present menu of choices, return selected."""
-    while True:
-        print(f"\n{prompt}")
-        for i, choice in enumerate(choices, 1):
-            marker = " (default)" if default and choice == default else ""
-            print(f"  [{i}] {choice}{marker}")
-        if default:
-            print(f"\nPress ENTER for default ({default}), or enter number:")
-        else:
-            print("\nEnter number:")
+    # Build and emit the menu once; retries only print a short error line
+    # instead of repainting the whole screen.
+    menu_lines = [f"\n{prompt}"]
+    for i, choice in enumerate(choices, 1):
+        marker = " (default)" if default and choice == default else ""
+        menu_lines.append(f"  [{i}] {choice}{marker}")
+    if default:
+        menu_lines.append(f"\nPress ENTER for default ({default}), or enter number:")
+    else:
+        menu_lines.append("\nEnter number:")
+    sys.stdout.write("\n".join(menu_lines) + "\n")
+    sys.stdout.flush()
 
+    err_range = f"❌ Invalid choice. Enter 1-{len(choices)}"
+    while True:
         inp = input("> ").strip()
         if not inp and default:
             return default
         try:
             idx = int(inp) - 1
-            if 0 <= idx < len(choices):
-                return choices[idx]
-            else:
-                print(f"❌ Invalid choice. Enter 1-{len(choices)}")
-        except KeyboardInterrupt:
-            raise
         except ValueError:
             print("❌ Please enter a number")
+            continue
+        if 0 <= idx < len(choices):
+            return choices[idx]
+        print(err_range)
 
 def prompt_text(prompt: str, default: Optional[str] = None, help_text: Optional[str] = None) -> str:
     """Prompt for text input."""
@@ -568,25 +716,22 @@ def prompt_text(prompt: str, default: Optional[str] = None, help_text: Optional[
 
 def prompt_int(prompt: str, default: int, help_text: Optional[str] = None) -> int:
     """Prompt for integer input."""
+    # help/prompt are printed once; a bad entry re-asks on a single line
+    result = prompt_text(prompt, str(default), help_text)
     while True:
-        result = prompt_text(prompt, str(default), help_text)
         try:
             return int(result)
-        except KeyboardInterrupt:
-            raise
         except ValueError:
-            print("❌ Please enter a valid number")
+            result = input("❌ Please enter a valid number. Try again: ").strip() or str(default)
 
 def prompt_float(prompt: str, default: float, help_text: Optional[str] = None) -> float:
     """Prompt for float input."""
+    result = prompt_text(prompt, str(default), help_text)
     while True:
-        result = prompt_text(prompt, str(default), help_text)
         try:
             return float(result)
-        except KeyboardInterrupt:
-            raise
         except ValueError:
-            print("❌ Please enter a valid number")
+            result = input("❌ Please enter a valid number. Try again: ").strip() or str(default)
 
 def prompt_bool(prompt: str, default: bool = False) -> bool:
     """Prompt for yes/no."""
@@ -599,116 +744,82 @@ def select_algorithm() -> str:
     clear_screen()
     print_header("d4t4m0sh Interactive Wizard")
 
-    # Group by category
-    categories = {
-        "analysis": [],
-        "basic": [],
-        "advanced": [],
-        "creative": [],
-        "avidemux": []
-    }
-
-    for algo_id, info in ALGORITHM_INFO.items():
-        categories[info["category"]].append((algo_id, info))
-
-    print("📋 Available Algorithms (grouped by category):\n")
-
-    all_choices = []
-    category_names = {
-        "analysis": "🔍 Analysis Tools",
-        "basic": "⚡ Basic Datamosh",
-        "advanced": "🎯 Advanced Control",
-        "creative": "🎨 Creative Effects",
-        "avidemux": "💥 Avidemux-Style (Strongest)"
-    }
-
+    # whole menu in one write() instead of ~4 prints per algorithm
+    parts = ["📋 Available Algorithms (grouped by category):\n"]
     idx = 1
-    for cat in ["analysis", "basic", "advanced", "creative", "avidemux"]:
-        print(f"\n{category_names[cat]}:")
-        for algo_id, info in categories[cat]:
-            print(f"  [{idx}] {info['name']}")
-            print(f"      {info['desc']}")
-            print(f"      💭 {info['use_case']}")
-            all_choices.append(algo_id)
+    for cat in _CATEGORY_ORDER:
+        parts.append(f"\n{_CATEGORY_NAMES[cat]}:\n")
+        for algo_id, info in _CATEGORIZED[cat]:
+            parts.append(f"  [{idx}] {info['name']}\n      {info['desc']}\n      💭 {info['use_case']}\n")
             idx += 1
-
-    print("\n" + "─"*70)
+    parts.append("\n" + "─"*70 + "\n")
+    sys.stdout.write("".join(parts))
+    sys.stdout.flush()
     while True:
         try:
             choice_idx = int(input("\nSelect algorithm number: ").strip()) - 1
-            if 0 <= choice_idx < len(all_choices):
-                selected = all_choices[choice_idx]
+            if 0 <= choice_idx < len(_FLAT_CHOICES):
+                selected = _FLAT_CHOICES[choice_idx]
                 print(f"\n✓ Selected: {ALGORITHM_INFO[selected]['name']}")
                 return selected
             else:
-                print(f"❌ Invalid choice. Enter 1-{len(all_choices)}")
+                print(f"❌ Invalid choice. Enter 1-{len(_FLAT_CHOICES)}")
         except KeyboardInterrupt:
             raise
         except ValueError:
             print("❌ Please enter a valid number")
 
+def _prompt_index(prompt: str, n: int, default: Optional[int] = None) -> int:
+    """Prompt for a 1-based index, returning it 0-based."""
+    err = f"❌ Invalid. Enter 1-{n}"
+    while True:
+        raw = input(prompt).strip()
+        if not raw and default is not None:
+            return default
+        try:
+            idx = int(raw) - 1
+            if 0 <= idx < n:
+                return idx
+        except ValueError:
+            pass
+        print(err)
+
 def select_files(algo_info: Dict[str, Any], videosrc: str = "videosrc") -> List[str]:
     """Select input files based on algorithm requirements."""
     print_section("Input Selection")
 
-    videos = scan_videos(videosrc)
-    if not videos:
+    videos_with_size = scan_videos(videosrc)
+    if not videos_with_size:
         print(f"❌ No videos found in '{videosrc}/' directory.")
         print(f"   Place video files ({', '.join(VIDEO_EXTS)}) in that folder and try again.")
         sys.exit(1)
 
-    print(f"Found {len(videos)} video(s) in {videosrc}/:\n")
-    for i, v in enumerate(videos, 1):
-        size_mb = os.path.getsize(v) / (1024*1024)
-        print(f"  [{i}] {os.path.basename(v)} ({size_mb:.1f} MB)")
+    listing = [f"Found {len(videos_with_size)} video(s) in {videosrc}/:\n\n"]
+    for i, (path, size) in enumerate(videos_with_size, 1):
+        size_mb = size / (1024*1024)
+        listing.append(f"  [{i}] {os.path.basename(path)} ({size_mb:.1f} MB)\n")
+    sys.stdout.write("".join(listing))
+    sys.stdout.flush()
+    videos = [path for path, _ in videos_with_size]
 
     if algo_info["inputs"] == "single":
         print("\n💡 This algorithm processes ONE video file.")
-        while True:
-            try:
-                choice = input("\nSelect file number (or ENTER for #1): ").strip()
-                idx = 0 if not choice else int(choice) - 1
-                if 0 <= idx < len(videos):
-                    selected = videos[idx]
-                    print(f"✓ Selected: {os.path.basename(selected)}")
-                    return [selected]
-                print(f"❌ Invalid. Enter 1-{len(videos)}")
-            except KeyboardInterrupt:
-                raise
-            except ValueError:
-                print("❌ Please enter a valid number")
+        idx = _prompt_index("\nSelect file number (or ENTER for #1): ", len(videos), default=0)
+        selected = videos[idx]
+        print(f"✓ Selected: {os.path.basename(selected)}")
+        return [selected]
     elif algo_info["inputs"] == "two":
         print("\n💡 This algorithm requires EXACTLY TWO video files (clip A → clip B).")
 
-        # Select first clip
-        while True:
-            try:
-                choice = input("\nSelect FIRST clip (A) number: ").strip()
-                idx_a = int(choice) - 1
-                if 0 <= idx_a < len(videos):
-                    break
-                print(f"❌ Invalid. Enter 1-{len(videos)}")
-            except KeyboardInterrupt:
-                raise
-            except ValueError:
-                print("❌ Please enter a valid number")
+        idx_a = _prompt_index("\nSelect FIRST clip (A) number: ", len(videos))
 
-        # Select second clip
         while True:
-            try:
-                choice = input("Select SECOND clip (B) number: ").strip()
-                idx_b = int(choice) - 1
-                if 0 <= idx_b < len(videos):
-                    if idx_b == idx_a:
-                        print("⚠️  Warning: Using same clip twice. Continue? (y/n)")
-                        if input("> ").strip().lower() not in ('y', 'yes'):
-                            continue
-                    break
-                print(f"❌ Invalid. Enter 1-{len(videos)}")
-            except KeyboardInterrupt:
-                raise
-            except ValueError:
-                print("❌ Please enter a valid number")
+            idx_b = _prompt_index("Select SECOND clip (B) number: ", len(videos))
+            if idx_b == idx_a:
+                print("⚠️  Warning: Using same clip twice. Continue? (y/n)")
+                if input("> ").strip().lower() not in ('y', 'yes'):
+                    continue
+            break
 
         selected = [videos[idx_a], videos[idx_b]]
         print(f"✓ Selected transition: {os.path.basename(selected[0])} → {os.path.basename(selected[1])}")
@@ -841,7 +952,7 @@ def configure_options(algo_id: str, algo_info: Dict[str, Any]) -> Dict[str, Any]
         if opt_name not in OPTION_INFO:
             continue
         if algo_id == "aviglitch_mosh":
-            effect_mode = config.get("ag_effect", OPTION_INFO["ag_effect"]["default"])
+            effect_mode = config.get("ag_effect", OPTION_INFO["ag_effect"].default)
             if effect_mode == "classic" and opt_name in ("pivot_frame", "repeat_count", "kill_ratio", "ag_keep_audio"):
                 continue
             if effect_mode == "bloom" and opt_name in ("drop_start", "drop_end", "dup_at", "dup_count"):
@@ -853,35 +964,38 @@ def configure_options(algo_id: str, algo_info: Dict[str, Any]) -> Dict[str, Any]
                 continue
 
         opt = OPTION_INFO[opt_name]
-
-        if opt["type"] == "int":
-            config[opt_name] = prompt_int(opt["prompt"], opt["default"], opt["help"])
-        elif opt["type"] == "float":
-            config[opt_name] = prompt_float(opt["prompt"], opt["default"], opt["help"])
-        elif opt["type"] == "optional_float":
-            result = prompt_text(opt["prompt"] + " (or ENTER to skip)", "", opt["help"])
+        override = algo_info.get("option_overrides", {}).get(opt_name)
+        if override:
+            opt = replace(opt, **override)
+
+        if opt.type == "int":
+            config[opt_name] = prompt_int(opt.prompt, opt.default, opt.help)
+        elif opt.type == "float":
+            config[opt_name] = prompt_float(opt.prompt, opt.default, opt.help)
+        elif opt.type == "optional_float":
+            result = prompt_text(opt.prompt + " (or ENTER to skip)", "", opt.help)
             if result:
                 try:
                     config[opt_name] = float(result)
                 except ValueError:
                     print("❌ Invalid number, skipping this option")
-        elif opt["type"] == "bool":
-            config[opt_name] = prompt_bool(opt["prompt"], opt["default"])
-        elif opt["type"] == "str":
-            config[opt_name] = prompt_text(opt["prompt"], opt["default"], opt["help"])
-        elif opt["type"] == "choice":
-            config[opt_name] = prompt_choice(opt["prompt"], opt["choices"], opt["default"], True)
-        elif opt["type"] == "range":
-            result = prompt_text(opt["prompt"] + " (or ENTER to skip)", "skip", opt["help"])
+        elif opt.type == "bool":
+            config[opt_name] = prompt_bool(opt.prompt, opt.default)
+        elif opt.type == "str":
+            config[opt_name] = prompt_text(opt.prompt, opt.default, opt.help)
+        elif opt.type == "choice":
+            config[opt_name] = prompt_choice(opt.prompt, opt.choices, opt.default, True)
+        elif opt.type == "range":
+            result = prompt_text(opt.prompt + " (or ENTER to skip)", "skip", opt.help)
             if result != "skip":
                 config[opt_name] = result
-        elif opt["type"] == "file":
-            result = prompt_text(opt["prompt"] + " (or ENTER to skip)", "", opt["help"])
+        elif opt.type == "file":
+            result = prompt_text(opt.prompt + " (or ENTER to skip)", "", opt.help)
             if result:
                 config[opt_name] = result
 
     if algo_id == "aviglitch_mosh":
-        effect_mode = config.get("ag_effect", OPTION_INFO["ag_effect"]["default"])
+        effect_mode = config.get("ag_effect", OPTION_INFO["ag_effect"].default)
         if effect_mode == "bloom":
             config.pop("drop_start", None)
             config.pop("drop_end", None)
@@ -909,16 +1023,16 @@ def configure_options(algo_id: str, algo_info: Dict[str, Any]) -> Dict[str, Any]
             print("\n⚠️  AviGlitch requires at least one operation: I-frame drop or P-frame duplication.")
             if prompt_bool("Configure I-frame drop window now?", default=True):
                 while True:
-                    drop_start = prompt_float(OPTION_INFO["drop_start"]["prompt"], 2.0, OPTION_INFO["drop_start"]["help"])
-                    drop_end = prompt_float(OPTION_INFO["drop_end"]["prompt"], 4.0, OPTION_INFO["drop_end"]["help"])
+                    drop_start = prompt_float(OPTION_INFO["drop_start"].prompt, 2.0, OPTION_INFO["drop_start"].help)
+                    drop_end = prompt_float(OPTION_INFO["drop_end"].prompt, 4.0, OPTION_INFO["drop_end"].help)
                     if drop_end > drop_start:
                         config["drop_start"] = drop_start
                         config["drop_end"] = drop_end
                         break
                     print("❌ Drop end must be greater than drop start")
             else:
-                config["dup_at"] = prompt_float(OPTION_INFO["dup_at"]["prompt"], 3.0, OPTION_INFO["dup_at"]["help"])
-                config["dup_count"] = prompt_int(OPTION_INFO["dup_count"]["prompt"], OPTION_INFO["dup_count"]["default"], OPTION_INFO["dup_count"]["help"])
+                config["dup_at"] = prompt_float(OPTION_INFO["dup_at"].prompt, 3.0, OPTION_INFO["dup_at"].help)
+                config["dup_count"] = prompt_int(OPTION_INFO["dup_count"].prompt, OPTION_INFO["dup_count"].default, OPTION_INFO["dup_count"].help)
 
     return config
 
@@ -930,7 +1044,7 @@ def select_output(algo_info: Dict[str, Any], input_files: List[str]) -> str:
     first_input = os.path.basename(input_files[0])
     root, _ = os.path.splitext(first_input)
 
-    suggested_ext = ".avi" if "avidemux" in algo_info["category"] else ".mp4"
+    suggested_ext = _CATEGORY_DEFAULT_EXT.get(algo_info["category"], ".mp4")
     if algo_info["outputs"] == ".csv":
         suggested_ext = ".csv"
 
@@ -942,185 +1056,172 @@ def select_output(algo_info: Dict[str, Any], input_files: List[str]) -> str:
 
     return output
 
-def build_command(algo_id: str, input_files: List[str], output: str, config: Dict[str, Any]) -> List[str]:
-    """Build the command from configuration."""
-    # Special handling for mosh_zoom_oneclip tool
-    if algo_id == "mosh_zoom_oneclip":
-        cmd = ["python3", "mosh_zoom_oneclip.py"]
-        cmd.extend(["--in", input_files[0]])
-        cmd.extend(["--out", output])
-
-        # Add zoom-specific options
-        for key, value in config.items():
-            if value is not None and value != "" and value is not False:
-                if key == "zoom_q":
-                    cmd.extend(["--q", str(value)])
-                elif key == "zoom_t":
-                    cmd.extend(["--t", str(value)])
-                elif key == "zoom_dur":
-                    cmd.extend(["--zoom-dur", str(value)])
-                elif key == "zoom_tail":
-                    cmd.extend(["--tail", str(value)])
-                elif key == "zoom_direction":
-                    cmd.extend(["--zoom-direction", str(value)])
-                elif key == "deliver_crf":
-                    cmd.extend(["--deliver-crf", str(value)])
-                elif key == "verbose" and value:
-                    cmd.append("-v")
-                else:
-                    cmd.extend([f"--{key}", str(value)])
+def _active(config: Dict[str, Any]):
+    """Yield the (key, value) pairs of config that should emit a CLI flag.
 
-        return cmd
-    # Special handling for color_fx_ffmpeg
-    if algo_id == "color_fx_ffmpeg":
-        cmd = ["python3", "main.py", "-a", "color_fx_ffmpeg"]
-        cmd.extend(["-f", input_files[0]])
-        cmd.extend(["-o", output])
+    None, empty strings and False all mean "option not set"; every builder
+    shares this filter so the semantics stay uniform across tools. Values
+    are stringified here, exactly once, except for switch-only keys in
+    _BOOL_FLAGS whose values never reach the command line.
+    """
+    for key, value in config.items():
+        if value is None or value == "" or value is False:
+            continue
+        yield key, value if key in _BOOL_FLAGS else str(value)
 
-        for key, value in config.items():
-            if value is None or value == "":
-                continue
-            if key == "keep_audio":
-                if not value:
-                    cmd.append("--no_keep_audio")
-            elif key == "verbose":
-                if value:
-                    cmd.append("-v")
-            else:
-                if value is False:
-                    continue
-                cmd.extend([f"--{key}", str(value)])
 
-        return cmd
-    # Special handling for aviglitch_mosh tool
-    if algo_id == "aviglitch_mosh":
-        cmd = ["python3", "aviglitch_mosh.py"]
-        cmd.extend(["--in", input_files[0]])
-        cmd.extend(["--out", output])
-
-        effect_mode = str(config.get("ag_effect", OPTION_INFO["ag_effect"]["default"]))
-        cmd.extend(["--effect", effect_mode])
-
-        # Add aviglitch-specific options
-        for key, value in config.items():
-            if value is not None and value != "" and value is not False:
-                if key == "aviglitch_prep" and value:
-                    cmd.append("--prep")
-                elif key == "prep_q":
-                    cmd.extend(["--prep-q", str(value)])
-                elif key == "prep_gop_ag":
-                    cmd.extend(["--prep-gop", str(value)])
-                elif key == "prep_fps":
-                    cmd.extend(["--prep-fps", str(value)])
-                elif key in (
-                    "ag_effect",
-                    "drop_start",
-                    "drop_end",
-                    "dup_at",
-                    "dup_count",
-                    "pivot_frame",
-                    "repeat_count",
-                    "kill_ratio",
-                    "ag_keep_audio",
-                ):
-                    # Added as validated pairs below.
-                    continue
-                elif key == "verbose" and value:
-                    cmd.append("-v")
-                else:
-                    cmd.extend([f"--{key}", str(value)])
+def _build_zoom_command(algo_id: str, input_files: List[str], output: str, config: Dict[str, Any]) -> List[str]:
+    """Build a mosh_zoom_oneclip.py invocation."""
+    cmd = ["python3", "mosh_zoom_oneclip.py"]
+    cmd.extend(["--in", input_files[0]])
+    cmd.extend(["--out", output])
 
-        if effect_mode == "bloom":
-            cmd.extend(["--pivot-frame", str(config.get("pivot_frame", OPTION_INFO["pivot_frame"]["default"]))])
-            cmd.extend(["--repeat-count", str(config.get("repeat_count", OPTION_INFO["repeat_count"]["default"]))])
-            cmd.extend(["--kill-ratio", str(config.get("kill_ratio", OPTION_INFO["kill_ratio"]["default"]))])
-            if config.get("ag_keep_audio"):
-                cmd.append("--keep-audio")
+    # Add zoom-specific options
+    for key, value in _active(config):
+        bool_flag = _BOOL_FLAGS.get(key)
+        if bool_flag:
+            cmd.append(bool_flag)
         else:
-            drop_start = config.get("drop_start")
-            drop_end = config.get("drop_end")
-            if drop_start is not None and drop_end is not None:
-                cmd.extend(["--drop-start", str(drop_start)])
-                cmd.extend(["--drop-end", str(drop_end)])
+            cmd += (_FLAG_MAP_ZOOM.get(key, f"--{key}"), value)
 
-            dup_at = config.get("dup_at")
-            if dup_at is not None:
-                cmd.extend(["--dup-at", str(dup_at)])
-                cmd.extend(["--dup-count", str(config.get("dup_count", OPTION_INFO["dup_count"]["default"]))])
-
-        return cmd
-
-    # Standard main.py command
-    cmd = ["python3", "main.py", "-a", algo_id]
+    return cmd
 
-    # Add inputs
-    if len(input_files) == 1:
-        cmd.extend(["-f", input_files[0]])
-    else:
-        cmd.extend(["-f", ",".join(input_files)])
 
-    # Add output
+def _build_color_fx_command(algo_id: str, input_files: List[str], output: str, config: Dict[str, Any]) -> List[str]:
+    """Build a main.py color_fx_ffmpeg invocation."""
+    cmd = ["python3", "main.py", "-a", "color_fx_ffmpeg"]
+    cmd.extend(["-f", input_files[0]])
     cmd.extend(["-o", output])
 
-    # Add options
-    for key, value in config.items():
-        # Skip None, empty strings, and False boolean values
-        if value is None or value == "" or value is False:
+    # Inverted switch: only emitted when audio is explicitly disabled.
+    if config.get("keep_audio") is False:
+        cmd.append("--no_keep_audio")
+
+    for key, value in _active(config):
+        if key == "keep_audio":
             continue
+        bool_flag = _BOOL_FLAGS.get(key)
+        if bool_flag:
+            cmd.append(bool_flag)
+        else:
+            cmd += (f"--{key}", value)
 
-        if key == "verbose" and value:
-            cmd.append("-v")
-        elif key == "postcut_rand":
-            # Special case: postcut_rand uses hyphen in main.py
-            cmd.extend(["--postcut-rand", str(value)])
-        elif key == "kb_mode":
-            cmd.extend(["--kb", str(value)])
+    return cmd
+
+
+def _build_aviglitch_command(algo_id: str, input_files: List[str], output: str, config: Dict[str, Any]) -> List[str]:
+    """Build an aviglitch_mosh.py invocation."""
+    cmd = ["python3", "aviglitch_mosh.py"]
+    cmd.extend(["--in", input_files[0]])
+    cmd.extend(["--out", output])
+
+    effect_mode = str(config.get("ag_effect", OPTION_INFO["ag_effect"].default))
+    cmd.extend(["--effect", effect_mode])
+
+    # Add aviglitch-specific options
+    for key, value in _active(config):
+        if key in _AVIGLITCH_DEFERRED:
+            # Added as validated pairs below.
+            continue
+        bool_flag = _BOOL_FLAGS.get(key)
+        if bool_flag:
+            cmd.append(bool_flag)
         else:
-            # Keep underscores - main.py uses underscores for most args
-            cmd.extend([f"--{key}", str(value)])
+            cmd += (_FLAG_MAP_AVIGLITCH.get(key, f"--{key}"), value)
+
+    if effect_mode == "bloom":
+        cmd.extend(["--pivot-frame", str(config.get("pivot_frame", OPTION_INFO["pivot_frame"].default))])
+        cmd.extend(["--repeat-count", str(config.get("repeat_count", OPTION_INFO["repeat_count"].default))])
+        cmd.extend(["--kill-ratio", str(config.get("kill_ratio", OPTION_INFO["kill_ratio"].default))])
+        if config.get("ag_keep_audio"):
+            cmd.append("--keep-audio")
+    else:
+        drop_start = config.get("drop_start")
+        drop_end = config.get("drop_end")
+        if drop_start is not None and drop_end is not None:
+            cmd.extend(["--drop-start", str(drop_start)])
+            cmd.extend(["--drop-end", str(drop_end)])
+
+        dup_at = config.get("dup_at")
+        if dup_at is not None:
+            cmd.extend(["--dup-at", str(dup_at)])
+            cmd.extend(["--dup-count", str(config.get("dup_count", OPTION_INFO["dup_count"].default))])
 
     return cmd
 
+
+def _build_main_command(algo_id: str, input_files: List[str], output: str, config: Dict[str, Any]) -> List[str]:
+    """Build the standard main.py invocation for registry algorithms."""
+    # ",".join on a one-element list is the identity, so a single join covers
+    # both input shapes. Keys absent from the flag map keep their
+    # underscores, which is what main.py expects for most args.
+    base = ["python3", "main.py", "-a", algo_id, "-f", ",".join(input_files), "-o", output]
+    opts = [
+        part
+        for key, value in _active(config)
+        for part in (
+            (_BOOL_FLAGS[key],) if key in _BOOL_FLAGS
+            else (_FLAG_MAP_MAIN.get(key, f"--{key}"), value)
+        )
+    ]
+    return base + opts
+
+
+# algo_id → builder; anything unlisted goes through the main.py path
+_BUILDERS = {
+    "mosh_zoom_oneclip": _build_zoom_command,
+    "color_fx_ffmpeg": _build_color_fx_command,
+    "aviglitch_mosh": _build_aviglitch_command,
+}
+
+
+def build_command(algo_id: str, input_files: List[str], output: str, config: Dict[str, Any]) -> List[str]:
+    """Build the command from configuration."""
+    return _BUILDERS.get(algo_id, _build_main_command)(algo_id, input_files, output, config)
+
 def execute_multipass_aviglitch(input_files: List[str], base_config: Dict[str, Any], passes: List[Dict[str, Any]], final_output: str):
     """Execute multiple aviglitch_mosh passes in sequence."""
+    import subprocess  # deferred: only the execute paths need it
+
     print("\n🚀 Starting multi-pass processing...\n")
 
-    # Generate intermediate filenames
+    # Generate all pass outputs up front: intermediate passes use _passN
+    # naming, the final pass uses the user-specified output name.
     root, ext = os.path.splitext(final_output)
-    intermediate_files = []
+    pass_outputs = [f"{root}_pass{i}{ext}" for i in range(1, len(passes))]
+    intermediate_files = list(pass_outputs)
+    pass_outputs.append(final_output)
+    pass_basenames = [os.path.basename(p) for p in pass_outputs]
 
     current_input = input_files[0]
     success = True
 
+    # Invariant command pieces, computed once; each pass only varies in its
+    # input/output paths and its own mosh params.
+    base_prefix = ["python3", "aviglitch_mosh.py"]
+    effect_args = ["--effect", str(base_config.get("ag_effect", OPTION_INFO["ag_effect"].default))]
+    prep_args: List[str] = []
+    if base_config.get("aviglitch_prep"):
+        prep_args.append("--prep")
+        for key, flag in (("prep_q", "--prep-q"), ("prep_gop_ag", "--prep-gop"), ("prep_fps", "--prep-fps")):
+            value = base_config.get(key)
+            if value is not None:
+                prep_args += (flag, str(value))
+    verbose = bool(base_config.get("verbose"))
+
     for i, pass_config in enumerate(passes, 1):
-        # Determine output path
-        if i == len(passes):
-            # Final pass uses user-specified output name
-            pass_output = final_output
-        else:
-            # Intermediate passes use _passN naming
-            pass_output = f"{root}_pass{i}{ext}"
-            intermediate_files.append(pass_output)
+        pass_output = pass_outputs[i - 1]
 
         print(f"{'─'*70}")
-        print(f"  Pass {i}/{len(passes)}: {os.path.basename(current_input)} → {os.path.basename(pass_output)}")
+        print(f"  Pass {i}/{len(passes)}: {os.path.basename(current_input)} → {pass_basenames[i - 1]}")
         print(f"{'─'*70}\n")
 
         # Build command for this pass
-        cmd = ["python3", "aviglitch_mosh.py"]
-        cmd.extend(["--in", current_input])
-        cmd.extend(["--out", pass_output])
-        cmd.extend(["--effect", str(base_config.get("ag_effect", OPTION_INFO["ag_effect"]["default"]))])
+        cmd = base_prefix + ["--in", current_input, "--out", pass_output] + effect_args
 
         # Only apply prep on first pass
-        if i == 1 and base_config.get("aviglitch_prep"):
-            cmd.append("--prep")
-            if "prep_q" in base_config:
-                cmd.extend(["--prep-q", str(base_config["prep_q"])])
-            if "prep_gop_ag" in base_config:
-                cmd.extend(["--prep-gop", str(base_config["prep_gop_ag"])])
-            if "prep_fps" in base_config:
-                cmd.extend(["--prep-fps", str(base_config["prep_fps"])])
+        if i == 1:
+            cmd += prep_args
 
         # Add pass-specific mosh params
         if "drop_start" in pass_config:
@@ -1138,10 +1239,13 @@ def execute_multipass_aviglitch(input_files: List[str], base_config: Dict[str, A
             cmd.extend(["--dup-count", str(pass_config["dup_count"])])
 
         # Add verbose if configured
-        if base_config.get("verbose"):
+        if verbose:
             cmd.append("-v")
 
-        print(f"Command: {' '.join(cmd)}\n")
+        # Joining and printing the full command is only worth it when the
+        # user asked for verbose output.
+        if verbose:
+            print(f"Command: {' '.join(cmd)}\n")
 
         # Execute pass
         try:
@@ -1200,7 +1304,7 @@ def main():
         pass_configs = []
 
         if algo_id == "aviglitch_mosh":
-            effect_mode = str(config.get("ag_effect", OPTION_INFO["ag_effect"]["default"]))
+            effect_mode = str(config.get("ag_effect", OPTION_INFO["ag_effect"].default))
             if effect_mode == "classic":
                 print_section("Multi-Pass Configuration")
                 print("💡 Multi-pass mode applies multiple rounds of moshing to the same clip.")
@@ -1282,19 +1386,23 @@ def main():
             # Build single command
             cmd = build_command(algo_id, input_files, output, config)
 
-            print(f"\n{'─'*70}")
-            print("Command to execute:")
-            print(f"{'─'*70}")
-            print(" ".join(cmd))
-            print(f"{'─'*70}\n")
+            # Echo the full command only in verbose mode
+            if config.get("verbose"):
+                print(f"\n{'─'*70}")
+                print("Command to execute:")
+                print(f"{'─'*70}")
+                print(" ".join(cmd))
+                print(f"{'─'*70}\n")
 
             # Confirm
             if not prompt_bool("Execute now?", True):
-                print("\n❌ Cancelled. You can run the command above manually later.")
+                print("\n❌ Cancelled. You can run this command manually later:")
+                print(f"  {' '.join(cmd)}")
                 return
 
             # Execute
             print("\n🚀 Starting processing...\n")
+            import subprocess  # deferred: only the execute paths need it
             try:
                 result = subprocess.run(cmd)
             except KeyboardInterrupt: